@@ -0,0 +1,116 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+class Overloaded(Exception):
+    """Raised when the wait queue is full or the wait would take too long."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Concurrency limit with a bounded FIFO wait queue.
+
+    Up to `max_concurrent` holders run at once and up to `max_queue` more wait
+    in arrival order (for at most `max_wait` seconds). Anything beyond that is
+    rejected immediately with Overloaded, carrying a Retry-After estimate from
+    the recent average hold time.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float | None = None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+        self._avg_hold = 1.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_hold * (self.waiting + 1) / max(1, self.max_concurrent)))
+
+    async def acquire(self, timeout: float | None = None):
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+        limits = [t for t in (timeout, self.max_wait) if t is not None]
+        timeout = max(0.0, min(limits)) if limits else None
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise Overloaded(self.retry_after()) from None
+            raise
+        waited = time.monotonic() - start
+        self.total_wait += waited
+        self.max_observed_wait = max(self.max_observed_wait, waited)
+        self.admitted += 1
+
+    def release(self, held_for: float | None = None):
+        if held_for is not None:
+            self._avg_hold = 0.9 * self._avg_hold + 0.1 * held_for
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter; `active` is unchanged
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, timeout: float | None = None):
+        await self.acquire(timeout)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_observed_wait * 1000, 1),
+        }
+
+def admission_from_env(name: str, prefix: str, max_concurrent: int, max_queue: int) -> AdmissionController:
+    """AdmissionController configured from <prefix>_MAX_CONCURRENT / _MAX_QUEUE / _MAX_WAIT_MS."""
+    max_wait_ms = float(os.getenv(f"{prefix}_MAX_WAIT_MS", "0"))
+    return AdmissionController(
+        name,
+        max_concurrent=int(os.getenv(f"{prefix}_MAX_CONCURRENT", max_concurrent)),
+        max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", max_queue)),
+        max_wait=max_wait_ms / 1000 if max_wait_ms else None,
+    )
@@ -0,0 +1,131 @@
+"""Bulk question runner behind POST /ask/batch, also usable from the command line:
+
+    python -m backend.batch questions.jsonl -o answers.jsonl
+    python -m backend.batch questions.jsonl --url http://127.0.0.1:8000
+
+Each input line is a JSON object shaped like an /ask request plus an optional
+"id"; each output line is the /ask response for it (or an "error"), written
+as soon as it completes, followed by a final summary line.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from backend.cache import cache_key
+from backend.singleflight import SingleFlight
+
+def iter_lines(body: bytes):
+    """Lazily yield (line number, text) for the non-blank lines of a JSONL body."""
+    start = 0
+    line_no = 0
+    while start < len(body):
+        end = body.find(b"\n", start)
+        if end == -1:
+            end = len(body)
+        line_no += 1
+        line = body[start:end].strip()
+        start = end + 1
+        if line:
+            yield line_no, line.decode("utf-8", errors="replace")
+
+def batch_key(item: dict) -> str:
+    """Items that differ only in "id" (or query case and provider order) share one answer."""
+    providers = sorted(str(p).lower() for p in item.get("providers") or [])
+    # Every other field (summary_mode, deadline_ms, min_quorum, ...) changes the answer
+    options = {k: v for k, v in item.items() if k not in ("id", "query", "history", "providers")}
+    return cache_key("batch", str(item.get("query", "")), item.get("history"),
+                     params={"providers": providers, "options": options})
+
+async def _run_one(line_no: int, text: str, answer, flight: SingleFlight) -> dict:
+    result = {"line": line_no}
+    try:
+        item = json.loads(text)
+        if not isinstance(item, dict):
+            raise ValueError("each line must be a JSON object")
+        if "id" in item:
+            result["id"] = item["id"]
+        # Repeats of an in-flight item wait for it; later repeats are served by CACHE
+        result.update(await flight.do(batch_key(item), lambda: answer(item)))
+        # A shared answer echoes the leader's wording; report this line's own query
+        result["query"] = item.get("query")
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+async def run_batch(lines, answer, concurrency: int = 8):
+    """Yield one JSON line per input line, in completion order, with at most `concurrency` in flight.
+
+    `lines` yields (line number, text); `answer(item)` resolves one request dict.
+    """
+    flight = SingleFlight()
+    pending = set()
+    count = errors = 0
+
+    def finished(done):
+        nonlocal count, errors
+        for task in done:
+            result = task.result()
+            count += 1
+            errors += "error" in result
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    try:
+        for line_no, text in lines:
+            pending.add(asyncio.ensure_future(_run_one(line_no, text, answer, flight)))
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for line in finished(done):
+                    yield line
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for line in finished(done):
+                yield line
+    finally:
+        for task in pending:
+            task.cancel()
+    yield json.dumps({"done": True, "count": count, "errors": errors, "deduplicated": flight.coalesced}) + "\n"
+
+async def _run_local(body: bytes, out, concurrency: int):
+    from backend import main
+    # The app's lifespan owns the HTTP clients and flushes the disk cache's pending writes on exit
+    async with main.lifespan(main.app):
+        async for line in run_batch(iter_lines(body), main.answer_item, concurrency):
+            out.write(line)
+            out.flush()
+
+async def _run_remote(body: bytes, out, url: str):
+    import httpx
+    async with httpx.AsyncClient(timeout=None) as client:
+        async with client.stream("POST", f"{url.rstrip('/')}/ask/batch", content=body,
+                                 headers={"Content-Type": "application/x-ndjson"}) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if line:
+                    out.write(line + "\n")
+                    out.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of questions through the summarizer.")
+    parser.add_argument("input", help="JSONL file of requests, or - for stdin")
+    parser.add_argument("-o", "--output", help="write results here instead of stdout")
+    parser.add_argument("--url", help="send to a running backend instead of calling providers in-process")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once (in-process only)")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        body = sys.stdin.buffer.read()
+    else:
+        with open(args.input, "rb") as f:
+            body = f.read()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.url:
+            asyncio.run(_run_remote(body, out, args.url))
+        else:
+            asyncio.run(_run_local(body, out, args.concurrency))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
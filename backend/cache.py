@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import json
+import time
+import zlib
+from collections import OrderedDict
+
+class ResponseCache:
+    """Bounded in-memory LRU cache with per-entry TTL and a byte budget.
+
+    Size is accounted as UTF-8 key bytes plus stored value bytes. With
+    `compress=True`, values of at least `compress_min_bytes` are kept
+    zlib-compressed, which roughly triples how many long answers fit in the
+    budget at the cost of a few microseconds per hit.
+
+    An optional `backing` tier (see DiskCache) is read through on a memory
+    miss and written behind on every set; clear() only empties memory.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 ttl: float = 3600, compress: bool = False, compress_min_bytes: int = 1024,
+                 backing=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compress = compress
+        self.compress_min_bytes = compress_min_bytes
+        self.backing = backing
+        # key -> (payload, compressed, size, expires_at)
+        self._entries: OrderedDict[str, tuple[bytes | str, bool, int, float]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.backing_hits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: str):
+        return self.get(key, count=False) is not None
+
+    def get(self, key: str, count: bool = True) -> str | None:
+        value = self._get_memory(key, count)
+        if value is not None or self.backing is None:
+            if value is None and count:
+                self.misses += 1
+            return value
+        return self._backing_result(key, self.backing.get(key), count)
+
+    async def aget(self, key: str) -> str | None:
+        """Like get(), but a backing-tier read (SQLite) runs in a worker thread, off the event loop."""
+        value = self._get_memory(key, True)
+        if value is not None or self.backing is None:
+            if value is None:
+                self.misses += 1
+            return value
+        return self._backing_result(key, await asyncio.to_thread(self.backing.get, key), True)
+
+    def _get_memory(self, key: str, count: bool) -> str | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry[3] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            return None
+        payload, compressed, _, _ = entry
+        self._entries.move_to_end(key)
+        if count:
+            self.hits += 1
+        return zlib.decompress(payload).decode() if compressed else payload
+
+    def _backing_result(self, key: str, found: tuple[str, float] | None, count: bool) -> str | None:
+        if found is None:
+            if count:
+                self.misses += 1
+            return None
+        value, remaining_ttl = found
+        self._store(key, value, remaining_ttl)
+        if count:
+            self.hits += 1
+            self.backing_hits += 1
+        return value
+
+    def set(self, key: str, value: str, ttl: float | None = None):
+        self._store(key, value, ttl)
+        if self.backing is not None:
+            self.backing.set(key, value, self.ttl if ttl is None else ttl)
+
+    def _store(self, key: str, value: str, ttl: float | None = None):
+        if key in self._entries:
+            self._remove(key)
+        raw = value.encode()
+        compressed = self.compress and len(raw) >= self.compress_min_bytes
+        payload = zlib.compress(raw) if compressed else value
+        size = len(key.encode()) + (len(payload) if compressed else len(raw))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (payload, compressed, size, expires_at)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        self._bytes -= self._entries.pop(key)[2]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "backing_hits": self.backing_hits,
+        }
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of whitespace and trim."""
+    return " ".join(str(text).split())
+
+def normalize_query(query: str) -> str:
+    """Whitespace- and case-insensitive form of a query, used for cache keys."""
+    return normalize_text(query).casefold()
+
+def cache_key(provider: str, query: str, history: list[dict] | None = None,
+              model: str | None = None, params: dict | None = None) -> str:
+    """Stable, fixed-size key over everything that influences a provider's answer."""
+    canonical = {
+        "provider": provider.lower(),
+        "model": model,
+        "params": params or {},
+        "history": [
+            ["ai" if m.get("role") == "ai" else "user", normalize_text(m.get("content", ""))]
+            for m in (history or [])
+        ],
+        "query": normalize_query(query),
+    }
+    blob = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return f"{provider.lower()}:{hashlib.sha256(blob.encode()).hexdigest()}"
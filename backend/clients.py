@@ -0,0 +1,104 @@
+import os
+from contextlib import asynccontextmanager
+import httpx
+import openai
+
+# HTTP/2 needs the optional `h2` package (installed via httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+def _env(provider: str, name: str, default: str) -> str:
+    """Per-provider setting (e.g. GEMINI_HTTP_TIMEOUT) falling back to the global HTTP_<name>."""
+    return os.getenv(f"{provider.upper()}_HTTP_{name}", os.getenv(f"HTTP_{name}", default))
+
+def client_settings(provider: str) -> dict:
+    """httpx.AsyncClient keyword arguments for `provider`, read from the environment."""
+    timeout = float(_env(provider, "TIMEOUT", "30"))
+    connect_timeout = float(_env(provider, "CONNECT_TIMEOUT", "5"))
+    http2 = _env(provider, "HTTP2", "1").lower() not in ("0", "false", "no")
+    return {
+        "timeout": httpx.Timeout(timeout, connect=min(connect_timeout, timeout)),
+        "limits": httpx.Limits(
+            max_connections=int(_env(provider, "MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(_env(provider, "MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(_env(provider, "KEEPALIVE_EXPIRY", "30")),
+        ),
+        "http2": http2 and HTTP2_AVAILABLE,
+    }
+
+# Upstream API roots; <PROVIDER>_BASE_URL points a provider elsewhere (e.g. the fake server in benchmarks/)
+DEFAULT_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "anthropic": "https://api.anthropic.com/v1",
+    "gemini": "https://generativelanguage.googleapis.com/v1beta",
+    "cohere": "https://api.cohere.ai/v1",
+    "perplexity": "https://api.perplexity.ai",
+}
+
+def base_url(provider: str) -> str:
+    return os.getenv(f"{provider.upper()}_BASE_URL", DEFAULT_BASE_URLS[provider]).rstrip("/")
+
+class ClientRegistry:
+    """One pooled, keep-alive httpx.AsyncClient per provider for the lifetime of the app."""
+
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._openai: dict[str, tuple[httpx.AsyncClient, openai.AsyncOpenAI]] = {}
+        self.started = False
+
+    def start(self):
+        self.started = True
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**client_settings(provider))
+            self._clients[provider] = client
+        return client
+
+    def openai(self, api_key: str) -> openai.AsyncOpenAI:
+        # Keyed by API key so a rotated key gets a fresh SDK client on the same pool
+        http_client = self.get("openai")
+        pool, client = self._openai.get(api_key, (None, None))
+        if client is None or pool is not http_client:
+            # Retries are ours (backend.resilience), so the SDK must not retry on its own
+            client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url("openai"), http_client=http_client,
+                                        max_retries=0)
+            self._openai[api_key] = (http_client, client)
+        return client
+
+    async def aclose(self):
+        self.started = False
+        self._openai = {}
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+registry = ClientRegistry()
+
+@asynccontextmanager
+async def provider_client(provider: str):
+    """Yield the shared client for `provider`.
+
+    Outside the FastAPI lifespan (scripts, unit tests) there is no registry to
+    borrow from, so a one-off client is opened and closed around the call.
+    """
+    if registry.started:
+        yield registry.get(provider)
+    else:
+        async with httpx.AsyncClient(**client_settings(provider)) as client:
+            yield client
+
+@asynccontextmanager
+async def openai_client(api_key: str):
+    """Yield an AsyncOpenAI client riding on the pooled "openai" connection pool."""
+    if registry.started:
+        yield registry.openai(api_key)
+    else:
+        client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url("openai"),
+                                    http_client=httpx.AsyncClient(**client_settings("openai")), max_retries=0)
+        async with client:
+            yield client
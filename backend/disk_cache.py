@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import quote
+
+class DiskCache:
+    """SQLite (WAL mode) cache tier shared by every process on one host.
+
+    Reads use a per-thread read-only connection, so they never queue behind
+    the writer (WAL readers don't block on writers); callers on an event loop
+    should still run `get` in a thread. Writes and LRU "touches" are queued
+    and flushed by a background thread in one transaction (write-behind), so
+    the request path never waits on an fsync. Entry and byte counts are
+    refreshed by that thread after each flush, so stats() doesn't scan. Expired rows are dropped and the
+    least-recently-used rows trimmed to `max_bytes` every `compact_every`
+    writes. Timestamps are wall-clock so TTLs agree across processes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl: float = 86400,
+                 flush_interval: float = 0.5, compact_every: int = 500):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.compactions = 0
+        self._writes_since_compact = 0
+        self._pending: dict[str, tuple[bytes, float]] = {}
+        self._touched: set[str] = set()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+        self.entries = 0
+        self.bytes = 0
+        self._refresh_counts()
+        self._writer = threading.Thread(target=self._run_writer, name="disk-cache-writer", daemon=True)
+        self._writer.start()
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.path))}?mode=ro", uri=True, timeout=5, check_same_thread=False)
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        """Return (value, remaining_ttl) or None."""
+        now = time.time()
+        with self._lock:
+            row = self._pending.get(key)
+        if row is None:
+            row = self._reader().execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched.add(key)
+        return zlib.decompress(row[0]).decode(), row[1] - now
+
+    def set(self, key: str, value: str, ttl: float | None = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._pending[key] = (zlib.compress(value.encode()), expires_at)
+        self._wake.set()
+
+    def flush(self):
+        """Write queued entries and access times to SQLite in one transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            touched, self._touched = self._touched, set()
+        if not pending and not touched:
+            return
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    [(k, blob, len(k) + len(blob), exp, now) for k, (blob, exp) in pending.items()],
+                )
+                self._conn.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?",
+                                       [(now, k) for k in touched - pending.keys()])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                # Requeue anything not overwritten meanwhile so the next flush retries it
+                with self._lock:
+                    for k, v in pending.items():
+                        self._pending.setdefault(k, v)
+                    self._touched |= touched
+                raise
+        self.writes += len(pending)
+        self._writes_since_compact += len(pending)
+        if self._writes_since_compact >= self.compact_every:
+            self.compact()
+        elif pending:
+            self._refresh_counts()
+
+    def _refresh_counts(self):
+        with self._db_lock:
+            self.entries, self.bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+    def compact(self):
+        """Drop expired rows, then least-recently-used rows until under `max_bytes`."""
+        self._writes_since_compact = 0
+        with self._db_lock:
+            self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                excess, doomed = total - self.max_bytes, []
+                for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+                    if excess <= 0:
+                        break
+                    doomed.append((key,))
+                    excess -= size
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        self.compactions += 1
+        self._refresh_counts()
+
+    def _run_writer(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Another process held the write lock too long; entries stay queued
+                pass
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+        with self._lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        with self._db_lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "pending": len(self._pending),
+            "compactions": self.compactions,
+        }
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import time
+from email.utils import parsedate_to_datetime
+import httpx
+import openai
+
+ERROR_CLASSES = ("auth", "rate_limit", "timeout", "server", "connection", "error")
+
+# How long (seconds) a failure of each class is remembered before the provider is retried
+DEFAULT_NEGATIVE_TTLS = {
+    "auth": 300,
+    "rate_limit": 30,
+    "timeout": 10,
+    "server": 15,
+    "connection": 10,
+    "error": 30,
+}
+
+class ProviderError(Exception):
+    """A provider answered but the answer can't be used (e.g. no usable model)."""
+
+def status_code(exc: BaseException) -> int | None:
+    """HTTP status carried by an httpx or openai exception, if any."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def classify_error(exc: BaseException) -> str:
+    """Map a provider exception to one of ERROR_CLASSES."""
+    if isinstance(exc, (httpx.TimeoutException, asyncio.TimeoutError, openai.APITimeoutError)):
+        return "timeout"
+    status = status_code(exc)
+    if status in (401, 403):
+        return "auth"
+    if status == 429:
+        return "rate_limit"
+    if status is not None and status >= 500:
+        return "server"
+    if isinstance(exc, (httpx.TransportError, openai.APIConnectionError)):
+        return "connection"
+    return "error"
+
+def retry_after(exc: BaseException) -> float | None:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date) on the error's response."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def negative_ttl(error_class: str, retry_after: float | None = None) -> float:
+    """TTL for a cached failure, overridable per class via NEGATIVE_CACHE_TTL_<CLASS>.
+
+    A rate limit with a Retry-After is cached for exactly that long.
+    """
+    if error_class == "rate_limit" and retry_after is not None:
+        return retry_after
+    default = DEFAULT_NEGATIVE_TTLS.get(error_class, DEFAULT_NEGATIVE_TTLS["error"])
+    return float(os.getenv(f"NEGATIVE_CACHE_TTL_{error_class.upper()}", default))
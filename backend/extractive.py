@@ -0,0 +1,145 @@
+import math
+import re
+
+# Sentence ends at . ! ? followed by whitespace and a capital/digit/quote, or at a line break
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])|\n+")
+_LIST_MARKER = re.compile(r"^\s*(?:[-*•]\s+|\d+[.)]\s+|#+\s*)")
+_MARKDOWN = re.compile(r"\*\*|__|`")
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just let me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you
+your yours yourself yourselves
+""".split())
+
+def split_sentences(text: str) -> list[str]:
+    """Sentences and list items of `text`, with markdown bullets and emphasis removed."""
+    sentences = []
+    for part in _SENTENCE_SPLIT.split(text):
+        part = _MARKDOWN.sub("", _LIST_MARKER.sub("", part)).strip()
+        # Headings and fragments carry too little to stand alone in a summary
+        if len(part.split()) >= 4:
+            sentences.append(part)
+    return sentences
+
+def _stem(word: str) -> str:
+    # Just enough suffix stripping that "languages"/"language" and "running"/"run" meet
+    for suffix in ("ies", "ing", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            if suffix == "ies":
+                word += "y"
+            elif suffix == "ing" and len(word) > 3 and word[-1] == word[-2]:
+                word = word[:-1]
+            break
+    return word
+
+def terms(text: str) -> list[str]:
+    return [_stem(w) for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+def _tfidf(docs: list[list[str]]) -> list[dict[str, float]]:
+    """L2-normalized sublinear TF-IDF vectors, one sparse dict per document."""
+    df: dict[str, int] = {}
+    for doc in docs:
+        for term in set(doc):
+            df[term] = df.get(term, 0) + 1
+    n = len(docs)
+    vectors = []
+    for doc in docs:
+        counts: dict[str, int] = {}
+        for term in doc:
+            counts[term] = counts.get(term, 0) + 1
+        vec = {t: (1 + math.log(c)) * (math.log((n + 1) / (df[t] + 1)) + 1) for t, c in counts.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        vectors.append({t: w / norm for t, w in vec.items()})
+    return vectors
+
+def _similarity_graph(vectors: list[dict[str, float]]) -> list[dict[int, float]]:
+    """Cosine similarity between every pair of vectors sharing a term, via an inverted index."""
+    postings: dict[str, list[tuple[int, float]]] = {}
+    for i, vec in enumerate(vectors):
+        for term, weight in vec.items():
+            postings.setdefault(term, []).append((i, weight))
+    graph: list[dict[int, float]] = [{} for _ in vectors]
+    for entries in postings.values():
+        for a in range(len(entries)):
+            i, wi = entries[a]
+            row = graph[i]
+            for j, wj in entries[a + 1:]:
+                row[j] = row.get(j, 0.0) + wi * wj
+    # Mirror the upper triangle
+    for i, row in enumerate(graph):
+        for j, w in list(row.items()):
+            if j > i:
+                graph[j][i] = w
+    return graph
+
+def textrank(graph: list[dict[int, float]], bias: list[float] | None = None,
+             damping: float = 0.85, iterations: int = 50, tol: float = 1e-6) -> list[float]:
+    """Weighted PageRank over the sentence graph; `bias` personalizes the teleport step."""
+    n = len(graph)
+    if n == 0:
+        return []
+    if bias is None or not sum(bias):
+        bias = [1.0] * n
+    total = sum(bias)
+    teleport = [(1 - damping) * b / total for b in bias]
+    out_weight = [sum(row.values()) for row in graph]
+    scores = [1.0 / n] * n
+    for _ in range(iterations):
+        new = list(teleport)
+        dangling = 0.0
+        for i, row in enumerate(graph):
+            if not out_weight[i]:
+                dangling += scores[i]
+                continue
+            share = damping * scores[i] / out_weight[i]
+            for j, w in row.items():
+                new[j] += share * w
+        if dangling:
+            # Isolated sentences spread their rank like the teleport step
+            for j in range(n):
+                new[j] += damping * dangling * bias[j] / total
+        delta = sum(abs(a - b) for a, b in zip(new, scores))
+        scores = new
+        if delta < tol:
+            break
+    return scores
+
+def extractive_summary(responses: dict[str, str], query: str = "", max_sentences: int = 5,
+                       redundancy: float = 0.5) -> tuple[str, list[str]] | None:
+    """Merge provider responses into `max_sentences` of their most central sentences.
+
+    Sentences from all responses form one TF-IDF similarity graph; TextRank
+    (biased toward sentences that share terms with `query`) ranks them, so
+    points several providers make rank highest. Sentences too similar to one
+    already chosen are skipped. The picks are returned in reading order with
+    the providers they came from, or None if the responses are already no
+    longer than the summary would be.
+    """
+    sentences: list[tuple[str, str]] = []
+    for provider, text in responses.items():
+        sentences.extend((provider, s) for s in split_sentences(text))
+    if len(sentences) <= max_sentences:
+        return None
+
+    vectors = _tfidf([terms(s) for _, s in sentences])
+    graph = _similarity_graph(vectors)
+    query_terms = set(terms(query))
+    bias = [1.0 + sum(w for t, w in vec.items() if t in query_terms) for vec in vectors]
+    scores = textrank(graph, bias)
+
+    chosen: list[int] = []
+    for i in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        if all(graph[i].get(j, 0.0) < redundancy for j in chosen):
+            chosen.append(i)
+            if len(chosen) == max_sentences:
+                break
+    chosen.sort()
+    sources = list(dict.fromkeys(sentences[i][0] for i in chosen))
+    return " ".join(sentences[i][1] for i in chosen), sources
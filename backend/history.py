@@ -0,0 +1,100 @@
+import os
+import re
+from functools import lru_cache
+from backend.tokens import count_tokens, trim_to_tokens
+
+# Rough per-message overhead (role label, separators) in tokens
+MESSAGE_OVERHEAD = 4
+SUMMARY_HEADER = "Summary of earlier conversation:"
+
+# Token budget for history per provider; override with <PROVIDER>_HISTORY_TOKENS
+DEFAULT_HISTORY_BUDGETS = {
+    "openai": 2000,
+    "cohere": 1500,
+    "gemini": 1500,
+}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+def history_budget(provider: str) -> int:
+    default = DEFAULT_HISTORY_BUDGETS.get(provider.lower(), int(os.getenv("HISTORY_TOKEN_BUDGET", "1500")))
+    return int(os.getenv(f"{provider.upper()}_HISTORY_TOKENS", default))
+
+def _role(message: dict) -> str:
+    return "ai" if message.get("role") == "ai" else "user"
+
+@lru_cache(maxsize=4096)
+def _digest(role: str, content: str, max_words: int = 30) -> str:
+    """One line standing in for an older turn: its first sentence, capped at `max_words`."""
+    first = _SENTENCE_END.split(" ".join(content.split()), 1)[0]
+    words = first.split()
+    if len(words) > max_words:
+        first = " ".join(words[:max_words]) + " ..."
+    return f"- {'AI' if role == 'ai' else 'User'}: {first}"
+
+def compact_history(history: list[dict] | None, budget: int, max_verbatim: int | None = None,
+                    provider: str | None = None) -> tuple[str | None, list[dict]]:
+    """Fit `history` into `budget` tokens as (rolling summary, recent turns kept verbatim).
+
+    The newest turns are kept word for word while they fit in three quarters
+    of the budget (and number at most `max_verbatim`); everything older
+    collapses into one-line digests, newest first, until the rest of the
+    budget is used. History that already fits is returned unchanged with no
+    summary. Runs in one pass over the turns.
+    """
+    history = history or []
+    if max_verbatim is None:
+        max_verbatim = int(os.getenv("HISTORY_MAX_VERBATIM_TURNS", "8"))
+    costs = [count_tokens(str(m.get("content", "")), provider) + MESSAGE_OVERHEAD for m in history]
+    if sum(costs) <= budget and len(history) <= max_verbatim:
+        return None, history
+
+    verbatim_budget = budget * 3 // 4
+    used = 0
+    split = len(history)
+    while split > 0 and len(history) - split < max_verbatim and used + costs[split - 1] <= verbatim_budget:
+        split -= 1
+        used += costs[split]
+    kept = history[split:]
+    if not kept and history:
+        # Even the last turn is too long on its own: keep as much of it as fits
+        last = history[-1]
+        content = trim_to_tokens(str(last.get("content", "")), verbatim_budget - MESSAGE_OVERHEAD, provider)
+        kept = [{**last, "content": content}]
+        used = count_tokens(content, provider) + MESSAGE_OVERHEAD
+        split = len(history) - 1
+
+    remaining = budget - used - count_tokens(SUMMARY_HEADER, provider)
+    lines = []
+    for m in reversed(history[:split]):
+        line = _digest(_role(m), str(m.get("content", "")))
+        cost = count_tokens(line, provider) + 1
+        if cost > remaining:
+            break
+        lines.append(line)
+        remaining -= cost
+    if not lines:
+        return None, kept
+    lines.reverse()
+    return "\n".join([SUMMARY_HEADER, *lines]), kept
+
+def build_prompt(history: list[dict] | None, query: str, budget: int, provider: str | None = None) -> str:
+    """Plain-text "User:/AI:" prompt for completion-style APIs, built with a single join."""
+    summary, kept = compact_history(history, budget, provider=provider)
+    parts = [summary + "\n"] if summary else []
+    for m in kept:
+        parts.append(f"{'AI' if _role(m) == 'ai' else 'User'}: {m.get('content', '')}\n")
+    parts.append(f"User: {query}\nAI:")
+    return "".join(parts)
+
+def build_messages(history: list[dict] | None, query: str, budget: int, system: str | None = None,
+                   provider: str | None = None) -> list[dict]:
+    """Chat-style messages; the rolling summary rides along as a system message."""
+    summary, kept = compact_history(history, budget, provider=provider)
+    messages = [{"role": "system", "content": system}] if system else []
+    if summary:
+        messages.append({"role": "system", "content": summary})
+    for m in kept:
+        messages.append({"role": "assistant" if _role(m) == "ai" else "user", "content": m.get("content", "")})
+    messages.append({"role": "user", "content": query})
+    return messages
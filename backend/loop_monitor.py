@@ -0,0 +1,64 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+class LoopLagMonitor:
+    """Measure event-loop lag: how late a sleep of `interval` seconds wakes up.
+
+    Anything that blocks the loop (CPU-heavy work, sync I/O) shows up here as
+    lag, which is added latency for every request in flight at the time.
+    """
+
+    def __init__(self, interval: float = 0.1, window: int = 600):
+        self.interval = interval
+        self._samples: deque[float] = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.record(time.perf_counter() - start - self.interval)
+
+    def record(self, lag: float):
+        lag = max(0.0, lag)
+        self._samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+
+    def quantile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def reset(self):
+        self._samples.clear()
+        self.max_lag = 0.0
+
+    def stats(self) -> dict:
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+        return {
+            "samples": len(self._samples),
+            "p50_ms": ms(self.quantile(0.5)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max_lag),
+        }
+
+def monitor_from_env() -> LoopLagMonitor:
+    return LoopLagMonitor(interval=float(os.getenv("LOOP_LAG_INTERVAL_MS", "100")) / 1000)
@@ -1,15 +1,56 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import Literal
 import os
-import httpx
+import json
+import time
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-import openai
 import asyncio
+from contextlib import aclosing, asynccontextmanager
+from backend.clients import base_url, registry, provider_client, openai_client
+from backend.model_cache import ModelCache
+from backend.cache import ResponseCache, cache_key
+from backend.disk_cache import DiskCache
+from backend.singleflight import SingleFlight
+from backend.semantic_cache import SemanticIndex, jaccard, key_facts, shingles
+from backend.extractive import extractive_summary
+from backend.loop_monitor import monitor_from_env
+from backend import metrics, tracing
+from backend.tracing import span
+from backend.history import build_messages, build_prompt, history_budget
+from backend.streaming import cohere_delta, gemini_delta, iter_ndjson, iter_sse_json
+from backend.tokens import context_window, count_tokens, fit_texts, trim_to_tokens
+from backend.errors import ProviderError, classify_error, negative_ttl, retry_after
+from backend.admission import Overloaded, admission_from_env
+from backend.batch import iter_lines, run_batch
+from backend.resilience import REQUEST_DEADLINE, RetryPolicy, breaker_from_env, limiter_from_env
 
 load_dotenv()
 
-app = FastAPI(title="Multi AI Summarizer")
+# Event-loop lag sampler, reported under /stats
+LOOP_LAG = monitor_from_env()
+# Finished request traces go to TRACE_EXPORT_PATH / TRACE_OTLP_ENDPOINT when either is set
+TRACE_EXPORTER = tracing.exporter_from_env()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pooled per-provider HTTP clients live as long as the app
+    registry.start()
+    LOOP_LAG.start()
+    try:
+        yield
+    finally:
+        await LOOP_LAG.stop()
+        await registry.aclose()
+        if DISK_CACHE is not None:
+            DISK_CACHE.close()
+        if TRACE_EXPORTER is not None:
+            TRACE_EXPORTER.close()
+
+app = FastAPI(title="Multi AI Summarizer", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -20,242 +61,1157 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ---------------- Metrics ----------------
+# Prometheus text format at GET /metrics; cache and queue figures are read at scrape time
+METRICS = metrics.Registry()
+METRIC_ROUTES = frozenset({"/ask", "/ask/stream", "/ask/batch", "/stats", "/health/providers", "/metrics"})
+HTTP_IN_FLIGHT = METRICS.gauge("http_requests_in_flight", "Requests being served (streams until their last chunk).",
+                               ("path",))
+HTTP_REQUESTS = METRICS.counter("http_requests_total", "Requests served.", ("path", "method", "status"))
+HTTP_DURATION = METRICS.histogram("http_request_duration_seconds", "Time to serve a request.", ("path",))
+HTTP_BODY_SIZE = METRICS.histogram("http_request_body_bytes", "Request body size (Content-Length).", ("path",),
+                                   buckets=metrics.SIZE_BUCKETS)
+app.add_middleware(
+    metrics.MetricsMiddleware,
+    in_flight=HTTP_IN_FLIGHT,
+    requests=HTTP_REQUESTS,
+    duration=HTTP_DURATION,
+    body_size=HTTP_BODY_SIZE,
+    routes=METRIC_ROUTES,
+)
+# Per-request traces: X-Request-ID, Server-Timing and phase spans (see backend.tracing)
+if os.getenv("TRACING", "1").lower() not in ("0", "false", "no"):
+    app.add_middleware(
+        tracing.TracingMiddleware,
+        routes=frozenset({"/ask", "/ask/stream", "/ask/batch"}),
+        exporter=TRACE_EXPORTER,
+        server_timing=os.getenv("TRACE_SERVER_TIMING", "1").lower() not in ("0", "false", "no"),
+        max_spans=int(os.getenv("TRACE_MAX_SPANS", "1000")),
+    )
+
 class QueryRequest(BaseModel):
     query: str
     providers: list[str]
     history: list[dict] | None = None
+    # Latency budget for provider calls; unset means wait for every provider
+    deadline_ms: int | None = Field(default=None, gt=0)
+    # Keep waiting past the deadline until at least this many providers answered
+    min_quorum: int = Field(default=1, ge=0)
+    # Let timed-out calls finish in the background so their answers land in the cache
+    continue_late: bool = True
+    # "local" merges the responses with the built-in extractive summarizer instead of calling an LLM
+    summary_mode: Literal["auto", "local"] = "auto"
+    # /ask/stream: start summarizing once this many providers answered instead of waiting for all
+    summary_quorum: int | None = Field(default=None, ge=0)
+    # /ask/stream: fold responses that arrive after the summary started into it, or list them below it
+    late_responses: Literal["refine", "addenda"] = "addenda"
+    # /ask/stream: forward provider tokens as `provider_delta` events as they arrive
+    stream_tokens: bool = False
+
+# Optional on-disk second tier, shared by all workers on the host and surviving restarts
+DISK_CACHE = DiskCache(
+    os.getenv("CACHE_DB_PATH"),
+    max_bytes=int(os.getenv("CACHE_DB_MAX_BYTES", str(256 * 1024 * 1024))),
+) if os.getenv("CACHE_DB_PATH") else None
+CACHE = ResponseCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl=float(os.getenv("CACHE_TTL", "3600")),
+    compress=os.getenv("CACHE_COMPRESS", "0").lower() in ("1", "true", "yes"),
+    backing=DISK_CACHE,
+)
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+# Failures live in their own short-TTL cache so a transient error is retried soon
+NEGATIVE_CACHE = ResponseCache(max_entries=int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "512")))
+
+# Model and generation parameters per provider; part of every cache key
+PROVIDER_MODELS = {"cohere": "command", "openai": "gpt-3.5-turbo"}
+PROVIDER_PARAMS = {
+    "gemini": {"temperature": 0.4, "candidate_count": 1},
+    "cohere": {"max_tokens": 300, "temperature": 0.4},
+    "openai": {"temperature": 0.4, "max_tokens": 500},
+}
+
+def provider_cache_key(query: str, provider: str, history: list[dict] | None = None,
+                       model: str | None = None) -> str:
+    # `model` overrides the provider's usual model (e.g. streamed Gemini runs on another one)
+    if model is None:
+        model = PROVIDER_MODELS.get(provider)
+        if provider == "gemini":
+            model = os.getenv("GEMINI_MODEL") or "auto"
+    return cache_key(provider, query, history, model, PROVIDER_PARAMS.get(provider))
+
+# Opt-in near-duplicate lookup so paraphrases ("what's python") reuse a cached answer. It points
+# into CACHE, so by default it holds no more entries than CACHE does
+SEMANTIC_CACHE = SemanticIndex(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES") or CACHE.max_entries),
+) if os.getenv("SEMANTIC_CACHE", "0").lower() in ("1", "true", "yes") else None
+# Only short user questions; long prompts (e.g. summary prompts) differ in ways n-grams can't see
+SEMANTIC_CACHE_MAX_CHARS = int(os.getenv("SEMANTIC_CACHE_MAX_CHARS", "512"))
 
-CACHE = {}
-def get_cached(query: str, provider: str):
-    return CACHE.get(f"{provider}_{query}")
-def set_cache(query: str, provider: str, response: str):
-    CACHE[f"{provider}_{query}"] = response
+def _semantic_context(provider: str, history: list[dict] | None, model: str | None = None) -> str:
+    # Everything except the query must match exactly: provider, model, params and history
+    return provider_cache_key("", provider, history, model)
+
+async def get_cached(query: str, provider: str, history: list[dict] | None = None, model: str | None = None):
+    if not CACHE_ENABLED:
+        return None
+    with span("cache.lookup", provider=provider) as s:
+        key = provider_cache_key(query, provider, history, model)
+        # A disk-tier read (CACHE_DB_PATH) runs in a thread so SQLite never stalls the loop
+        cached = await CACHE.aget(key) or NEGATIVE_CACHE.get(key)
+        if cached is None and SEMANTIC_CACHE is not None and len(query) <= SEMANTIC_CACHE_MAX_CHARS:
+            match = SEMANTIC_CACHE.lookup(_semantic_context(provider, history, model), query)
+            if match:
+                cached = await CACHE.aget(match[0])
+                if cached is None:
+                    # The answer it pointed to was evicted or expired
+                    SEMANTIC_CACHE.invalidate(match[0])
+        s.set("hit", cached is not None)
+    return cached
+
+def set_cache(query: str, provider: str, response: str, history: list[dict] | None = None,
+              model: str | None = None):
+    if CACHE_ENABLED:
+        key = provider_cache_key(query, provider, history, model)
+        CACHE.set(key, response)
+        if SEMANTIC_CACHE is not None and len(query) <= SEMANTIC_CACHE_MAX_CHARS:
+            SEMANTIC_CACHE.add(_semantic_context(provider, history, model), query, key)
+def set_negative_cache(query: str, provider: str, response: str, error_class: str, history: list[dict] | None = None,
+                       model: str | None = None, retry_after: float | None = None):
+    if CACHE_ENABLED:
+        NEGATIVE_CACHE.set(provider_cache_key(query, provider, history, model), response,
+                           ttl=negative_ttl(error_class, retry_after))
+
+INFLIGHT = SingleFlight()
+
+# Global admission control for /ask and /ask/stream: bounded concurrency plus a bounded wait queue
+ADMISSION = admission_from_env("ask", "ASK", max_concurrent=32, max_queue=64)
+
+def overloaded_response(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail="Server busy, please retry shortly",
+                         headers={"Retry-After": str(e.retry_after)})
+
+# Server-wide default latency budget for /ask when the request doesn't set one
+ASK_DEADLINE_MS = int(os.getenv("ASK_DEADLINE_MS", "0")) or None
 
 def simulate_response(provider: str, query: str) -> str:
     return f"[{provider} simulated response for query: '{query}'] ⚠️ Provider not accessible in free mode."
 
-# ---------------- Providers ----------------
-async def call_gemini(query: str, history: list[dict] = None) -> str:
-    cached = get_cached(query, "gemini")
-    if cached:
-        return cached
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        response = "⚠️ Gemini API key missing. Set GEMINI_API_KEY in .env"
-        set_cache(query, "gemini", response)
-        return response
-    try:
-        # If Gemini supports history, concatenate history into the prompt
-        prompt = ""
-        if history:
-            for m in history:
-                role = "AI" if m.get("role") == "ai" else "User"
-                prompt += f"{role}: {m.get('content','')}\n"
-        prompt += f"User: {query}\nAI:"
-        url_models = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
-        async with httpx.AsyncClient(timeout=30) as client:
+# ---------------- Gemini model discovery ----------------
+GEMINI_MODELS = ModelCache(ttl=float(os.getenv("GEMINI_MODEL_CACHE_TTL", "3600")))
+
+async def discover_gemini_model(api_key: str) -> str | None:
+    """Pick the first model that supports generateText (one GET /v1beta/models)."""
+    url_models = f"{base_url('gemini')}/models?key={api_key}"
+    with span("gemini.list_models"):
+        async with provider_client("gemini") as client:
             r = await client.get(url_models)
             r.raise_for_status()
             models = r.json().get("models", [])
-        model_name = None
-        for m in models:
-            if "generateText" in m.get("supportedGenerationMethods", []):
-                model_name = m["name"]
-                break
-        if not model_name:
-            response = "⚠️ Gemini no accessible text-generation model."
-            set_cache(query, "gemini", response)
-            return response
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateText?key={api_key}"
-        payload = {"prompt": {"text": prompt}, "temperature": 0.4, "candidate_count": 1}
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.post(url, json=payload)
-            r.raise_for_status()
-            data = r.json()
-            candidates = data.get("candidates")
-            if candidates:
-                response = candidates[0].get("content", "[Gemini returned empty]")
-            else:
-                response = "[Gemini returned no candidates]"
-    except Exception as e:
-        response = f"⚠️ Gemini call failed: {str(e)}"
-    set_cache(query, "gemini", response)
-    return response
+    for m in models:
+        if "generateText" in m.get("supportedGenerationMethods", []):
+            return m["name"].removeprefix("models/")
+    return None
 
-async def call_cohere(query: str, history: list[dict] = None) -> str:
-    cached = get_cached(query, "cohere")
+async def get_gemini_model(api_key: str) -> str | None:
+    # GEMINI_MODEL pins the model and skips discovery entirely
+    pinned = os.getenv("GEMINI_MODEL")
+    if pinned:
+        return pinned.removeprefix("models/")
+    return await GEMINI_MODELS.get(api_key, lambda: discover_gemini_model(api_key))
+
+# ---------------- Providers ----------------
+PROVIDER_LABELS = {"gemini": "Gemini", "cohere": "Cohere", "openai": "OpenAI"}
+# Failures that say something about provider health (not our request) feed the breakers and are retried
+BREAKER_ERROR_CLASSES = {"timeout", "server", "connection", "rate_limit"}
+BREAKERS = {provider: breaker_from_env(provider) for provider in PROVIDER_LABELS}
+LIMITERS = {provider: limiter_from_env(provider) for provider in PROVIDER_LABELS}
+RETRY = RetryPolicy.from_env()
+# Bound concurrent upstream calls per provider; excess callers queue (bounded) instead of piling on
+PROVIDER_SLOTS = {
+    provider: admission_from_env(provider, provider.upper(), max_concurrent=16, max_queue=64)
+    for provider in PROVIDER_LABELS
+}
+# outcome is "success", "cached", an error class (see backend.errors) or a local refusal
+PROVIDER_CALLS = METRICS.counter("provider_calls_total", "Provider calls by final outcome.", ("provider", "outcome"))
+PROVIDER_LATENCY = METRICS.histogram("provider_attempt_duration_seconds",
+                                     "Upstream provider attempts (each retry counts), by outcome.",
+                                     ("provider", "outcome"))
+
+async def provider_call(provider: str, query: str, history: list[dict] | None, fetch) -> str:
+    """Shared path for real providers: cache, key check, single-flight, then `fetch`."""
+    label = PROVIDER_LABELS[provider]
+    cached = await get_cached(query, provider, history)
     if cached:
+        PROVIDER_CALLS.inc(provider, "cached")
         return cached
-    api_key = os.getenv("COHERE_API_KEY")
+    env_key = f"{provider.upper()}_API_KEY"
+    api_key = os.getenv(env_key)
     if not api_key:
-        response = "⚠️ Cohere API key missing. Set COHERE_API_KEY in .env"
-        set_cache(query, "cohere", response)
+        # Not cached: the key check is free and should pick up a newly set key
+        PROVIDER_CALLS.inc(provider, "missing_key")
+        return f"⚠️ {label} API key missing. Set {env_key} in .env"
+    # Identical concurrent calls share one upstream request
+    with span(f"provider.{provider}"):
+        return await INFLIGHT.do(
+            provider_cache_key(query, provider, history),
+            lambda: _guarded_fetch(provider, query, history, api_key, fetch),
+        )
+
+def _max_output_tokens(provider: str) -> int:
+    return PROVIDER_PARAMS.get(provider.lower(), {}).get("max_tokens", 1024)
+
+def query_budget(provider: str) -> int:
+    """Tokens left for the query once history and the completion are reserved in the context window."""
+    reserved = history_budget(provider) + _max_output_tokens(provider) + 64  # 64: role labels, system prompt
+    return max(256, context_window(provider) - reserved)
+
+def _fit_query(provider: str, query: str) -> str:
+    # Checked locally so an oversized prompt is trimmed instead of failing after a full round-trip
+    budget = query_budget(provider)
+    if count_tokens(query, provider) <= budget:
+        return query
+    return trim_to_tokens(query, budget, provider)
+
+def prompt_tokens(provider: str, query: str, history: list[dict] | None) -> int:
+    """Estimated input tokens for a call: compacted history plus the (trimmed) query."""
+    provider = provider.lower()
+    return count_tokens(build_prompt(history, _fit_query(provider, query), history_budget(provider), provider), provider)
+
+def _estimate_request_tokens(provider: str, query: str, history: list[dict] | None) -> int:
+    # Prompt size plus the completion budget, for the TPM bucket
+    return prompt_tokens(provider, query, history) + PROVIDER_PARAMS.get(provider, {}).get("max_tokens", 0)
+
+class _Upstream:
+    """Breaker, rate limiting, concurrency slot, retries and outcome bookkeeping for one provider call.
+
+    Shared by _guarded_fetch and provider_stream, which differ only in how
+    the answer arrives. Each loop iteration is one attempt: admit() it, run
+    the fetch inside slot(), then report succeeded(), overloaded(), release()
+    (cancelled) or retry() followed by failed() when it gives up.
+    """
+
+    def __init__(self, provider: str, query: str, history: list[dict] | None, model: str | None = None):
+        self.provider = provider
+        self.label = PROVIDER_LABELS[provider]
+        self.query = query
+        self.history = history
+        self.model = model
+        self.breaker = BREAKERS[provider]
+        self.deadline = REQUEST_DEADLINE.get()
+        self.attempt = 0
+        self.start = 0.0
+        self.error_class = None
+        self.wait = None
+
+    async def admit(self) -> str | None:
+        """Start the next attempt, or return the "⚠️" answer if the breaker or rate limiter refuses it."""
+        if not self.breaker.allow():
+            # Fail fast while the provider is known bad; not cached so recovery is seen at once
+            PROVIDER_CALLS.inc(self.provider, "circuit_open")
+            return f"⚠️ {self.label} temporarily unavailable (circuit open)"
+        tokens = _estimate_request_tokens(self.provider, self.query, self.history)
+        if not await LIMITERS[self.provider].acquire(tokens, self.deadline):
+            self.breaker.release()
+            PROVIDER_CALLS.inc(self.provider, "throttled")
+            return f"⚠️ {self.label} rate limit reached (throttled locally)"
+        self.attempt += 1
+        self.start = time.perf_counter()
+        return None
+
+    @asynccontextmanager
+    async def slot(self):
+        # Queue for a concurrency slot only as long as the deadline allows; latency counts from getting one
+        wait_budget = self.deadline - time.monotonic() if self.deadline is not None else None
+        async with PROVIDER_SLOTS[self.provider].slot(wait_budget):
+            self.start = time.perf_counter()
+            yield
+
+    def release(self):
+        """The attempt ended without an outcome (cancelled)."""
+        self.breaker.release()
+
+    def overloaded(self) -> str:
+        self.breaker.release()
+        PROVIDER_CALLS.inc(self.provider, "overloaded")
+        return f"⚠️ {self.label} overloaded (too many concurrent calls)"
+
+    async def retry(self, e: Exception, retryable: bool = True) -> bool:
+        """Record a failed attempt; True (after the backoff) if it should be tried again."""
+        elapsed = time.perf_counter() - self.start
+        self.error_class = classify_error(e)
+        self.wait = retry_after(e)
+        PROVIDER_LATENCY.observe(elapsed, self.provider, self.error_class)
+        if self.error_class not in BREAKER_ERROR_CLASSES:
+            # Our request's fault (auth, 4xx): says nothing about provider health or latency
+            self.breaker.release()
+            return False
+        self.breaker.record_failure(elapsed)
+        # None: the provider asked for a longer wait than we retry for
+        delay = RETRY.delay(self.attempt, self.wait)
+        in_budget = delay is not None and (self.deadline is None or time.monotonic() + delay < self.deadline)
+        if not (retryable and self.attempt < RETRY.max_attempts and in_budget):
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    def failed(self, e: Exception) -> str:
+        """The "⚠️" answer for a failure retry() gave up on; negatively cached."""
+        response = f"⚠️ {self.label} call failed: {str(e)}"
+        set_negative_cache(self.query, self.provider, response, self.error_class, self.history, self.model, self.wait)
+        PROVIDER_CALLS.inc(self.provider, self.error_class)
         return response
-    # If Cohere supports history, concatenate history into the prompt
-    prompt = ""
-    if history:
-        for m in history:
-            role = "AI" if m.get("role") == "ai" else "User"
-            prompt += f"{role}: {m.get('content','')}\n"
-    prompt += f"User: {query}\nAI:"
-    url = "https://api.cohere.ai/v1/generate"
+
+    def succeeded(self, response: str):
+        elapsed = time.perf_counter() - self.start
+        PROVIDER_LATENCY.observe(elapsed, self.provider, "success")
+        PROVIDER_CALLS.inc(self.provider, "success")
+        self.breaker.record_success(elapsed)
+        set_cache(self.query, self.provider, response, self.history, self.model)
+
+async def _guarded_fetch(provider: str, query: str, history: list[dict] | None, api_key: str, fetch) -> str:
+    """Breaker check, rate limiting and retries around one upstream call, all within the request deadline."""
+    call = _Upstream(provider, query, history)
+    while True:
+        if refused := await call.admit():
+            return refused
+        try:
+            with span(f"upstream.{provider}", attempt=call.attempt):
+                async with call.slot():
+                    response = await fetch(_fit_query(provider, query), history, api_key)
+        except Overloaded:
+            return call.overloaded()
+        except asyncio.CancelledError:
+            call.release()
+            raise
+        except Exception as e:
+            if await call.retry(e):
+                continue
+            return call.failed(e)
+        call.succeeded(response)
+        return response
+
+async def call_gemini(query: str, history: list[dict] = None) -> str:
+    return await provider_call("gemini", query, history, _fetch_gemini)
+
+async def _fetch_gemini(query: str, history: list[dict] | None, api_key: str) -> str:
+    # Recent turns verbatim, older ones folded into a summary, within the token budget
+    prompt = build_prompt(history, query, history_budget("gemini"), "gemini")
+    model_name = await get_gemini_model(api_key)
+    if not model_name:
+        raise ProviderError("no accessible text-generation model")
+    url = f"{base_url('gemini')}/models/{model_name}:generateText?key={api_key}"
+    payload = {"prompt": {"text": prompt}, **PROVIDER_PARAMS["gemini"]}
+    async with provider_client("gemini") as client:
+        r = await client.post(url, json=payload)
+        r.raise_for_status()
+        data = r.json()
+    candidates = data.get("candidates")
+    if candidates:
+        return candidates[0].get("content", "[Gemini returned empty]")
+    return "[Gemini returned no candidates]"
+
+async def call_cohere(query: str, history: list[dict] = None) -> str:
+    return await provider_call("cohere", query, history, _fetch_cohere)
+
+async def _fetch_cohere(query: str, history: list[dict] | None, api_key: str) -> str:
+    # Recent turns verbatim, older ones folded into a summary, within the token budget
+    prompt = build_prompt(history, query, history_budget("cohere"), "cohere")
+    url = f"{base_url('cohere')}/generate"
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    payload = {"model": "command", "prompt": prompt, "max_tokens": 300, "temperature": 0.4}
-    try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.post(url, headers=headers, json=payload)
-            r.raise_for_status()
-            data = r.json()
-            gens = data.get("generations")
-            if gens:
-                response = gens[0].get("text", "[Cohere returned empty]").strip()
-            else:
-                response = "[Cohere returned no generations]"
-    except Exception as e:
-        response = f"⚠️ Cohere call failed: {str(e)}"
-    set_cache(query, "cohere", response)
-    return response
+    payload = {"model": PROVIDER_MODELS["cohere"], "prompt": prompt, **PROVIDER_PARAMS["cohere"]}
+    async with provider_client("cohere") as client:
+        r = await client.post(url, headers=headers, json=payload)
+        r.raise_for_status()
+        data = r.json()
+    gens = data.get("generations")
+    if gens:
+        return gens[0].get("text", "[Cohere returned empty]").strip()
+    return "[Cohere returned no generations]"
 
 async def call_openai(query: str, history: list[dict]) -> str:
-    cached = get_cached(query, "openai")
-    if cached:
-        return cached
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        response = "⚠️ OpenAI API key missing. Set OPENAI_API_KEY in .env"
-        set_cache(query, "openai", response)
-        return response
-    try:
-        #openai.api_key = api_key
-        client = openai.OpenAI(api_key=api_key)
-        # Prompt engineered for concise high-quality summary
-        messages = [{"role":"system","content":"Answer concisely and clearly, covering all critical points, avoid verbosity. Use short sentences."}]
-        for m in (history or []):
-            role = "assistant" if m.get("role")=="ai" else "user"
-            messages.append({"role": role, "content": m.get("content","")})
-        messages.append({"role":"user","content":query})
-        response_obj = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+    return await provider_call("openai", query, history, _fetch_openai)
+
+# Prompt engineered for concise high-quality answers; shared by the regular and streaming calls
+OPENAI_SYSTEM_PROMPT = "Answer concisely and clearly, covering all critical points, avoid verbosity. Use short sentences."
+
+async def _fetch_openai(query: str, history: list[dict] | None, api_key: str) -> str:
+    messages = build_messages(
+        history, query, history_budget("openai"),
+        system=OPENAI_SYSTEM_PROMPT,
+        provider="openai",
+    )
+    # Async client so the round-trip doesn't block the event loop
+    async with openai_client(api_key) as client:
+        response_obj = await client.chat.completions.create(
+            model=PROVIDER_MODELS["openai"],
             messages=messages,
-            temperature=0.4,
-            max_tokens=500
+            **PROVIDER_PARAMS["openai"]
         )
-        response = response_obj.choices[0].message.content.strip()
-    except Exception as e:
-        response = f"⚠️ OpenAI call failed: {str(e)}"
-    set_cache(query, "openai", response)
-    return response
+    return response_obj.choices[0].message.content.strip()
 
 async def call_claude(query: str, history: list[dict] = None) -> str:
-    cached = get_cached(query, "claude")
+    cached = await get_cached(query, "claude", history)
     if cached:
         return cached
     # Simulate Claude, but you can add history logic if API supports it
     response = simulate_response("Claude", query)
-    set_cache(query, "claude", response)
+    set_cache(query, "claude", response, history)
     return response
 
 async def call_perplexity(query: str, history: list[dict] = None) -> str:
-    cached = get_cached(query, "perplexity")
+    cached = await get_cached(query, "perplexity", history)
     if cached:
         return cached
     # Simulate Perplexity, but you can add history logic if API supports it
     response = simulate_response("Perplexity", query)
-    set_cache(query, "perplexity", response)
+    set_cache(query, "perplexity", response, history)
     return response
 
+# ---------------- Streaming adapters ----------------
+# generateText has no streaming form, so Gemini streams through generateContent on this model
+GEMINI_STREAM_MODEL = os.getenv("GEMINI_STREAM_MODEL", "gemini-1.5-flash")
+# Streams answered by a different model than the regular call get their own cache entries
+STREAM_CACHE_MODELS = {"gemini": GEMINI_STREAM_MODEL}
+
+async def _stream_gemini(query: str, history: list[dict] | None, api_key: str):
+    prompt = build_prompt(history, query, history_budget("gemini"), "gemini")
+    params = PROVIDER_PARAMS["gemini"]
+    url = (f"{base_url('gemini')}/models/{GEMINI_STREAM_MODEL}"
+           f":streamGenerateContent?alt=sse&key={api_key}")
+    payload = {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {"temperature": params["temperature"], "candidateCount": params["candidate_count"]},
+    }
+    async with provider_client("gemini") as client:
+        async with client.stream("POST", url, json=payload) as r:
+            r.raise_for_status()
+            async for chunk in iter_sse_json(r):
+                if delta := gemini_delta(chunk):
+                    yield delta
+
+async def _stream_cohere(query: str, history: list[dict] | None, api_key: str):
+    prompt = build_prompt(history, query, history_budget("cohere"), "cohere")
+    url = f"{base_url('cohere')}/generate"
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    payload = {"model": PROVIDER_MODELS["cohere"], "prompt": prompt, "stream": True, **PROVIDER_PARAMS["cohere"]}
+    async with provider_client("cohere") as client:
+        async with client.stream("POST", url, headers=headers, json=payload) as r:
+            r.raise_for_status()
+            async for event in iter_ndjson(r):
+                if delta := cohere_delta(event):
+                    yield delta
+
+async def _stream_openai(query: str, history: list[dict] | None, api_key: str):
+    messages = build_messages(
+        history, query, history_budget("openai"),
+        system=OPENAI_SYSTEM_PROMPT,
+        provider="openai",
+    )
+    async with openai_client(api_key) as client:
+        stream = await client.chat.completions.create(
+            model=PROVIDER_MODELS["openai"],
+            messages=messages,
+            stream=True,
+            **PROVIDER_PARAMS["openai"]
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+async def provider_stream(provider: str, query: str, history: list[dict] | None, stream_fetch):
+    """Streaming counterpart of provider_call: yield text deltas as the provider produces them.
+
+    Cache hits and failures before the first token come through as a single
+    chunk (failures as the usual "⚠️" message). Retries only happen before
+    the first token; a stream that breaks later ends with a "⚠️" note and
+    is not cached. The completed text is cached like a regular answer.
+    """
+    label = PROVIDER_LABELS[provider]
+    model = STREAM_CACHE_MODELS.get(provider)
+    cached = await get_cached(query, provider, history, model)
+    if cached:
+        PROVIDER_CALLS.inc(provider, "cached")
+        yield cached
+        return
+    env_key = f"{provider.upper()}_API_KEY"
+    api_key = os.getenv(env_key)
+    if not api_key:
+        PROVIDER_CALLS.inc(provider, "missing_key")
+        yield f"⚠️ {label} API key missing. Set {env_key} in .env"
+        return
+    call = _Upstream(provider, query, history, model)
+    parts = []
+    while True:
+        if refused := await call.admit():
+            yield refused
+            return
+        try:
+            async with call.slot():
+                async for delta in stream_fetch(_fit_query(provider, query), history, api_key):
+                    parts.append(delta)
+                    yield delta
+        except Overloaded:
+            yield call.overloaded()
+            return
+        except (asyncio.CancelledError, GeneratorExit):
+            call.release()
+            raise
+        except Exception as e:
+            # Once tokens went out the attempt can't be repeated
+            if await call.retry(e, retryable=not parts):
+                continue
+            if parts:
+                PROVIDER_CALLS.inc(provider, "interrupted")
+                yield f"\n\n⚠️ {label} stream interrupted: {str(e)}"
+                return
+            yield call.failed(e)
+            return
+        call.succeeded("".join(parts))
+        return
+
+STREAM_FETCHERS = {"gemini": _stream_gemini, "cohere": _stream_cohere, "openai": _stream_openai}
+
+async def _single_chunk(coro):
+    yield await coro
+
+def stream_provider(provider: str, query: str, history: list[dict] | None):
+    """Async iterator of text deltas for `provider`; providers without streaming yield one chunk."""
+    p_lower = provider.lower()
+    if p_lower in STREAM_FETCHERS:
+        return provider_stream(p_lower, query, history, STREAM_FETCHERS[p_lower])
+    return _single_chunk(call_provider(provider, query, history))
+
 # Helper function to generate AI-powered summary
-async def generate_ai_summary(responses: dict, original_query: str) -> str:
-    """Generate a unified summary using available AI providers in priority order"""
-    valid_responses = {k: v for k, v in responses.items() if not v.startswith("⚠️")}
-    
-    if not valid_responses:
-        return "⚠️ No valid responses received to summarize."
-    
-    # Create summarization prompt
-    responses_text = ""
-    for provider, response in valid_responses.items():
-        responses_text += f"**{provider}**: {response}\n\n"
-    
-    summary_prompt = f"""Please provide a unified, comprehensive summary based on these AI responses to the question: "{original_query}"
+SUMMARY_PROMPT = """Please provide a unified, comprehensive summary based on these AI responses to the question: "{query}"
 
 AI Responses:
-{responses_text}
+{responses}
 
 Create a cohesive summary that combines the key insights from all responses, eliminates redundancy, and provides the most accurate and complete answer possible. Keep it concise but comprehensive."""
 
-    # Try providers in priority order: OpenAI -> Cohere -> Gemini
-    summary_providers = [
-        ("openai", call_openai),
-        ("cohere", call_cohere), 
-        ("gemini", call_gemini)
+def build_summary_prompt(responses: dict, original_query: str, provider: str) -> str:
+    """Summary prompt trimmed to fit `provider`'s context window; long responses are cut first."""
+    budget = query_budget(provider)
+    query = trim_to_tokens(original_query, budget // 4, provider)
+    overhead = count_tokens(SUMMARY_PROMPT.format(query=query, responses=""), provider)
+    labels = sum(count_tokens(f"**{p}**: \n\n", provider) for p in responses)
+    fitted = fit_texts(responses, budget - overhead - labels, provider)
+    responses_text = "".join(f"**{p}**: {r}\n\n" for p, r in fitted.items())
+    return SUMMARY_PROMPT.format(query=query, responses=responses_text)
+
+# Responses at least this similar (character-trigram Jaccard) are treated as saying the same thing
+SUMMARY_SKIP_SIMILARITY = float(os.getenv("SUMMARY_SKIP_SIMILARITY", "0.85"))
+LOCAL_SUMMARY_SENTENCES = int(os.getenv("LOCAL_SUMMARY_SENTENCES", "5"))
+
+def summary_decision(valid_responses: dict) -> dict:
+    """Decide locally whether the summarizer call would add anything.
+
+    One valid response is returned as is; responses that are all near-identical
+    (and state the same numbers and negations) are represented by the one most
+    similar to the rest. Otherwise summarize.
+    """
+    if not valid_responses:
+        return {"mode": "none", "reason": "no valid responses", "provider": None, "similarity": None}
+    if len(valid_responses) == 1:
+        provider = next(iter(valid_responses))
+        return {"mode": "single", "reason": "only one valid response", "provider": provider, "similarity": None}
+    grams = {p: shingles(r) for p, r in valid_responses.items()}
+    providers = list(grams)
+    totals = dict.fromkeys(providers, 0.0)
+    lowest = 1.0
+    for i, a in enumerate(providers):
+        for b in providers[i + 1:]:
+            score = jaccard(grams[a], grams[b])
+            totals[a] += score
+            totals[b] += score
+            lowest = min(lowest, score)
+    if lowest >= SUMMARY_SKIP_SIMILARITY:
+        # "Signed in 1919" and "signed in 1920" look near-identical but disagree
+        if len({key_facts(r) for r in valid_responses.values()}) > 1:
+            return {"mode": "llm", "reason": "responses differ in numbers or negations", "provider": None,
+                    "similarity": round(lowest, 3)}
+        # The medoid: closest to all the others (longest wins ties)
+        best = max(providers, key=lambda p: (totals[p], len(valid_responses[p])))
+        return {"mode": "consensus", "reason": f"all {len(providers)} responses are near-identical",
+                "provider": best, "similarity": round(lowest, 3)}
+    return {"mode": "llm", "reason": "responses differ", "provider": None, "similarity": round(lowest, 3)}
+
+def local_summary(valid_responses: dict, original_query: str, decision: dict, reason: str) -> tuple[str, dict]:
+    """Extractive summary with no network call; concatenation if there is nothing to condense."""
+    with span("summary.local"):
+        result = extractive_summary(valid_responses, original_query, max_sentences=LOCAL_SUMMARY_SENTENCES)
+    if result is None:
+        decision = {**decision, "mode": "concatenated", "reason": f"{reason}; responses too short to condense"}
+        return f"📝 **Combined Responses** (AI summarization unavailable):\n\n" + "\n\n---\n\n".join([f"**{k}**: {v}" for k, v in valid_responses.items()]), decision
+    text, sources = result
+    decision = {**decision, "mode": "local", "reason": reason}
+    return f"📝 **Extractive Summary** (local, from {', '.join(p.upper() for p in sources)}):\n\n{text}", decision
+
+# Looked up at call time so the provider functions can be swapped (e.g. patched in tests)
+SUMMARY_PROVIDERS = [
+    ("openai", lambda prompt, history: call_openai(prompt, history)),
+    ("cohere", lambda prompt, history: call_cohere(prompt, history)),
+    ("gemini", lambda prompt, history: call_gemini(prompt, history)),
+]
+# Start the next summarizer if the current one is slower than its p90 (0 = only on failure)
+SUMMARY_HEDGING = os.getenv("SUMMARY_HEDGING", "1").lower() in ("1", "true", "yes")
+SUMMARY_HEDGE_DEFAULT_MS = float(os.getenv("SUMMARY_HEDGE_DEFAULT_MS", "3000"))
+SUMMARY_HEDGE_MIN_MS = float(os.getenv("SUMMARY_HEDGE_MIN_MS", "250"))
+
+def hedge_delay(provider: str) -> float | None:
+    """Seconds to give `provider` before starting the next summarizer alongside it."""
+    if not SUMMARY_HEDGING:
+        return None
+    p90 = BREAKERS[provider].latency_quantile(0.9)
+    delay_ms = p90 * 1000 if p90 is not None else SUMMARY_HEDGE_DEFAULT_MS
+    return max(SUMMARY_HEDGE_MIN_MS, delay_ms) / 1000
+
+def summary_candidates() -> list:
+    """Summarizers worth trying now, in priority order: open circuits and missing keys are skipped."""
+    return [
+        (name, func) for name, func in SUMMARY_PROVIDERS
+        if BREAKERS[name].available() and os.getenv(f"{name.upper()}_API_KEY")
     ]
+
+async def _summary_attempt(provider: str, func, prompt: str) -> str | None:
+    try:
+        with span(f"summary.{provider}"):
+            summary = await func(prompt, [])
+    except Exception:
+        return None
+    return None if summary.startswith("⚠️") else summary
+
+async def hedged_summary(candidates: list, prompt_for):
+    """Race summarizers: start the first, add the next when it fails or outlives its hedge delay.
+
+    `prompt_for(provider)` builds the prompt for each summarizer as it starts.
+
+    Returns (provider, summary, summarizers started) for the first good
+    summary, cancelling the rest, or None if every summarizer failed.
+    """
+    pending: dict[asyncio.Task, str] = {}
+    queue = list(candidates)
+    launched = 0
+    launch_next = True
+    delay = None
+    try:
+        while queue or pending:
+            if queue and launch_next:
+                name, func = queue.pop(0)
+                pending[asyncio.ensure_future(_summary_attempt(name, func, prompt_for(name)))] = name
+                launched += 1
+                delay = hedge_delay(name)
+            done, _ = await asyncio.wait(pending, timeout=delay if queue else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            # Nothing finished within the hedge delay: start the next one alongside
+            launch_next = not done
+            for task in done:
+                name = pending.pop(task)
+                summary = task.result()
+                if summary is not None:
+                    return name, summary, launched
+                # A failure hands over at once instead of waiting out the hedge delay
+                launch_next = True
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+# provider: the summarizer for llm summaries, the response passed through for single/consensus
+SUMMARIES = METRICS.counter("summaries_total", "Summaries by decision mode and provider.", ("mode", "provider"))
+
+async def summarize(responses: dict, original_query: str, mode: str = "auto") -> tuple[str, dict]:
+    """Summary text plus the decision behind it (see summary_decision)."""
+    with span("summary") as s:
+        summary, decision = await _summarize(responses, original_query, mode)
+        s.set("mode", decision["mode"])
+    SUMMARIES.inc(decision["mode"], decision["provider"] or "none")
+    return summary, decision
+
+async def _summarize(responses: dict, original_query: str, mode: str) -> tuple[str, dict]:
+    valid_responses = {k: v for k, v in responses.items() if not v.startswith("⚠️")}
+    decision = summary_decision(valid_responses)
+    kind, provider = decision["mode"], decision["provider"]
+    if kind == "none":
+        return "⚠️ No valid responses received to summarize.", decision
+    if kind == "single":
+        return f"✅ **Single Response** (from {provider.upper()}):\n\n{valid_responses[provider]}", decision
+    if kind == "consensus":
+        others = ", ".join(p.upper() for p in valid_responses if p != provider)
+        return (f"✅ **Consensus Response** (from {provider.upper()}; {others} agree):\n\n"
+                f"{valid_responses[provider]}"), decision
+    if mode == "local":
+        return local_summary(valid_responses, original_query, decision, "summary_mode=local")
+
+    # Summarizers in priority order: OpenAI -> Cohere -> Gemini
+    candidates = summary_candidates()
+    if candidates:
+        result = await hedged_summary(
+            candidates, lambda name: build_summary_prompt(valid_responses, original_query, name))
+        if result is not None:
+            provider_name, summary, launched = result
+            decision = {**decision, "provider": provider_name, "summarizers_started": launched}
+            return f"🤖 **AI-Generated Summary** (via {provider_name.upper()}):\n\n{summary}", decision
     
-    for provider_name, provider_func in summary_providers:
-        try:
-            if provider_name == "openai" and os.getenv("OPENAI_API_KEY"):
-                summary = await provider_func(summary_prompt, [])
-                if not summary.startswith("⚠️"):
-                    return f"🤖 **AI-Generated Summary** (via {provider_name.upper()}):\n\n{summary}"
-            elif provider_name == "cohere" and os.getenv("COHERE_API_KEY"):
-                summary = await provider_func(summary_prompt, [])
-                if not summary.startswith("⚠️"):
-                    return f"🤖 **AI-Generated Summary** (via {provider_name.upper()}):\n\n{summary}"
-            elif provider_name == "gemini" and os.getenv("GEMINI_API_KEY"):
-                summary = await provider_func(summary_prompt, [])
-                if not summary.startswith("⚠️"):
-                    return f"🤖 **AI-Generated Summary** (via {provider_name.upper()}):\n\n{summary}"
-        except Exception as e:
-            continue
-    
-    # Fallback to simple concatenation if no AI summarizer is available
-    return f"📝 **Combined Responses** (AI summarization unavailable):\n\n" + "\n\n---\n\n".join([f"**{k}**: {v}" for k, v in valid_responses.items()])
+    # Fall back to the local extractive summary if no AI summarizer is available
+    return local_summary(valid_responses, original_query, decision, "no summarizer available")
+
+async def generate_ai_summary(responses: dict, original_query: str) -> str:
+    """Generate a unified summary using available AI providers in priority order"""
+    summary, _ = await summarize(responses, original_query)
+    return summary
 
 def summarize_responses(responses: dict, original_query: str = "") -> str:
     """Legacy function maintained for compatibility - now calls generate_ai_summary"""
-    # Simple fallback for synchronous calls
+    # Synchronous callers get the local extractive summary (no network)
     valid_texts = [v for v in responses.values() if not v.startswith("⚠️")]
     if not valid_texts:
         return "⚠️ No valid responses received."
     
-    # For synchronous calls, return simple concatenation
-    return "\n\n---\n\n".join([f"**{k}**: {v}" for k, v in responses.items() if not v.startswith("⚠️")])
+    valid_responses = {k: v for k, v in responses.items() if not v.startswith("⚠️")}
+    result = extractive_summary(valid_responses, original_query, max_sentences=LOCAL_SUMMARY_SENTENCES)
+    if result is not None:
+        return result[0]
+    # Too short to condense: return simple concatenation
+    return "\n\n---\n\n".join([f"**{k}**: {v}" for k, v in valid_responses.items()])
+
+def call_provider(provider: str, query: str, history: list[dict]):
+    """Return the coroutine answering `query` for `provider` (unknown providers are simulated)."""
+    p_lower = provider.lower()
+    if p_lower=="gemini":
+        return call_gemini(query, history)
+    elif p_lower=="cohere":
+        return call_cohere(query, history)
+    elif p_lower=="openai":
+        return call_openai(query, history)
+    elif p_lower=="claude":
+        return call_claude(query, history)
+    elif p_lower=="perplexity":
+        return call_perplexity(query, history)
+    return asyncio.sleep(0, result=simulate_response(provider.capitalize(), query))
+
+async def _within_deadline(coro, deadline: float | None):
+    # Runs in its own task context, so retries and throttling inside see this request's deadline
+    REQUEST_DEADLINE.set(deadline)
+    return await coro
+
+def _drain(task: asyncio.Task):
+    # Late calls finish unobserved; retrieve the outcome so asyncio doesn't warn
+    if not task.cancelled():
+        task.exception()
+
+def _is_valid(task: asyncio.Task) -> bool:
+    return not task.cancelled() and task.exception() is None and not task.result().startswith("⚠️")
+
+async def collect_responses(selected_providers: list[str], query: str, history: list[dict],
+                            deadline_ms: int | None = None, min_quorum: int = 1,
+                            continue_late: bool = True) -> tuple[dict, list[str]]:
+    """Run the providers concurrently and return (responses, timed_out providers).
+
+    Without a deadline this waits for everyone. With one, whatever finished by
+    the deadline is returned (waiting longer only until `min_quorum` valid answers
+    are in); the rest are reported as timed out.
+    """
+    timeout = deadline_ms / 1000 if deadline_ms else None
+    deadline = time.monotonic() + timeout if timeout else None
+    tasks = {p: asyncio.ensure_future(_within_deadline(call_provider(p, query, history), deadline))
+             for p in selected_providers}
+    if not tasks:
+        return {}, []
+    try:
+        done, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+        quorum = min(min_quorum, len(tasks))
+        # Only real answers count: a "⚠️" failure (missing key, open circuit) is usually the fastest
+        while pending and sum(_is_valid(task) for task in done) < quorum:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            done |= finished
+    except asyncio.CancelledError:
+        for task in tasks.values():
+            task.cancel()
+        raise
+
+    results = {}
+    timed_out = []
+    for provider, task in tasks.items():
+        if task in done:
+            results[provider] = task.result()
+            continue
+        results[provider] = f"⚠️ {provider.capitalize()} timed out after {deadline_ms} ms"
+        timed_out.append(provider)
+        if continue_late:
+            task.add_done_callback(_drain)
+        else:
+            task.cancel()
+    return results, timed_out
 
 @app.post("/ask")
 async def ask(request: QueryRequest):
+    try:
+        async with ADMISSION.slot():
+            result = await answer(request)
+    except Overloaded as e:
+        raise overloaded_response(e)
+    with span("serialize"):
+        return JSONResponse(result)
+
+def token_usage(results: dict, query: str, history: list[dict]) -> dict:
+    """Estimated input/output tokens per provider (failed calls produced no output)."""
+    usage = {}
+    for provider, response in results.items():
+        failed = response.startswith("⚠️")
+        # Keyed as the request spelled it; every lookup uses the canonical lowercase name
+        name = provider.lower()
+        usage[provider] = {
+            "input_tokens": prompt_tokens(name, query, history),
+            "output_tokens": 0 if failed else count_tokens(response, name),
+        }
+    return usage
+
+ASK_QUERY_CHARS = METRICS.histogram("ask_query_chars", "Length of the query in /ask requests.",
+                                    buckets=metrics.SIZE_BUCKETS)
+ASK_HISTORY_MESSAGES = METRICS.histogram("ask_history_messages", "Conversation history sent with /ask requests.",
+                                         buckets=metrics.COUNT_BUCKETS)
+ASK_PROVIDERS = METRICS.histogram("ask_providers", "Providers asked per /ask request.", buckets=metrics.COUNT_BUCKETS)
+
+def record_request_size(request: QueryRequest):
+    ASK_QUERY_CHARS.observe(len(request.query))
+    ASK_HISTORY_MESSAGES.observe(len(request.history or ()))
+    ASK_PROVIDERS.observe(len(request.providers))
+
+async def answer(request: QueryRequest) -> dict:
+    record_request_size(request)
     query = request.query
     selected_providers = request.providers
     history = request.history or []
-    results = {}
-    sources_used = []
-
-    tasks = []
-    for provider in selected_providers:
-        p_lower = provider.lower()
-        if p_lower=="gemini":
-            tasks.append(call_gemini(query, history))
-        elif p_lower=="cohere":
-            tasks.append(call_cohere(query, history))
-        elif p_lower=="openai":
-            tasks.append(call_openai(query, history))
-        elif p_lower=="claude":
-            tasks.append(call_claude(query, history))
-        elif p_lower=="perplexity":
-            tasks.append(call_perplexity(query, history))
-        else:
-            tasks.append(asyncio.sleep(0, result=simulate_response(provider.capitalize(), query)))
-        sources_used.append(provider.capitalize())
+    sources_used = [provider.capitalize() for provider in selected_providers]
 
-    responses_list = await asyncio.gather(*tasks)
-    for i, provider in enumerate(selected_providers):
-        results[provider] = responses_list[i]
+    results, timed_out = await collect_responses(
+        selected_providers, query, history,
+        deadline_ms=request.deadline_ms or ASK_DEADLINE_MS,
+        min_quorum=request.min_quorum,
+        continue_late=request.continue_late,
+    )
 
-    # Generate AI-powered summary
-    summary = await generate_ai_summary(results, query)
+    # Generate AI-powered summary over whatever made the deadline
+    summary, decision = await summarize(results, query, request.summary_mode)
 
     return {
         "query": query,
         "summary": summary,
         "responses": results,
-        "sources": sources_used
-    }
\ No newline at end of file
+        "sources": sources_used,
+        "timed_out": timed_out,
+        "summary_decision": decision,
+        "token_usage": token_usage(results, query, history),
+    }
+
+# ---------------- Streaming ----------------
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+async def _timed_call(provider: str, query: str, history: list[dict]):
+    start = time.perf_counter()
+    response = await call_provider(provider, query, history)
+    return provider, response, _elapsed_ms(start), None
+
+async def _timed_stream(provider: str, query: str, history: list[dict], deltas: asyncio.Queue):
+    """Like _timed_call, but pushes each delta onto `deltas` and also measures time to first token."""
+    start = time.perf_counter()
+    first_token_ms = None
+    parts = []
+    with span(f"stream.{provider}"):
+        async with aclosing(stream_provider(provider, query, history)) as stream:
+            async for delta in stream:
+                if first_token_ms is None:
+                    first_token_ms = _elapsed_ms(start)
+                parts.append(delta)
+                deltas.put_nowait((provider, delta))
+    return provider, "".join(parts), _elapsed_ms(start), first_token_ms
+
+# Default summary_quorum for /ask/stream (0 = summarize after every provider finished)
+STREAM_SUMMARY_QUORUM = int(os.getenv("STREAM_SUMMARY_QUORUM", "0"))
+
+REFINE_PROMPT = """Here is a summary of AI responses to the question: "{query}"
+
+Summary:
+{summary}
+
+More responses arrived after it was written:
+{responses}
+
+Update the summary with anything new or contradicting in these responses. Keep it concise and return only the updated summary."""
+
+def build_refine_prompt(summary: str, late_responses: dict, original_query: str, provider: str) -> str:
+    """Refinement prompt trimmed to fit `provider`'s context window."""
+    budget = query_budget(provider)
+    query = trim_to_tokens(original_query, budget // 8, provider)
+    summary = trim_to_tokens(summary, budget // 3, provider)
+    overhead = count_tokens(REFINE_PROMPT.format(query=query, summary=summary, responses=""), provider)
+    labels = sum(count_tokens(f"**{p}**: \n\n", provider) for p in late_responses)
+    fitted = fit_texts(late_responses, budget - overhead - labels, provider)
+    responses_text = "".join(f"**{p}**: {r}\n\n" for p, r in fitted.items())
+    return REFINE_PROMPT.format(query=query, summary=summary, responses=responses_text)
+
+def addenda(late_responses: dict) -> dict:
+    """Late responses shortened to their two most central sentences, for listing under the summary."""
+    short = {}
+    for provider, response in late_responses.items():
+        result = extractive_summary({provider: response}, max_sentences=2)
+        short[provider] = result[0] if result else response
+    return short
+
+async def refine_summary(summary: str, decision: dict, late_responses: dict, valid_responses: dict,
+                         original_query: str, mode: str) -> tuple[str, dict] | None:
+    """Fold late responses into an early summary; None if no summarizer could."""
+    if decision["mode"] != "llm":
+        # Local decisions (single, consensus, extractive) are cheap to redo over everything
+        return await summarize(valid_responses, original_query, mode)
+    candidates = summary_candidates()
+    if not candidates:
+        return None
+    # Drop the "🤖 **AI-Generated Summary** (via X):" header line before handing the text back
+    body = summary.split("\n\n", 1)[-1]
+    result = await hedged_summary(
+        candidates, lambda name: build_refine_prompt(body, late_responses, original_query, name))
+    if result is None:
+        return None
+    provider_name, refined, _ = result
+    decision = {**decision, "provider": provider_name, "refined_with": list(late_responses)}
+    return f"🤖 **AI-Generated Summary** (via {provider_name.upper()}, refined):\n\n{refined}", decision
+
+async def stream_answers(request: QueryRequest):
+    """Yield a `provider_result` event per provider in completion order, then `summary` and `done`.
+
+    With a summary quorum the summary starts as soon as that many providers
+    gave a valid answer, while the rest are still running; responses that
+    arrive later follow as a `summary_update` (refined summary) or a
+    `summary_addendum` (listed as is). `stream_tokens` streams provider
+    answers only: summaries are still sent whole, since hedged summarizers
+    race complete summaries.
+    """
+    start = time.perf_counter()
+    record_request_size(request)
+    query = request.query
+    selected_providers = request.providers
+    history = request.history or []
+    quorum = request.summary_quorum if request.summary_quorum is not None else STREAM_SUMMARY_QUORUM
+    results = {}
+    provider_ms = {}
+    first_result_ms = None
+    summary_task = None
+    summary_start = None
+    summary_ms = None
+    included = []
+    ttft_ms = {}
+    deltas = asyncio.Queue() if request.stream_tokens else None
+    next_delta = None
+
+    if deltas is not None:
+        tasks = [asyncio.ensure_future(_timed_stream(p, query, history, deltas)) for p in selected_providers]
+    else:
+        tasks = [asyncio.ensure_future(_timed_call(p, query, history)) for p in selected_providers]
+    pending = set(tasks)
+    try:
+        while pending:
+            if deltas is not None and next_delta is None:
+                next_delta = asyncio.ensure_future(deltas.get())
+            delta_task = next_delta
+            waiting = pending | {delta_task} if delta_task is not None else pending
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            pending -= done
+            if deltas is not None:
+                # Flush every queued delta first so a provider's tokens precede its provider_result
+                if delta_task in done:
+                    next_delta = None
+                    provider, delta = delta_task.result()
+                    yield sse_event("provider_delta", {"provider": provider, "delta": delta})
+                while not deltas.empty():
+                    provider, delta = deltas.get_nowait()
+                    yield sse_event("provider_delta", {"provider": provider, "delta": delta})
+            for task in done:
+                if task is delta_task:
+                    continue
+                if task is summary_task:
+                    summary, decision = task.result()
+                    summary_ms = _elapsed_ms(summary_start)
+                    yield sse_event("summary", {"summary": summary, "decision": decision, "elapsed_ms": summary_ms,
+                                                "partial": True, "included": included})
+                    continue
+                provider, response, elapsed, first_token_ms = task.result()
+                results[provider] = response
+                provider_ms[provider] = elapsed
+                if first_result_ms is None:
+                    first_result_ms = _elapsed_ms(start)
+                event = {"provider": provider, "response": response, "elapsed_ms": elapsed}
+                if first_token_ms is not None:
+                    ttft_ms[provider] = first_token_ms
+                    event["ttft_ms"] = first_token_ms
+                yield sse_event("provider_result", event)
+            valid_count = sum(not r.startswith("⚠️") for r in results.values())
+            if summary_task is None and quorum and pending and valid_count >= quorum:
+                # Quorum reached with providers still out: summarize what we have now
+                snapshot = {p: results[p] for p in selected_providers if p in results}
+                included = [p for p, r in snapshot.items() if not r.startswith("⚠️")]
+                summary_start = time.perf_counter()
+                summary_task = asyncio.ensure_future(summarize(snapshot, query, request.summary_mode))
+                pending.add(summary_task)
+
+        # Summarize in the order the providers were requested, as /ask does
+        ordered = {p: results[p] for p in selected_providers if p in results}
+        if summary_task is None:
+            summary_start = time.perf_counter()
+            summary, decision = await summarize(ordered, query, request.summary_mode)
+            summary_ms = _elapsed_ms(summary_start)
+            yield sse_event("summary", {"summary": summary, "decision": decision, "elapsed_ms": summary_ms})
+        else:
+            late = {p: r for p, r in ordered.items() if p not in included and not r.startswith("⚠️")}
+            refined = None
+            if late and request.late_responses == "refine":
+                refine_start = time.perf_counter()
+                valid = {p: r for p, r in ordered.items() if not r.startswith("⚠️")}
+                refined = await refine_summary(summary, decision, late, valid, query, request.summary_mode)
+                if refined is not None:
+                    yield sse_event("summary_update", {"summary": refined[0], "decision": refined[1],
+                                                       "folded_in": list(late), "elapsed_ms": _elapsed_ms(refine_start)})
+            if late and refined is None:
+                yield sse_event("summary_addendum", {"addenda": addenda(late)})
+
+        yield sse_event("done", {
+            "query": query,
+            "sources": [p.capitalize() for p in selected_providers],
+            "token_usage": token_usage(ordered, query, history),
+            "timings": {
+                "providers_ms": provider_ms,
+                "first_result_ms": first_result_ms,
+                "providers_ttft_ms": ttft_ms,
+                "summary_ms": summary_ms,
+                "total_ms": _elapsed_ms(start),
+            },
+        })
+    finally:
+        # Client went away mid-stream: don't leave provider or summary calls running
+        for task in tasks:
+            task.cancel()
+        if summary_task is not None:
+            summary_task.cancel()
+        if next_delta is not None:
+            next_delta.cancel()
+
+@app.get("/health/providers")
+async def provider_health():
+    return {provider: breaker.snapshot() for provider, breaker in BREAKERS.items()}
+
+@app.get("/stats")
+async def stats():
+    return {
+        "admission": ADMISSION.stats(),
+        "provider_concurrency": {provider: slots.stats() for provider, slots in PROVIDER_SLOTS.items()},
+        "rate_limits": {provider: limiter.stats() for provider, limiter in LIMITERS.items()},
+        "cache": CACHE.stats(),
+        "negative_cache": NEGATIVE_CACHE.stats(),
+        "disk_cache": DISK_CACHE.stats() if DISK_CACHE is not None else None,
+        "single_flight": INFLIGHT.stats(),
+        "semantic_cache": SEMANTIC_CACHE.stats() if SEMANTIC_CACHE is not None else None,
+        "gemini_model_discovery": GEMINI_MODELS.stats(),
+        "event_loop_lag": LOOP_LAG.stats(),
+        "tracing": TRACE_EXPORTER.stats() if TRACE_EXPORTER is not None else None,
+    }
+
+def _caches() -> dict:
+    caches = {"response": CACHE, "negative": NEGATIVE_CACHE, "gemini_models": GEMINI_MODELS}
+    if DISK_CACHE is not None:
+        caches["disk"] = DISK_CACHE
+    if SEMANTIC_CACHE is not None:
+        caches["semantic"] = SEMANTIC_CACHE
+    return caches
+
+def _admission_controllers() -> dict:
+    return {"ask": ADMISSION, **PROVIDER_SLOTS}
+
+METRICS.collected_counter("cache_hits_total", "Cache hits.", ("cache",),
+                          lambda: {(name,): c.hits for name, c in _caches().items()})
+METRICS.collected_counter("cache_misses_total", "Cache misses.", ("cache",),
+                          lambda: {(name,): c.misses for name, c in _caches().items()})
+METRICS.gauge("cache_entries", "Entries held per cache.", ("cache",),
+              lambda: {(name,): c.stats()["entries"] for name, c in _caches().items()})
+METRICS.gauge("cache_bytes", "Bytes held by the response caches.", ("cache",),
+              lambda: {(name,): c.stats()["bytes"] for name, c in _caches().items()
+                       if name in ("response", "negative", "disk")})
+METRICS.collected_counter("single_flight_coalesced_total", "Calls that joined an identical call in flight.", (),
+                          lambda: {(): INFLIGHT.coalesced})
+METRICS.gauge("admission_active", "Requests holding a slot (ask) or calls in flight (per provider).", ("controller",),
+              lambda: {(name,): c.active for name, c in _admission_controllers().items()})
+METRICS.gauge("admission_queue_depth", "Callers waiting for a slot.", ("controller",),
+              lambda: {(name,): c.waiting for name, c in _admission_controllers().items()})
+METRICS.collected_counter("admission_rejected_total", "Callers turned away with Overloaded.", ("controller",),
+                          lambda: {(name,): c.rejected for name, c in _admission_controllers().items()})
+METRICS.gauge("circuit_open", "1 while the provider's circuit breaker is open.", ("provider",),
+              lambda: {(p,): int(b.state == "open") for p, b in BREAKERS.items()})
+METRICS.gauge("event_loop_lag_seconds", "Recent event-loop lag.", ("quantile",),
+              lambda: {(str(q),): LOOP_LAG.quantile(q) or 0.0 for q in (0.5, 0.99)})
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(METRICS.render(), media_type=metrics.CONTENT_TYPE)
+
+async def _release_after(events, release):
+    try:
+        async for event in events:
+            yield event
+    finally:
+        release()
+
+async def admitted_stream(events, media_type: str, headers: dict | None = None) -> StreamingResponse:
+    """Stream `events` while holding an ADMISSION slot for the stream's lifetime."""
+    # Admit before the 200 goes out so an overloaded server can still answer 503
+    try:
+        await ADMISSION.acquire()
+    except Overloaded as e:
+        raise overloaded_response(e)
+    start = time.monotonic()
+    released = False
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            ADMISSION.release(time.monotonic() - start)
+    return StreamingResponse(
+        _release_after(events, release),
+        media_type=media_type,
+        headers=headers,
+        # Also runs if the client disconnects before the stream starts
+        background=BackgroundTask(release),
+    )
+
+@app.post("/ask/stream")
+async def ask_stream(request: QueryRequest):
+    return await admitted_stream(
+        stream_answers(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ---------------- Batch ----------------
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+async def answer_item(item: dict) -> dict:
+    """Answer one batch line (an /ask request body plus an optional "id")."""
+    request = QueryRequest(**{k: v for k, v in item.items() if k != "id"})
+    return await answer(request)
+
+@app.post("/ask/batch")
+async def ask_batch(http_request: Request):
+    # The (small) question file is read up front: Starlette may listen for a
+    # disconnect on the same receive channel while the response streams.
+    body = await http_request.body()
+    return await admitted_stream(
+        run_batch(iter_lines(body), answer_item, BATCH_CONCURRENCY),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+class ModelCache:
+    """TTL cache for discovered model names with background refresh.
+
+    Entries are served until `ttl` expires; once an entry is past
+    `refresh_after` (a fraction of the TTL) the cached value is still returned
+    but a refresh is started in the background, so callers rarely wait on
+    discovery. A failed refresh keeps the previous value.
+    """
+
+    def __init__(self, ttl: float = 3600, refresh_after: float = 0.8):
+        self.ttl = ttl
+        self.refresh_after = refresh_after
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._entries: dict[str, tuple[str, float]] = {}
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, key: str):
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[1] < self.ttl:
+            return entry
+        return None
+
+    async def get(self, key: str, fetch) -> str | None:
+        """Return the model for `key`, calling `fetch()` (async, may return None) on a miss."""
+        entry = self._fresh(key)
+        if entry:
+            self.hits += 1
+            age = time.monotonic() - entry[1]
+            if age > self.ttl * self.refresh_after and key not in self._refreshing:
+                self._refreshing[key] = asyncio.create_task(self._refresh(key, fetch))
+            return entry[0]
+        self.misses += 1
+        # Concurrent misses share one discovery call
+        async with self._lock:
+            entry = self._fresh(key)
+            if entry:
+                return entry[0]
+            value = await fetch()
+            if value:
+                self._entries[key] = (value, time.monotonic())
+            return value
+
+    async def _refresh(self, key: str, fetch):
+        try:
+            value = await fetch()
+            if value:
+                self._entries[key] = (value, time.monotonic())
+                self.refreshes += 1
+        except Exception:
+            pass
+        finally:
+            self._refreshing.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "refreshes": self.refreshes, "entries": len(self._entries)}
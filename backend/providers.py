@@ -1,4 +1,6 @@
-import os, httpx
+import os
+from backend.clients import base_url, provider_client
+from backend.streaming import anthropic_delta, cohere_delta, gemini_delta, iter_ndjson, iter_sse_json, openai_delta
 
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 ANTHROPIC_KEY = os.getenv("ANTHROPIC_API_KEY")
@@ -9,9 +11,9 @@ PERPLEXITY_KEY = os.getenv("PERPLEXITY_API_KEY")
 async def ask_openai(question: str):
     if not OPENAI_KEY:
         return "[OpenAI disabled - add API key in .env]"
-    async with httpx.AsyncClient(timeout=30) as client:
+    async with provider_client("openai") as client:
         r = await client.post(
-            "https://api.openai.com/v1/chat/completions",
+            f"{base_url('openai')}/chat/completions",
             headers={"Authorization": f"Bearer {OPENAI_KEY}"},
             json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": question}]}
         )
@@ -20,9 +22,9 @@ async def ask_openai(question: str):
 async def ask_claude(question: str):
     if not ANTHROPIC_KEY:
         return "[Claude disabled - add API key in .env]"
-    async with httpx.AsyncClient(timeout=30) as client:
+    async with provider_client("anthropic") as client:
         r = await client.post(
-            "https://api.anthropic.com/v1/messages",
+            f"{base_url('anthropic')}/messages",
             headers={"x-api-key": ANTHROPIC_KEY, "anthropic-version": "2023-06-01"},
             json={"model": "claude-3-opus-20240229", "messages": [{"role": "user", "content": question}]}
         )
@@ -31,9 +33,9 @@ async def ask_claude(question: str):
 async def ask_gemini(question: str):
     if not GEMINI_KEY:
         return "[Gemini disabled - add API key in .env]"
-    async with httpx.AsyncClient(timeout=30) as client:
+    async with provider_client("gemini") as client:
         r = await client.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_KEY}",
+            f"{base_url('gemini')}/models/gemini-1.5-flash:generateContent?key={GEMINI_KEY}",
             json={"contents": [{"parts": [{"text": question}]}]}
         )
         return r.json()["candidates"][0]["content"]["parts"][0]["text"]
@@ -41,9 +43,9 @@ async def ask_gemini(question: str):
 async def ask_cohere(question: str):
     if not COHERE_KEY:
         return "[Cohere disabled - add API key in .env]"
-    async with httpx.AsyncClient(timeout=30) as client:
+    async with provider_client("cohere") as client:
         r = await client.post(
-            "https://api.cohere.ai/v1/chat",
+            f"{base_url('cohere')}/chat",
             headers={"Authorization": f"Bearer {COHERE_KEY}"},
             json={"model": "command-r-plus", "message": question}
         )
@@ -52,10 +54,89 @@ async def ask_cohere(question: str):
 async def ask_perplexity(question: str):
     if not PERPLEXITY_KEY:
         return "[Perplexity disabled - add API key in .env]"
-    async with httpx.AsyncClient(timeout=30) as client:
+    async with provider_client("perplexity") as client:
         r = await client.post(
-            "https://api.perplexity.ai/chat/completions",
+            f"{base_url('perplexity')}/chat/completions",
             headers={"Authorization": f"Bearer {PERPLEXITY_KEY}"},
             json={"model": "sonar-medium-chat", "messages": [{"role": "user", "content": question}]}
         )
         return r.json()["choices"][0]["message"]["content"]
+
+# ---------------- Streaming variants ----------------
+# Each yields text deltas as the provider produces them instead of waiting for the full body.
+
+async def stream_openai(question: str):
+    if not OPENAI_KEY:
+        yield "[OpenAI disabled - add API key in .env]"
+        return
+    async with provider_client("openai") as client:
+        async with client.stream(
+            "POST", f"{base_url('openai')}/chat/completions",
+            headers={"Authorization": f"Bearer {OPENAI_KEY}"},
+            json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": question}], "stream": True}
+        ) as r:
+            r.raise_for_status()
+            async for chunk in iter_sse_json(r):
+                if delta := openai_delta(chunk):
+                    yield delta
+
+async def stream_claude(question: str):
+    if not ANTHROPIC_KEY:
+        yield "[Claude disabled - add API key in .env]"
+        return
+    async with provider_client("anthropic") as client:
+        async with client.stream(
+            "POST", f"{base_url('anthropic')}/messages",
+            headers={"x-api-key": ANTHROPIC_KEY, "anthropic-version": "2023-06-01"},
+            json={"model": "claude-3-opus-20240229", "max_tokens": 1024,
+                  "messages": [{"role": "user", "content": question}], "stream": True}
+        ) as r:
+            r.raise_for_status()
+            async for event in iter_sse_json(r):
+                if delta := anthropic_delta(event):
+                    yield delta
+
+async def stream_gemini(question: str):
+    if not GEMINI_KEY:
+        yield "[Gemini disabled - add API key in .env]"
+        return
+    async with provider_client("gemini") as client:
+        async with client.stream(
+            "POST",
+            f"{base_url('gemini')}/models/gemini-1.5-flash:streamGenerateContent?alt=sse&key={GEMINI_KEY}",
+            json={"contents": [{"parts": [{"text": question}]}]}
+        ) as r:
+            r.raise_for_status()
+            async for chunk in iter_sse_json(r):
+                if delta := gemini_delta(chunk):
+                    yield delta
+
+async def stream_cohere(question: str):
+    if not COHERE_KEY:
+        yield "[Cohere disabled - add API key in .env]"
+        return
+    async with provider_client("cohere") as client:
+        async with client.stream(
+            "POST", f"{base_url('cohere')}/chat",
+            headers={"Authorization": f"Bearer {COHERE_KEY}"},
+            json={"model": "command-r-plus", "message": question, "stream": True}
+        ) as r:
+            r.raise_for_status()
+            async for event in iter_ndjson(r):
+                if delta := cohere_delta(event):
+                    yield delta
+
+async def stream_perplexity(question: str):
+    if not PERPLEXITY_KEY:
+        yield "[Perplexity disabled - add API key in .env]"
+        return
+    async with provider_client("perplexity") as client:
+        async with client.stream(
+            "POST", f"{base_url('perplexity')}/chat/completions",
+            headers={"Authorization": f"Bearer {PERPLEXITY_KEY}"},
+            json={"model": "sonar-medium-chat", "messages": [{"role": "user", "content": question}], "stream": True}
+        ) as r:
+            r.raise_for_status()
+            async for chunk in iter_sse_json(r):
+                if delta := openai_delta(chunk):
+                    yield delta
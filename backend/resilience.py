@@ -0,0 +1,232 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+
+# Absolute time.monotonic() deadline of the request a provider call belongs to
+REQUEST_DEADLINE: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a rolling window of call outcomes.
+
+    A call counts as bad if it failed or took at least `slow_call_s`. Once the
+    window holds `min_calls` outcomes and the bad-call rate reaches
+    `error_rate`, the breaker opens and rejects calls for `open_seconds`. It
+    then goes half-open and lets `half_open_probes` real calls through: a good
+    probe closes it, a bad one opens it again.
+    """
+
+    def __init__(self, name: str, error_rate: float = 0.5, min_calls: int = 5, window: float = 60,
+                 open_seconds: float = 30, slow_call_s: float = 10, half_open_probes: int = 1):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.slow_call_s = slow_call_s
+        self.half_open_probes = half_open_probes
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.trips = 0
+        self._probes = 0
+        # (timestamp, ok, latency seconds)
+        self._outcomes: deque[tuple[float, bool, float]] = deque()
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def available(self) -> bool:
+        """True unless the breaker is open and still cooling down (does not use a probe)."""
+        return not (self.state == "open" and time.monotonic() - self.opened_at < self.open_seconds)
+
+    def allow(self) -> bool:
+        """Ask to make a call; False means fail fast without contacting the provider."""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+            self._probes = 0
+        if self.state == "half_open":
+            if self._probes >= self.half_open_probes:
+                self.rejected += 1
+                return False
+            self._probes += 1
+        return True
+
+    def record_success(self, latency: float):
+        self._record(latency < self.slow_call_s, latency)
+
+    def record_failure(self, latency: float):
+        self._record(False, latency)
+
+    def release(self):
+        """Give back a probe slot for a call that was cancelled or whose outcome says nothing about health."""
+        if self.state == "half_open" and self._probes > 0:
+            self._probes -= 1
+
+    def _record(self, ok: bool, latency: float):
+        now = time.monotonic()
+        if self.state == "half_open":
+            self._probes = max(0, self._probes - 1)
+            if ok:
+                self.state = "closed"
+                self._outcomes.clear()
+                self._outcomes.append((now, ok, latency))
+            else:
+                self._trip(now)
+            return
+        self._outcomes.append((now, ok, latency))
+        self._trim(now)
+        if self.state == "closed" and len(self._outcomes) >= self.min_calls:
+            if self._bad_rate() >= self.error_rate:
+                self._trip(now)
+
+    def _trip(self, now: float):
+        self.state = "open"
+        self.opened_at = now
+        self.trips += 1
+
+    def _bad_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, ok, _ in self._outcomes if not ok) / len(self._outcomes)
+
+    def latency_quantile(self, q: float) -> float | None:
+        """Quantile of recent successful-call latencies in seconds, or None without data."""
+        self._trim(time.monotonic())
+        latencies = sorted(lat for _, ok, lat in self._outcomes if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def snapshot(self) -> dict:
+        self._trim(time.monotonic())
+        p50 = self.latency_quantile(0.5)
+        p90 = self.latency_quantile(0.9)
+        retry_in = self.open_seconds - (time.monotonic() - self.opened_at) if self.state == "open" else 0
+        return {
+            "state": self.state,
+            "calls": len(self._outcomes),
+            "error_rate": round(self._bad_rate(), 4),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p90_ms": round(p90 * 1000, 1) if p90 is not None else None,
+            "retry_in_s": round(max(0.0, retry_in), 1),
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+def breaker_from_env(name: str) -> CircuitBreaker:
+    """CircuitBreaker configured from BREAKER_* environment variables."""
+    return CircuitBreaker(
+        name,
+        error_rate=float(os.getenv("BREAKER_ERROR_RATE", "0.5")),
+        min_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+        window=float(os.getenv("BREAKER_WINDOW_SECONDS", "60")),
+        open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", "30")),
+        slow_call_s=float(os.getenv("BREAKER_SLOW_CALL_MS", "10000")) / 1000,
+        half_open_probes=int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1")),
+    )
+
+class TokenBucket:
+    """Token bucket refilled at `rate` per second up to `capacity`.
+
+    reserve() takes tokens immediately (the balance may go negative) and
+    returns how long the caller must wait, so concurrent callers queue up in
+    arrival order without a lock.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+class RateLimiter:
+    """Per-provider requests-per-minute and (optional) tokens-per-minute buckets.
+
+    Bursts are capped at `burst_seconds` worth of the per-minute budget so we
+    run at the provider ceiling instead of spending a minute's quota at once.
+    """
+
+    def __init__(self, rpm: float, tpm: float | None = None, burst_seconds: float = 10):
+        self.requests = TokenBucket(rpm / 60, max(1.0, rpm / 60 * burst_seconds))
+        self.tokens = TokenBucket(tpm / 60, max(1.0, tpm / 60 * burst_seconds)) if tpm else None
+        self.throttled = 0
+        self.rejected = 0
+
+    async def acquire(self, tokens: int = 0, deadline: float | None = None) -> bool:
+        """Wait for capacity; False (nothing consumed) if that would pass `deadline`."""
+        wait = self.requests.reserve(1)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if deadline is not None and time.monotonic() + wait > deadline:
+            self.requests.refund(1)
+            if self.tokens is not None:
+                self.tokens.refund(tokens)
+            self.rejected += 1
+            return False
+        if wait > 0:
+            self.throttled += 1
+            await asyncio.sleep(wait)
+        return True
+
+    def stats(self) -> dict:
+        return {"throttled": self.throttled, "rejected": self.rejected}
+
+# Published defaults (requests/min, tokens/min); override with <PROVIDER>_RPM / <PROVIDER>_TPM
+DEFAULT_RATE_LIMITS = {
+    "openai": (3500, 90000),
+    "cohere": (100, None),
+    "gemini": (60, 32000),
+}
+
+def limiter_from_env(name: str) -> RateLimiter:
+    rpm, tpm = DEFAULT_RATE_LIMITS.get(name, (60, None))
+    rpm = float(os.getenv(f"{name.upper()}_RPM", rpm))
+    tpm = os.getenv(f"{name.upper()}_TPM", tpm)
+    return RateLimiter(rpm, float(tpm) if tpm else None)
+
+class RetryPolicy:
+    """Jittered exponential backoff that defers to the provider's Retry-After."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 8):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float | None:
+        """Seconds to wait before retry number `attempt` (1-based), or None to give up.
+
+        A Retry-After is honored as is; one longer than `max_delay` means the
+        retry would certainly be rejected before then, so don't retry at all.
+        """
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        # Full jitter: spreads synchronized clients out instead of retrying in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY_MS", "250")) / 1000,
+            max_delay=float(os.getenv("RETRY_MAX_DELAY_MS", "8000")) / 1000,
+        )
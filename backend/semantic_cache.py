@@ -0,0 +1,155 @@
+import re
+from array import array
+from collections import OrderedDict
+from itertools import islice
+from backend.extractive import STOPWORDS
+
+_CONTRACTIONS = [
+    (re.compile(r"\b(\w+)'s\b"), r"\1 is"),
+    (re.compile(r"\b(\w+)'re\b"), r"\1 are"),
+    (re.compile(r"\b(\w+)'ve\b"), r"\1 have"),
+    (re.compile(r"\b(\w+)'ll\b"), r"\1 will"),
+    (re.compile(r"\b(\w+)'d\b"), r"\1 would"),
+    (re.compile(r"\bcan't\b"), "can not"),
+    (re.compile(r"\b(\w+)n't\b"), r"\1 not"),
+]
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+def normalize_for_similarity(text: str) -> str:
+    """Casefold, expand common English contractions and drop punctuation."""
+    text = text.casefold().replace("’", "'")
+    for pattern, replacement in _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    return " ".join(_PUNCTUATION.sub("", text).split())
+
+# Stopwords that still change what a question asks ("is it not safe", "more than", "why" vs "when",
+# "X or Y" vs "X and Y")
+MEANINGFUL = frozenset({"no", "nor", "not", "against", "more", "most", "few", "before", "after",
+                        "above", "below", "up", "down", "over", "under",
+                        "what", "when", "where", "why", "how", "who", "whom", "which",
+                        "and", "or", "but", "if", "than"})
+_FILLER = STOPWORDS - MEANINGFUL
+
+def content_words(text: str) -> tuple[str, ...]:
+    """The normalized words that carry meaning (incl. numbers and negation), in order."""
+    return tuple(w for w in normalize_for_similarity(text).split() if w not in _FILLER)
+
+NEGATIONS = frozenset({"no", "nor", "not", "never"})
+
+def key_facts(text: str) -> frozenset[str]:
+    """Numbers and negations in `text`: texts that differ here say different things however alike they look."""
+    return frozenset(w for w in content_words(text) if w in NEGATIONS or any(c.isdigit() for c in w))
+
+def shingles(text: str, n: int = 3) -> set[bytes]:
+    """Character n-grams of the normalized text (padded so short words still count)."""
+    padded = f" {normalize_for_similarity(text)} "
+    if len(padded) <= n:
+        return {padded.encode()}
+    return {padded[i:i + n].encode() for i in range(len(padded) - n + 1)}
+
+def jaccard(a: set, b: set) -> float:
+    """Jaccard similarity of two shingle sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def signature(text: str, n: int = 3) -> array:
+    """Compact form of shingles(): one 64-bit hash per distinct n-gram (~8 bytes each, not ~150)."""
+    return array("q", {hash(gram) for gram in shingles(text, n)})
+
+def signature_similarity(grams: set[int], other: array) -> float:
+    """Jaccard similarity of a hash set and a signature (whose hashes are distinct)."""
+    if not grams and not other:
+        return 1.0
+    common = len(grams.intersection(other))
+    return common / (len(grams) + len(other) - common)
+
+class SemanticIndex:
+    """Near-duplicate lookup for short texts such as user questions.
+
+    Two texts can only match if they have the same content words in the same
+    order (everything but filler stopwords; numbers and negations count), so
+    "capital of Austria" never serves "capital of Australia" and "Celsius to
+    Fahrenheit" never serves the reverse. Among those, the one with the
+    highest character n-gram Jaccard similarity at or above `threshold` wins,
+    which lets case, punctuation, contractions and filler words differ.
+
+    Entries are grouped by (context, content words), so a lookup scores at
+    most `max_candidates` (the most recent) texts no matter how large the
+    index is. Each entry keeps hashed n-grams (see signature()), and entries
+    are evicted least-recently-added beyond `max_entries`; invalidate() drops
+    one whose value went away.
+    """
+
+    def __init__(self, threshold: float = 0.9, ngram: int = 3, max_entries: int = 1024,
+                 max_candidates: int = 32):
+        self.threshold = threshold
+        self.ngram = ngram
+        self.max_entries = max_entries
+        self.max_candidates = max_candidates
+        # (context, content words) -> normalized text -> (signature, value)
+        self._groups: dict[tuple[str, tuple], OrderedDict[str, tuple[array, object]]] = {}
+        # (group key, normalized text) -> value, in insertion order for eviction
+        self._order: OrderedDict[tuple[tuple, str], object] = OrderedDict()
+        # value -> (group key, normalized text), for invalidate()
+        self._entries: dict[object, tuple[tuple, str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def __len__(self):
+        return len(self._order)
+
+    def add(self, context: str, text: str, value):
+        """Index `text` under `context`, remembering `value` for later lookups (one text per value)."""
+        group_key = (context, content_words(text))
+        normalized = normalize_for_similarity(text)
+        if (group_key, normalized) in self._order:
+            self._remove(group_key, normalized)
+        if value in self._entries:
+            self._remove(*self._entries[value])
+        self._groups.setdefault(group_key, OrderedDict())[normalized] = (signature(text, self.ngram), value)
+        self._order[(group_key, normalized)] = value
+        self._entries[value] = (group_key, normalized)
+        while len(self._order) > self.max_entries:
+            self._remove(*next(iter(self._order)))
+
+    def lookup(self, context: str, text: str):
+        """Return (value, similarity) of the most similar indexed text at or above the threshold."""
+        group = self._groups.get((context, content_words(text)))
+        best, best_score = None, 0.0
+        if group:
+            grams = set(signature(text, self.ngram))
+            for other, value in islice(reversed(group.values()), self.max_candidates):
+                score = signature_similarity(grams, other)
+                if score > best_score:
+                    best, best_score = value, score
+        if best is None or best_score < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return best, best_score
+
+    def invalidate(self, value):
+        """`value` (as returned by lookup()) no longer resolves: drop its entry and count that lookup as a miss."""
+        if value in self._entries:
+            self._remove(*self._entries[value])
+        self.hits -= 1
+        self.misses += 1
+        self.stale += 1
+
+    def _remove(self, group_key: tuple, normalized: str):
+        del self._entries[self._order.pop((group_key, normalized))]
+        group = self._groups[group_key]
+        del group[normalized]
+        if not group:
+            del self._groups[group_key]
+
+    def clear(self):
+        self._groups.clear()
+        self._order.clear()
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._order), "groups": len(self._groups), "hits": self.hits,
+                "misses": self.misses, "stale": self.stale, "threshold": self.threshold}
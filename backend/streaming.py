@@ -0,0 +1,49 @@
+import json
+import httpx
+
+async def iter_sse_json(response: httpx.Response):
+    """Yield the JSON payload of each `data:` line of a Server-Sent Events body.
+
+    Multi-line events are joined as the SSE spec says; a `[DONE]` payload
+    (OpenAI-style) ends the stream.
+    """
+    data = []
+    async for line in response.aiter_lines():
+        if line.startswith("data:"):
+            data.append(line[5:].lstrip())
+            continue
+        if line or not data:
+            continue
+        payload = "\n".join(data)
+        data = []
+        if payload == "[DONE]":
+            return
+        yield json.loads(payload)
+    if data and data != ["[DONE]"]:
+        yield json.loads("\n".join(data))
+
+async def iter_ndjson(response: httpx.Response):
+    """Yield one JSON object per non-blank line (Cohere streams this way)."""
+    async for line in response.aiter_lines():
+        if line.strip():
+            yield json.loads(line)
+
+def openai_delta(chunk: dict) -> str:
+    choices = chunk.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+def gemini_delta(chunk: dict) -> str:
+    candidates = chunk.get("candidates") or [{}]
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+def anthropic_delta(event: dict) -> str:
+    if event.get("type") == "content_block_delta":
+        return (event.get("delta") or {}).get("text", "")
+    return ""
+
+def cohere_delta(event: dict) -> str:
+    # /v1/chat streams {"event_type": "text-generation", "text": ...}; /v1/generate streams {"text": ...}
+    if event.get("event_type", "text-generation") != "text-generation" or event.get("is_finished"):
+        return ""
+    return event.get("text", "")
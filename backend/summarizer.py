@@ -1,4 +1,5 @@
-import os, httpx
+import os
+from backend.clients import base_url, provider_client
 
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 
@@ -10,9 +11,9 @@ async def summarize_responses(question: str, responses: dict):
     for provider, resp in responses.items():
         combined += f"\n{provider}:\n{resp}\n"
 
-    async with httpx.AsyncClient(timeout=30) as client:
+    async with provider_client("openai") as client:
         r = await client.post(
-            "https://api.openai.com/v1/chat/completions",
+            f"{base_url('openai')}/chat/completions",
             headers={"Authorization": f"Bearer {OPENAI_KEY}"},
             json={
                 "model": "gpt-4o-mini",
@@ -0,0 +1,101 @@
+import os
+import re
+
+# Pre-tokenizer in the spirit of BPE tokenizers: contractions, words (with a
+# leading space), runs of up to three digits, punctuation runs, whitespace
+_PIECES = re.compile(r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+")
+
+# Longest common ASCII word (in characters) a single token usually covers, by tokenizer family
+FAMILY_WORD_CHARS = {
+    "bpe": 8,            # OpenAI cl100k-style
+    "sentencepiece": 7,  # Gemini
+    "cohere": 8,
+    "claude": 6,
+}
+PROVIDER_FAMILIES = {
+    "openai": "bpe",
+    "perplexity": "bpe",
+    "gemini": "sentencepiece",
+    "cohere": "cohere",
+    "claude": "claude",
+    "anthropic": "claude",
+}
+
+# Context window (input + output tokens) per provider; override with <PROVIDER>_CONTEXT_TOKENS
+CONTEXT_WINDOWS = {
+    "openai": 16385,
+    "cohere": 4096,
+    "gemini": 8192,
+    "claude": 200000,
+    "perplexity": 16000,
+}
+TRUNCATION_MARKER = " [...]"
+
+def _word_chars(provider: str | None) -> int:
+    # Provider names arrive in any case ("OpenAI" from the frontend)
+    return FAMILY_WORD_CHARS[PROVIDER_FAMILIES.get(provider.lower() if provider else None, "bpe")]
+
+def _piece_costs(text: str, provider: str | None):
+    word_chars = _word_chars(provider)
+    for match in _PIECES.finditer(text):
+        piece = match.group()
+        if piece.isascii():
+            # Whitespace runs and common words are one token; long words split into several
+            cost = 1 if piece.isspace() else -(-len(piece.strip()) // word_chars) or 1
+        else:
+            # Non-Latin scripts and emoji run close to a token per character (or more)
+            cost = sum(1 if c.isascii() else len(c.encode()) // 2 or 1 for c in piece)
+        yield match.end(), cost
+
+def count_tokens(text: str, provider: str | None = None) -> int:
+    """Estimate how many tokens `provider`'s tokenizer would produce for `text`.
+
+    Dependency-free and approximate (typically within ~15% for English prose),
+    but much closer than a flat characters/4 for code, numbers and non-Latin
+    text. Unknown providers use the OpenAI-style estimate.
+    """
+    if text.isascii():
+        # Fast path: no per-character work, just piece lengths
+        word_chars = _word_chars(provider)
+        return sum(1 if p.isspace() else -(-len(p.strip()) // word_chars) or 1 for p in _PIECES.findall(text))
+    return sum(cost for _, cost in _piece_costs(text, provider))
+
+def context_window(provider: str) -> int:
+    return int(os.getenv(f"{provider.upper()}_CONTEXT_TOKENS", CONTEXT_WINDOWS.get(provider.lower(), 4096)))
+
+def trim_to_tokens(text: str, max_tokens: int, provider: str | None = None) -> str:
+    """Cut `text` at a piece boundary so it fits in `max_tokens` (marker included)."""
+    limit = max_tokens - count_tokens(TRUNCATION_MARKER, provider)
+    total = 0
+    cut = 0
+    for end, cost in _piece_costs(text, provider):
+        if total + cost > max_tokens:
+            return text[:cut].rstrip() + TRUNCATION_MARKER if limit > 0 else ""
+        total += cost
+        if total <= limit:
+            cut = end
+    return text
+
+def fit_texts(texts: dict[str, str], budget: int, provider: str | None = None) -> dict[str, str]:
+    """Trim a set of texts to share `budget` tokens fairly.
+
+    Short texts are kept whole and their unused share goes to the longer ones,
+    so only the texts that are actually long get cut.
+    """
+    counts = {k: count_tokens(v, provider) for k, v in texts.items()}
+    if sum(counts.values()) <= budget:
+        return dict(texts)
+    remaining = max(0, budget)
+    share = {}
+    pending = sorted(counts, key=counts.get)
+    while pending:
+        fair = remaining // len(pending)
+        key = pending[0]
+        if counts[key] > fair:
+            break
+        share[key] = counts[key]
+        remaining -= counts[key]
+        pending.pop(0)
+    for key in pending:
+        share[key] = remaining // len(pending)
+    return {k: v if share[k] >= counts[k] else trim_to_tokens(v, share[k], provider) for k, v in texts.items()}
@@ -0,0 +1,277 @@
+import contextvars
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import httpx
+
+class Span:
+    """One timed phase of a request; use as a context manager (also across awaits)."""
+    __slots__ = ("trace", "name", "span_id", "parent_id", "attributes", "start_ns", "start", "duration", "error",
+                 "_token")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: str | None, attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = 0
+        self.start = 0.0
+        self.duration: float | None = None
+        self.error: str | None = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self.start = time.perf_counter()
+        self._token = _CURRENT.set((self.trace, self.span_id))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        _CURRENT.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.trace.add(self)
+
+    def record(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "request_id": self.trace.request_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_unix_nano": self.start_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class _NoopSpan:
+    """Returned when no trace is active, so instrumented code costs next to nothing."""
+
+    def set(self, key: str, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+# (trace, id of the innermost open span) for the running task; tasks inherit it when created
+_CURRENT: contextvars.ContextVar[tuple | None] = contextvars.ContextVar("trace", default=None)
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+class Trace:
+    """The finished spans of one request, in completion order."""
+
+    def __init__(self, request_id: str | None = None, max_spans: int = 1000):
+        self.trace_id = uuid.uuid4().hex
+        # Reuse a caller's X-Request-ID when it is sane, so logs on both sides line up
+        self.request_id = request_id if request_id and _REQUEST_ID.match(request_id) else self.trace_id[:16]
+        self.max_spans = max_spans
+        self.spans: list[Span] = []
+        self.dropped = 0
+        self.start = time.perf_counter()
+
+    def add(self, span: Span):
+        if len(self.spans) < self.max_spans:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value: total time per span name so far, plus the request total."""
+        totals: dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        totals["total"] = time.perf_counter() - self.start
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+def span(name: str, **attributes):
+    """Span `name` as a child of the current one, or a no-op outside a traced request."""
+    current = _CURRENT.get()
+    if current is None:
+        return NOOP_SPAN
+    trace, parent_id = current
+    return Span(trace, name, parent_id, attributes)
+
+def current_trace() -> Trace | None:
+    current = _CURRENT.get()
+    return current[0] if current is not None else None
+
+def start_trace(trace: Trace) -> contextvars.Token:
+    return _CURRENT.set((trace, None))
+
+def end_trace(token: contextvars.Token):
+    _CURRENT.reset(token)
+
+def otlp_payload(traces: list[Trace], service_name: str) -> dict:
+    """OTLP/HTTP JSON (ExportTraceServiceRequest) for a batch of traces."""
+    def value(v):
+        if isinstance(v, bool):
+            return {"boolValue": v}
+        if isinstance(v, int):
+            return {"intValue": str(v)}
+        if isinstance(v, float):
+            return {"doubleValue": v}
+        return {"stringValue": str(v)}
+
+    spans = []
+    for trace in traces:
+        for s in trace.spans:
+            attributes = {"request.id": trace.request_id, **s.attributes}
+            otlp_span = {
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 1,  # internal
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.start_ns + int(s.duration * 1e9)),
+                "attributes": [{"key": k, "value": value(v)} for k, v in attributes.items() if v is not None],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            }
+            if s.parent_id:
+                otlp_span["parentSpanId"] = s.parent_id
+            spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "backend.tracing"}, "spans": spans}],
+    }]}
+
+class TraceExporter:
+    """Write finished traces to a JSON-lines file and/or an OTLP/HTTP collector.
+
+    `export` only queues the trace; a background thread writes queued traces
+    in batches every `flush_interval` seconds, so the request path never
+    waits on disk or the collector. Past `max_pending` queued traces new ones
+    are dropped (and counted) rather than buffering without bound.
+    """
+
+    def __init__(self, path: str | None = None, otlp_endpoint: str | None = None,
+                 service_name: str = "multi-ai-summarizer", flush_interval: float = 1.0, max_pending: int = 10000):
+        self.path = path
+        self.otlp_endpoint = otlp_endpoint
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.exported = 0
+        self.dropped = 0
+        self.failures = 0
+        self._pending: list[Trace] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._http = httpx.Client(timeout=5) if otlp_endpoint else None
+        self._writer = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._writer.start()
+
+    def export(self, trace: Trace):
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(trace)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        batch = [trace for trace in batch if trace.spans]
+        if not batch:
+            return
+        try:
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for trace in batch:
+                        f.writelines(json.dumps(s.record(), ensure_ascii=False) + "\n" for s in trace.spans)
+            if self._http is not None:
+                self._http.post(self.otlp_endpoint, json=otlp_payload(batch, self.service_name)).raise_for_status()
+        except (OSError, httpx.HTTPError):
+            # Tracing must never take the service down; the batch is lost
+            self.failures += 1
+            return
+        self.exported += len(batch)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._writer.join(timeout=5)
+        self.flush()
+        if self._http is not None:
+            self._http.close()
+
+    def stats(self) -> dict:
+        return {"path": self.path, "otlp_endpoint": self.otlp_endpoint, "exported": self.exported,
+                "pending": len(self._pending), "dropped": self.dropped, "failures": self.failures}
+
+def exporter_from_env() -> TraceExporter | None:
+    """TRACE_EXPORT_PATH (JSON lines) and/or TRACE_OTLP_ENDPOINT (e.g. http://collector:4318/v1/traces)."""
+    path = os.getenv("TRACE_EXPORT_PATH") or None
+    endpoint = os.getenv("TRACE_OTLP_ENDPOINT") or None
+    if not path and not endpoint:
+        return None
+    return TraceExporter(
+        path=path,
+        otlp_endpoint=endpoint,
+        service_name=os.getenv("TRACE_SERVICE_NAME", "multi-ai-summarizer"),
+        flush_interval=float(os.getenv("TRACE_FLUSH_INTERVAL_MS", "1000")) / 1000,
+    )
+
+class TracingMiddleware:
+    """Pure ASGI middleware: one trace per request on `routes`.
+
+    Responses get `X-Request-ID` and a `Server-Timing` header covering the
+    spans finished before the headers went out (for /ask that is everything
+    up to and including serialization; streams only have their request ID).
+    The whole trace is handed to `exporter` once the response is complete.
+    """
+
+    def __init__(self, app, routes: frozenset, exporter: TraceExporter | None = None,
+                 server_timing: bool = True, max_spans: int = 1000):
+        self.app = app
+        self.routes = routes
+        self.exporter = exporter
+        self.server_timing = server_timing
+        self.max_spans = max_spans
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.routes:
+            return await self.app(scope, receive, send)
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        trace = Trace(request_id, self.max_spans)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-request-id", trace.request_id.encode()))
+                if self.server_timing:
+                    headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = start_trace(trace)
+        try:
+            with Span(trace, "request", None, {"http.path": scope["path"], "http.method": scope["method"]}):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            end_trace(token)
+            if self.exporter is not None:
+                self.exporter.export(trace)
@@ -0,0 +1,164 @@
+"""Local stand-in for the provider APIs the backend calls, for load tests without API quota:
+
+    python -m uvicorn benchmarks.fake_providers:app --port 9100
+
+Each provider lives under its own prefix; point the backend at it with
+OPENAI_BASE_URL=http://127.0.0.1:9100/openai/v1, ANTHROPIC_BASE_URL=.../anthropic/v1,
+GEMINI_BASE_URL=.../gemini/v1beta, COHERE_BASE_URL=.../cohere/v1 and
+PERPLEXITY_BASE_URL=.../perplexity (benchmarks.load_test does this for you).
+
+Behaviour comes from FAKE_* environment variables, each overridable per
+provider (e.g. FAKE_OPENAI_LATENCY_MS):
+
+    FAKE_LATENCY_MS        median latency of a full response (default 800)
+    FAKE_LATENCY_SIGMA     lognormal spread; 0 = fixed latency (default 0.5)
+    FAKE_ERROR_RATE        fraction answered with a 500 after the latency (default 0)
+    FAKE_RATE_LIMIT_RATE   fraction answered at once with a 429 + Retry-After (default 0)
+    FAKE_RESPONSE_WORDS    words per answer (default 120)
+    FAKE_SEED              seed for reproducible runs
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from fastapi import FastAPI, Request
+from starlette.requests import ClientDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ("the model answer provides context about systems data language network latency cache request "
+         "response summary provider python service quality result example detail performance throughput "
+         "memory token stream error budget queue server client value").split()
+
+rng = random.Random(os.getenv("FAKE_SEED"))
+app = FastAPI(title="Fake provider APIs")
+counters: dict[str, int] = {}
+
+def setting(provider: str, name: str, default: float) -> float:
+    return float(os.getenv(f"FAKE_{provider.upper()}_{name}", os.getenv(f"FAKE_{name}", default)))
+
+def latency(provider: str) -> float:
+    median = setting(provider, "LATENCY_MS", 800) / 1000
+    sigma = setting(provider, "LATENCY_SIGMA", 0.5)
+    return median * rng.lognormvariate(0, sigma) if sigma > 0 else median
+
+def answer_text(provider: str) -> str:
+    words = rng.choices(WORDS, k=int(setting(provider, "RESPONSE_WORDS", 120)))
+    sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+    return " ".join(sentences)
+
+def chunks(text: str, size: int = 5) -> list[str]:
+    words = text.split(" ")
+    return [" ".join(words[i:i + size]) + (" " if i + size < len(words) else "") for i in range(0, len(words), size)]
+
+async def failure(provider: str) -> JSONResponse | None:
+    """Injected 429 (immediate) or 500 (after the usual latency), or None for a normal answer."""
+    counters[provider] = counters.get(provider, 0) + 1
+    if rng.random() < setting(provider, "RATE_LIMIT_RATE", 0):
+        counters[f"{provider}_429"] = counters.get(f"{provider}_429", 0) + 1
+        return JSONResponse({"error": {"message": "rate limited"}}, status_code=429, headers={"Retry-After": "1"})
+    if rng.random() < setting(provider, "ERROR_RATE", 0):
+        await asyncio.sleep(latency(provider))
+        counters[f"{provider}_500"] = counters.get(f"{provider}_500", 0) + 1
+        return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+    return None
+
+async def respond(provider: str, body: dict, full, stream_event, sse: bool = True):
+    """Full JSON answer after the latency, or the same answer streamed in chunks over that time."""
+    error = await failure(provider)
+    if error is not None:
+        return error
+    text = answer_text(provider)
+    total = latency(provider)
+    if not body.get("stream"):
+        await asyncio.sleep(total)
+        return JSONResponse(full(text))
+
+    async def events():
+        parts = chunks(text)
+        # A third of the time goes to the first token, the rest is spread over the chunks
+        await asyncio.sleep(total / 3)
+        for part in parts:
+            event = json.dumps(stream_event(part))
+            yield f"data: {event}\n\n" if sse else f"{event}\n"
+            await asyncio.sleep(total * 2 / 3 / len(parts))
+        if sse and provider in ("openai", "perplexity"):
+            yield "data: [DONE]\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream" if sse else "application/x-ndjson")
+
+async def read_body(request: Request) -> dict:
+    # The backend cancels calls it no longer needs (hedging, deadlines); that is not an error here
+    try:
+        return await request.json()
+    except ClientDisconnect:
+        return {}
+
+def chat_completion(text: str) -> dict:
+    return {
+        "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": "fake",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+def chat_chunk(part: str) -> dict:
+    return {
+        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": "fake",
+        "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}],
+    }
+
+@app.post("/openai/v1/chat/completions")
+async def openai_chat(request: Request):
+    return await respond("openai", await read_body(request), chat_completion, chat_chunk)
+
+@app.post("/perplexity/chat/completions")
+async def perplexity_chat(request: Request):
+    return await respond("perplexity", await read_body(request), chat_completion, chat_chunk)
+
+@app.post("/anthropic/v1/messages")
+async def anthropic_messages(request: Request):
+    return await respond(
+        "anthropic", await read_body(request),
+        lambda text: {"type": "message", "role": "assistant", "content": [{"type": "text", "text": text}]},
+        lambda part: {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": part}},
+    )
+
+@app.get("/gemini/v1beta/models")
+async def gemini_models():
+    return {"models": [
+        {"name": "models/text-bison-001", "supportedGenerationMethods": ["generateText"]},
+        {"name": "models/gemini-1.5-flash", "supportedGenerationMethods": ["generateContent"]},
+    ]}
+
+@app.post("/gemini/v1beta/models/{target}")
+async def gemini_generate(target: str, request: Request):
+    body = await read_body(request)
+    action = target.rpartition(":")[2]
+    if action == "generateText":
+        # backend.main reads the answer from candidates[0]["content"]
+        return await respond("gemini", body, lambda text: {"candidates": [{"content": text, "output": text}]}, None)
+    gemini_content = lambda text: {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+    if action == "streamGenerateContent":
+        body = {**body, "stream": True}
+    return await respond("gemini", body, gemini_content, gemini_content)
+
+@app.post("/cohere/v1/generate")
+async def cohere_generate(request: Request):
+    return await respond(
+        "cohere", await read_body(request),
+        lambda text: {"generations": [{"text": text}]},
+        lambda part: {"text": part, "is_finished": False},
+        sse=False,
+    )
+
+@app.post("/cohere/v1/chat")
+async def cohere_chat(request: Request):
+    return await respond(
+        "cohere", await read_body(request),
+        lambda text: {"text": text},
+        lambda part: {"event_type": "text-generation", "text": part},
+        sse=False,
+    )
+
+@app.get("/stats")
+async def stats():
+    return counters
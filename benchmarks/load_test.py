@@ -0,0 +1,208 @@
+"""Drive POST /ask at a fixed request rate against fake providers and report latency percentiles:
+
+    python -m benchmarks.load_test --rps 20 --duration 30
+    python -m benchmarks.load_test --rps 50 --latency-ms 1500 --error-rate 0.05 --rate-limit-rate 0.02
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --rps 5   # an already running backend
+
+Unless --url is given, this starts benchmarks.fake_providers and a backend
+(uvicorn backend.main:app) pointed at it, each in its own process. Requests
+are sent open-loop: each one leaves at its scheduled time whether or not
+earlier ones finished, and latency is measured from that scheduled time, so
+a backend that falls behind shows up in the tail instead of slowing the
+load down.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import httpx
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile of already sorted values (q in 0..100)."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-q * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def spawn(module_app: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module_app, "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env={**os.environ, **env},
+    )
+
+async def wait_ready(url: str, process: subprocess.Popen | None = None, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"server for {url} exited with code {process.returncode}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout}s")
+            await asyncio.sleep(0.2)
+
+def backend_env(args, fake_url: str) -> dict:
+    env = {
+        "OPENAI_BASE_URL": f"{fake_url}/openai/v1",
+        "ANTHROPIC_BASE_URL": f"{fake_url}/anthropic/v1",
+        "GEMINI_BASE_URL": f"{fake_url}/gemini/v1beta",
+        "COHERE_BASE_URL": f"{fake_url}/cohere/v1",
+        "PERPLEXITY_BASE_URL": f"{fake_url}/perplexity",
+        "CACHE_ENABLED": "1" if args.cache else "0",
+    }
+    for provider in ("OPENAI", "ANTHROPIC", "GEMINI", "COHERE", "PERPLEXITY"):
+        env[f"{provider}_API_KEY"] = "fake-key"
+        if not args.keep_rate_limits:
+            # Measure the backend, not our own client-side throttling of real provider quotas
+            env[f"{provider}_RPM"] = "1000000"
+            env[f"{provider}_TPM"] = "1000000000"
+    return env
+
+def fake_env(args) -> dict:
+    env = {
+        "FAKE_LATENCY_MS": str(args.latency_ms),
+        "FAKE_LATENCY_SIGMA": str(args.latency_sigma),
+        "FAKE_ERROR_RATE": str(args.error_rate),
+        "FAKE_RATE_LIMIT_RATE": str(args.rate_limit_rate),
+        "FAKE_RESPONSE_WORDS": str(args.response_words),
+    }
+    if args.seed is not None:
+        env["FAKE_SEED"] = str(args.seed)
+    return env
+
+async def drive(url: str, rps: float, duration: float, payload_for) -> dict:
+    """Send rps * duration requests on a fixed schedule; collect latency, status and send lag."""
+    total = int(rps * duration)
+    latencies: list[float] = []
+    send_lag: list[float] = []
+    statuses: dict[str, int] = {}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+    async with httpx.AsyncClient(base_url=url, timeout=httpx.Timeout(300), limits=limits) as client:
+        async def one(i: int, scheduled: float):
+            send_lag.append(time.perf_counter() - scheduled)
+            try:
+                r = await client.post("/ask", json=payload_for(i))
+                status = str(r.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "200":
+                latencies.append(time.perf_counter() - scheduled)
+
+        start = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(one(i, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    send_lag.sort()
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 2),
+        "target_rps": rps,
+        "throughput_rps": round(statuses.get("200", 0) / elapsed, 2) if elapsed else 0.0,
+        "statuses": statuses,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+        # How late the generator itself sent requests; large values mean the numbers above are suspect
+        "generator_send_lag_ms": {"p99": ms(percentile(send_lag, 99)), "max": ms(send_lag[-1] if send_lag else None)},
+    }
+
+async def run(args) -> dict:
+    processes = []
+    url = args.url
+    try:
+        if url is None:
+            fake_port, backend_port = free_port(), free_port()
+            fake_url = f"http://127.0.0.1:{fake_port}"
+            processes.append(spawn("benchmarks.fake_providers:app", fake_port, fake_env(args)))
+            await wait_ready(f"{fake_url}/stats", processes[-1])
+            processes.append(spawn("backend.main:app", backend_port, backend_env(args, fake_url)))
+            url = f"http://127.0.0.1:{backend_port}"
+            await wait_ready(f"{url}/stats", processes[-1])
+        else:
+            await wait_ready(f"{url}/stats")
+
+        providers = args.providers.split(",")
+        def payload_for(i: int) -> dict:
+            body = {"query": f"Load test question number {i % args.distinct_queries}?", "providers": providers}
+            if args.summary_mode:
+                body["summary_mode"] = args.summary_mode
+            return body
+
+        report = await drive(url, args.rps, args.duration, payload_for)
+        async with httpx.AsyncClient(base_url=url) as client:
+            backend_stats = (await client.get("/stats")).json()
+        report["event_loop_lag_ms"] = backend_stats.get("event_loop_lag")
+        report["admission"] = backend_stats.get("admission")
+        report["provider_concurrency"] = backend_stats.get("provider_concurrency")
+        return report
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test /ask against fake provider APIs.")
+    parser.add_argument("--url", help="load an already running backend instead of starting one")
+    parser.add_argument("--rps", type=float, default=10, help="requests per second (default 10)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load (default 30)")
+    parser.add_argument("--providers", default="gemini,cohere,openai", help="comma-separated providers per request")
+    parser.add_argument("--distinct-queries", type=int, default=1_000_000, help="cycle through this many queries")
+    parser.add_argument("--summary-mode", choices=["auto", "local"], help="summary_mode sent with each request")
+    parser.add_argument("--cache", action="store_true", help="leave the response cache on")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="keep the backend's per-provider RPM/TPM limits")
+    parser.add_argument("--latency-ms", type=float, default=800, help="fake provider median latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal spread of fake latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake 500s")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of fake 429s")
+    parser.add_argument("--response-words", type=int, default=120, help="words per fake answer")
+    parser.add_argument("--seed", type=int, help="seed for the fake providers")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON only")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report))
+        return
+    lat = report["latency_ms"]
+    print(f"requests      {report['requests']} in {report['elapsed_s']}s (target {report['target_rps']} rps)")
+    print(f"throughput    {report['throughput_rps']} ok/s")
+    print(f"statuses      {report['statuses']}")
+    print(f"latency (ms)  p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    print(f"loop lag (ms) {report['event_loop_lag_ms']}")
+    print(f"send lag (ms) {report['generator_send_lag_ms']}")
+    print(f"admission     {report['admission']}")
+    for provider, slots in (report["provider_concurrency"] or {}).items():
+        print(f"{provider:<13} {slots}")
+
+if __name__ == "__main__":
+    main()
@@ -586,7 +586,9 @@ if st.session_state["active_chat"] is not None:
                             json={
                                 "query": msg["content"],
                                 "providers": st.session_state["selected_providers"],
-                                "history": history
+                                "history": history,
+                                # Leave headroom for the summary step inside the 60s request timeout
+                                "deadline_ms": 40000
                             },
                             timeout=60
                         )
@@ -0,0 +1,20 @@
+from unittest.mock import AsyncMock, MagicMock
+
+def fake_response(lines):
+    """Stand-in for a streamed httpx.Response whose body is `lines`."""
+    response = MagicMock()
+    async def aiter_lines():
+        for line in lines:
+            yield line
+    response.aiter_lines = aiter_lines
+    return response
+
+def streaming_client(mock_client, lines):
+    """Make a patched httpx.AsyncClient's `stream(...)` yield `lines`; returns the client instance."""
+    mock_instance = mock_client.return_value
+    mock_instance.__aenter__.return_value = mock_instance
+    stream = MagicMock()
+    stream.__aenter__ = AsyncMock(return_value=fake_response(lines))
+    stream.__aexit__ = AsyncMock(return_value=False)
+    mock_instance.stream = MagicMock(return_value=stream)
+    return mock_instance
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from backend import admission
+
+@pytest.mark.asyncio
+async def test_admits_up_to_limit_then_queues_in_order():
+    controller = admission.AdmissionController("t", max_concurrent=1, max_queue=2)
+    order = []
+    async def worker(name):
+        async with controller.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+    await asyncio.gather(worker("a"), worker("b"), worker("c"))
+    assert order == ["a", "b", "c"]
+    stats = controller.stats()
+    assert stats["admitted"] == 3 and stats["active"] == 0 and stats["queue_depth"] == 0
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_with_retry_after():
+    controller = admission.AdmissionController("t", max_concurrent=1, max_queue=0)
+    await controller.acquire()
+    with pytest.raises(admission.Overloaded) as excinfo:
+        await controller.acquire()
+    assert excinfo.value.retry_after >= 1
+    assert controller.rejected == 1
+    controller.release()
+    assert controller.active == 0
+
+@pytest.mark.asyncio
+async def test_wait_timeout_raises_overloaded_and_leaves_queue():
+    controller = admission.AdmissionController("t", max_concurrent=1, max_queue=5)
+    await controller.acquire()
+    with pytest.raises(admission.Overloaded):
+        await controller.acquire(timeout=0.01)
+    assert controller.waiting == 0
+    controller.release()
+    assert controller.active == 0
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_slot():
+    controller = admission.AdmissionController("t", max_concurrent=1, max_queue=5)
+    await controller.acquire()
+    waiter = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    controller.release()
+    assert controller.active == 0 and controller.waiting == 0
+    # Capacity is intact
+    await asyncio.wait_for(controller.acquire(), 0.1)
@@ -0,0 +1,75 @@
+import asyncio
+import io
+import json
+import pytest
+from unittest.mock import MagicMock
+from backend import batch, main
+
+def test_iter_lines_skips_blank_lines_and_keeps_numbers():
+    body = b'{"query": "a"}\n\n  \n{"query": "b"}'
+    assert list(batch.iter_lines(body)) == [(1, '{"query": "a"}'), (4, '{"query": "b"}')]
+
+def test_batch_key_ignores_provider_order_and_query_case():
+    a = batch.batch_key({"query": "What is AI?", "providers": ["openai", "gemini"]})
+    b = batch.batch_key({"query": "what is ai?", "providers": ["Gemini", "OpenAI"]})
+    assert a == b
+    assert a != batch.batch_key({"query": "What is AI?", "providers": ["openai"]})
+
+def test_batch_key_covers_every_field_but_id():
+    item = {"query": "What is AI?", "providers": ["openai", "gemini"]}
+    assert batch.batch_key({**item, "id": 1}) == batch.batch_key({**item, "id": 2})
+    for option in ({"summary_mode": "local"}, {"deadline_ms": 500}, {"min_quorum": 2}, {"continue_late": False}):
+        assert batch.batch_key({**item, **option}) != batch.batch_key(item), option
+
+async def collect(lines, answer, concurrency=2):
+    return [json.loads(line) async for line in batch.run_batch(lines, answer, concurrency)]
+
+@pytest.mark.asyncio
+async def test_run_batch_streams_results_errors_and_summary():
+    calls = []
+    async def answer(item):
+        calls.append(item["query"])
+        await asyncio.sleep(0.01)
+        return {"summary": f"answer to {item['query']}"}
+    lines = [
+        (1, '{"id": "q1", "query": "same", "providers": ["openai"]}'),
+        (2, 'not json'),
+        (3, '{"id": "q3", "query": "Same", "providers": ["openai"]}'),
+        (4, '{"query": "other", "providers": ["openai"]}'),
+    ]
+    results = await collect(lines, answer, concurrency=4)
+    summary = results.pop()
+    assert summary == {"done": True, "count": 4, "errors": 1, "deduplicated": 1}
+    by_line = {r["line"]: r for r in results}
+    assert by_line[1]["id"] == "q1" and by_line[1]["summary"] == "answer to same"
+    assert by_line[3]["summary"] == "answer to same"
+    assert "error" in by_line[2]
+    assert sorted(calls) == ["other", "same"]
+
+@pytest.mark.asyncio
+async def test_run_batch_bounds_concurrency():
+    running = [0]
+    peak = [0]
+    async def answer(item):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return {"summary": "ok"}
+    lines = [(i, json.dumps({"query": f"q{i}", "providers": []})) for i in range(10)]
+    results = await collect(lines, answer, concurrency=3)
+    assert len(results) == 11
+    assert peak[0] == 3
+
+@pytest.mark.asyncio
+async def test_cli_runs_inside_the_app_lifespan(monkeypatch):
+    disk = MagicMock()
+    monkeypatch.setattr(main, "DISK_CACHE", disk)
+    async def answer_item(item):
+        return {"summary": item["query"]}
+    monkeypatch.setattr(main, "answer_item", answer_item)
+    out = io.StringIO()
+    await batch._run_local(b'{"query": "a"}\n', out, concurrency=2)
+    assert json.loads(out.getvalue().splitlines()[0])["summary"] == "a"
+    # Shutting down flushes the disk cache's write-behind queue
+    disk.close.assert_called_once()
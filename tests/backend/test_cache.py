@@ -0,0 +1,73 @@
+from backend import cache
+
+def test_get_set_and_stats():
+    c = cache.ResponseCache()
+    assert c.get("k") is None
+    c.set("k", "value")
+    assert c.get("k") == "value"
+    stats = c.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+def test_lru_eviction_by_entry_count():
+    c = cache.ResponseCache(max_entries=2)
+    c.set("a", "1")
+    c.set("b", "2")
+    c.get("a")
+    c.set("c", "3")
+    assert "b" not in c
+    assert c.get("a") == "1" and c.get("c") == "3"
+    assert c.evictions == 1
+
+def test_byte_budget_eviction():
+    c = cache.ResponseCache(max_bytes=30)
+    c.set("a", "x" * 10)
+    c.set("b", "y" * 10)
+    c.set("c", "z" * 10)
+    assert len(c) == 2 and "a" not in c
+    assert c.stats()["bytes"] <= 30
+
+def test_oversized_value_is_not_stored():
+    c = cache.ResponseCache(max_bytes=10)
+    c.set("a", "x" * 100)
+    assert len(c) == 0
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    c = cache.ResponseCache(ttl=10)
+    c.set("a", "1")
+    c.set("b", "2", ttl=60)
+    now[0] += 11
+    assert c.get("a") is None
+    assert c.get("b") == "2"
+    assert c.expirations == 1
+
+def test_compressed_values_round_trip_and_save_bytes():
+    text = "the quick brown fox jumps over the lazy dog. " * 100
+    plain = cache.ResponseCache()
+    packed = cache.ResponseCache(compress=True, compress_min_bytes=64)
+    plain.set("k", text)
+    packed.set("k", text)
+    assert packed.get("k") == text
+    assert packed.stats()["bytes"] < plain.stats()["bytes"] / 5
+
+def test_clear_resets_bytes():
+    c = cache.ResponseCache()
+    c.set("a", "1")
+    c.clear()
+    assert len(c) == 0 and c.stats()["bytes"] == 0
+
+def test_cache_key_normalizes_query_whitespace_and_case():
+    assert cache.cache_key("openai", "What is  Python?") == cache.cache_key("openai", " what is python? ")
+
+def test_cache_key_depends_on_history_model_and_params():
+    base = cache.cache_key("openai", "explain more")
+    history = [{"role": "user", "content": "What is Python?"}]
+    assert cache.cache_key("openai", "explain more", history) != base
+    assert cache.cache_key("openai", "explain more", model="gpt-4o") != base
+    assert cache.cache_key("openai", "explain more", params={"temperature": 0.9}) != base
+    assert cache.cache_key("cohere", "explain more") != base
+
+def test_cache_key_is_fixed_size():
+    key = cache.cache_key("openai", "x" * 10_000)
+    assert len(key) == len("openai:") + 64
@@ -0,0 +1,64 @@
+import pytest
+import httpx
+from backend import clients
+
+def test_client_settings_per_provider_override(monkeypatch):
+    monkeypatch.setenv("HTTP_TIMEOUT", "12")
+    monkeypatch.setenv("GEMINI_HTTP_TIMEOUT", "7")
+    monkeypatch.setenv("GEMINI_HTTP_MAX_CONNECTIONS", "3")
+    gemini = clients.client_settings("gemini")
+    cohere = clients.client_settings("cohere")
+    assert gemini["timeout"].read == 7
+    assert gemini["limits"].max_connections == 3
+    assert cohere["timeout"].read == 12
+
+def test_client_settings_http2_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("OPENAI_HTTP_HTTP2", "0")
+    assert clients.client_settings("openai")["http2"] is False
+
+@pytest.mark.asyncio
+async def test_registry_reuses_client_until_closed():
+    registry = clients.ClientRegistry()
+    registry.start()
+    first = registry.get("cohere")
+    assert registry.get("cohere") is first
+    assert registry.get("gemini") is not first
+    await registry.aclose()
+    assert first.is_closed
+    assert not registry.started
+
+@pytest.mark.asyncio
+async def test_provider_client_outside_lifespan_is_closed_after_use(monkeypatch):
+    monkeypatch.setattr(clients, "registry", clients.ClientRegistry())
+    async with clients.provider_client("cohere") as client:
+        assert isinstance(client, httpx.AsyncClient)
+    assert client.is_closed
+
+@pytest.mark.asyncio
+async def test_provider_client_inside_lifespan_is_shared(monkeypatch):
+    registry = clients.ClientRegistry()
+    registry.start()
+    monkeypatch.setattr(clients, "registry", registry)
+    async with clients.provider_client("cohere") as first:
+        pass
+    async with clients.provider_client("cohere") as second:
+        pass
+    assert first is second and not first.is_closed
+    await registry.aclose()
+
+@pytest.mark.asyncio
+async def test_registry_reuses_openai_client_on_shared_pool():
+    registry = clients.ClientRegistry()
+    registry.start()
+    first = registry.openai("key-a")
+    assert registry.openai("key-a") is first
+    assert registry.openai("key-b") is not first
+    await registry.aclose()
+    assert registry.get("openai").is_closed is False
+    assert registry.openai("key-a") is not first
+    await registry.aclose()
+
+def test_base_url_override(monkeypatch):
+    monkeypatch.setenv("COHERE_BASE_URL", "http://127.0.0.1:9100/cohere/v1/")
+    assert clients.base_url("cohere") == "http://127.0.0.1:9100/cohere/v1"
+    assert clients.base_url("openai") == clients.DEFAULT_BASE_URLS["openai"]
@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+import secrets
+from backend import disk_cache
+from backend.cache import ResponseCache
+
+def make(tmp_path, **kwargs):
+    return disk_cache.DiskCache(str(tmp_path / "cache.db"), flush_interval=60, **kwargs)
+
+def test_pending_write_is_readable_before_flush(tmp_path):
+    cache = make(tmp_path)
+    cache.set("k", "value")
+    value, remaining = cache.get("k")
+    assert value == "value" and remaining > 0
+    cache.close()
+
+def test_entries_are_shared_between_instances(tmp_path):
+    writer, reader = make(tmp_path), make(tmp_path)
+    writer.set("k", "shared")
+    writer.flush()
+    assert reader.get("k")[0] == "shared"
+    writer.close()
+    reader.close()
+
+def test_entries_survive_reopen(tmp_path):
+    cache = make(tmp_path)
+    cache.set("k", "persisted")
+    cache.close()
+    reopened = make(tmp_path)
+    assert reopened.get("k")[0] == "persisted"
+    reopened.close()
+
+def test_expired_entries_miss_and_are_compacted(tmp_path):
+    cache = make(tmp_path)
+    cache.set("old", "x", ttl=-1)
+    cache.set("new", "y")
+    cache.flush()
+    assert cache.get("old") is None
+    cache.compact()
+    assert cache.stats()["entries"] == 1
+    cache.close()
+
+def test_compaction_trims_least_recently_used(tmp_path):
+    cache = make(tmp_path, max_bytes=300)
+    for i in range(10):
+        # Random hex barely compresses, so each row is ~60+ bytes
+        cache.set(f"k{i}", secrets.token_hex(50))
+        cache.flush()
+    cache.compact()
+    stats = cache.stats()
+    assert 0 < stats["bytes"] <= 300
+    assert cache.get("k9") is not None and cache.get("k0") is None
+    cache.close()
+
+def test_response_cache_reads_through_and_writes_behind(tmp_path):
+    disk = make(tmp_path)
+    first = ResponseCache(backing=disk)
+    first.set("k", "answer")
+    disk.flush()
+    second = ResponseCache(backing=disk)
+    assert second.get("k") == "answer"
+    assert second.stats()["backing_hits"] == 1
+    assert len(second) == 1
+    disk.close()
+
+def test_reads_do_not_wait_for_the_writer_lock(tmp_path):
+    cache = make(tmp_path)
+    cache.set("k", "value")
+    cache.flush()
+    with cache._db_lock:
+        # Held by the writer thread during a flush or compaction
+        assert cache.get("k")[0] == "value"
+        assert cache.stats()["entries"] == 1
+    cache.close()
+
+@pytest.mark.asyncio
+async def test_response_cache_aget_reads_backing_tier_in_a_thread(tmp_path, monkeypatch):
+    disk = make(tmp_path)
+    ResponseCache(backing=disk).set("k", "answer")
+    disk.flush()
+    cache = ResponseCache(backing=disk)
+    threads = []
+    async def to_thread(fn, *args):
+        threads.append(fn)
+        return fn(*args)
+    monkeypatch.setattr(asyncio, "to_thread", to_thread)
+    assert await cache.aget("k") == "answer"
+    assert await cache.aget("k") == "answer"  # now from memory
+    assert await cache.aget("missing") is None
+    assert threads == [disk.get, disk.get]
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+    disk.close()
@@ -0,0 +1,36 @@
+import httpx
+from backend import errors
+
+def http_error(status):
+    request = httpx.Request("POST", "https://example.test")
+    response = httpx.Response(status, request=request)
+    return httpx.HTTPStatusError("boom", request=request, response=response)
+
+def test_classify_http_status_errors():
+    assert errors.classify_error(http_error(401)) == "auth"
+    assert errors.classify_error(http_error(403)) == "auth"
+    assert errors.classify_error(http_error(429)) == "rate_limit"
+    assert errors.classify_error(http_error(503)) == "server"
+    assert errors.classify_error(http_error(400)) == "error"
+
+def test_classify_transport_errors():
+    assert errors.classify_error(httpx.ReadTimeout("slow")) == "timeout"
+    assert errors.classify_error(httpx.ConnectError("refused")) == "connection"
+    assert errors.classify_error(ValueError("bad json")) == "error"
+
+def test_negative_ttl_env_override(monkeypatch):
+    assert errors.negative_ttl("auth") == errors.DEFAULT_NEGATIVE_TTLS["auth"]
+    monkeypatch.setenv("NEGATIVE_CACHE_TTL_RATE_LIMIT", "3")
+    assert errors.negative_ttl("rate_limit") == 3
+    # Retry-After wins for rate limits
+    assert errors.negative_ttl("rate_limit", retry_after=60) == 60
+    assert errors.negative_ttl("server", retry_after=60) == errors.DEFAULT_NEGATIVE_TTLS["server"]
+
+def test_retry_after_seconds_and_date():
+    request = httpx.Request("POST", "https://example.test")
+    def err(headers):
+        return httpx.HTTPStatusError("boom", request=request, response=httpx.Response(429, request=request, headers=headers))
+    assert errors.retry_after(err({"Retry-After": "7"})) == 7
+    assert errors.retry_after(err({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+    assert errors.retry_after(err({})) is None
+    assert errors.retry_after(ValueError("no response")) is None
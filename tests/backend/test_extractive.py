@@ -0,0 +1,45 @@
+from backend import extractive
+
+RESPONSES = {
+    "gemini": "Python is a high-level programming language. It emphasizes code readability with significant "
+              "indentation. Python supports multiple programming paradigms, including procedural and "
+              "object-oriented programming. It was created by Guido van Rossum.",
+    "cohere": "Python is a popular, high-level programming language known for readability. Guido van Rossum "
+              "created Python and released it in 1991. It has a large standard library. Many developers use "
+              "Python for data science.",
+    "openai": "Python is an interpreted high-level language. Its design philosophy emphasizes code readability. "
+              "Python is dynamically typed and garbage-collected. It is widely used in web development, "
+              "automation and machine learning.",
+}
+
+def test_split_sentences_handles_markdown_and_lists():
+    text = "**Python** is great for scripts. It is easy to read!\n- Supports many paradigms well\n# Title\n1. Has a big ecosystem of packages"
+    assert extractive.split_sentences(text) == [
+        "Python is great for scripts.",
+        "It is easy to read!",
+        "Supports many paradigms well",
+        "Has a big ecosystem of packages",
+    ]
+
+def test_terms_drop_stopwords_and_stem():
+    assert extractive.terms("The languages are running") == ["language", "run"]
+
+def test_textrank_favours_connected_sentences():
+    graph = [{1: 0.5, 2: 0.5}, {0: 0.5}, {0: 0.5}, {}]
+    scores = extractive.textrank(graph)
+    assert scores[0] == max(scores)
+    assert abs(sum(scores) - 1.0) < 1e-6
+
+def test_extractive_summary_picks_central_non_redundant_sentences():
+    text, sources = extractive.extractive_summary(RESPONSES, "What is Python?", max_sentences=3)
+    sentences = extractive.split_sentences(text)
+    assert len(sentences) == 3
+    # Points made by several providers win over one-off details
+    assert any("high-level" in s for s in sentences)
+    assert not any("garbage-collected" in s for s in sentences)
+    # No near-duplicate picks: at most one "Python is ... high-level ... language" sentence
+    assert sum("high-level" in s for s in sentences) == 1
+    assert set(sources) <= set(RESPONSES)
+
+def test_extractive_summary_returns_none_when_nothing_to_condense():
+    assert extractive.extractive_summary({"a": "One short sentence here."}, max_sentences=5) is None
@@ -0,0 +1,48 @@
+from backend import history
+from backend.tokens import count_tokens
+
+def turns(n, words=20):
+    return [{"role": "user" if i % 2 == 0 else "ai",
+             "content": f"Turn {i} says something. " + " ".join(["word"] * words)} for i in range(n)]
+
+def test_short_history_is_unchanged():
+    h = turns(2)
+    assert history.compact_history(h, 1000) == (None, h)
+    assert history.build_prompt(h, "next?", 1000) == (
+        f"User: {h[0]['content']}\nAI: {h[1]['content']}\nUser: next?\nAI:"
+    )
+
+def test_long_history_keeps_recent_turns_and_summarizes_older():
+    h = turns(40)
+    summary, kept = history.compact_history(h, 400)
+    assert kept == h[-len(kept):] and 0 < len(kept) < 40
+    assert summary.startswith(history.SUMMARY_HEADER)
+    # Digests are first sentences, most recent older turns first to be kept
+    assert f"Turn {40 - len(kept) - 1} says something." in summary
+    assert "Turn 0 says" not in summary
+    prompt = history.build_prompt(h, "next?", 400)
+    assert count_tokens(prompt) <= 400 + 10
+    assert prompt.endswith("User: next?\nAI:")
+
+def test_verbatim_turn_cap():
+    summary, kept = history.compact_history(turns(12, words=1), 10_000, max_verbatim=4)
+    assert len(kept) == 4
+    assert summary.count("\n- ") == 8
+
+def test_oversized_last_turn_is_truncated():
+    h = [{"role": "user", "content": "x" * 10_000 + " tail"}]
+    summary, kept = history.compact_history(h, 100)
+    assert summary is None
+    assert count_tokens(kept[0]["content"]) <= 75
+
+def test_build_messages_puts_summary_in_system_message():
+    messages = history.build_messages(turns(40), "next?", 400, system="Be brief.")
+    assert messages[0] == {"role": "system", "content": "Be brief."}
+    assert messages[1]["role"] == "system" and messages[1]["content"].startswith(history.SUMMARY_HEADER)
+    assert messages[-1] == {"role": "user", "content": "next?"}
+    assert {m["role"] for m in messages[2:-1]} <= {"user", "assistant"}
+
+def test_history_budget_env_override(monkeypatch):
+    assert history.history_budget("openai") == history.DEFAULT_HISTORY_BUDGETS["openai"]
+    monkeypatch.setenv("OPENAI_HISTORY_TOKENS", "123")
+    assert history.history_budget("openai") == 123
@@ -0,0 +1,37 @@
+import asyncio
+import time
+import pytest
+from backend.loop_monitor import LoopLagMonitor, monitor_from_env
+
+def test_stats_quantiles_and_reset():
+    monitor = LoopLagMonitor()
+    assert monitor.stats() == {"samples": 0, "p50_ms": None, "p99_ms": None, "max_ms": 0.0}
+    for lag in (0.001, 0.002, 0.003, -0.001, 0.5):
+        monitor.record(lag)
+    stats = monitor.stats()
+    assert stats["samples"] == 5
+    assert stats["p50_ms"] == 2.0
+    assert stats["max_ms"] == 500.0
+    monitor.reset()
+    assert monitor.stats()["samples"] == 0
+
+def test_window_keeps_recent_samples():
+    monitor = LoopLagMonitor(window=3)
+    for lag in (0.1, 0.2, 0.3, 0.4):
+        monitor.record(lag)
+    assert monitor.stats()["samples"] == 3
+    assert monitor.quantile(0.0) == 0.2
+
+@pytest.mark.asyncio
+async def test_blocking_call_shows_up_as_lag():
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.1)  # block the loop
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+    assert monitor.max_lag >= 0.05
+
+def test_monitor_from_env(monkeypatch):
+    monkeypatch.setenv("LOOP_LAG_INTERVAL_MS", "250")
+    assert monitor_from_env().interval == 0.25
@@ -1,14 +1,23 @@
 import pytest
 from fastapi.testclient import TestClient
 from backend import main
+from backend.resilience import CircuitBreaker
+from backend.admission import AdmissionController
+from backend.semantic_cache import SemanticIndex
+from backend.tokens import count_tokens
 from unittest.mock import patch, AsyncMock, MagicMock
+from tests.backend.streaming_mocks import streaming_client
 import httpx
+import json
+import asyncio
+import time
 
 client = TestClient(main.app)
 
-def test_cache_set_and_get():
+@pytest.mark.asyncio
+async def test_cache_set_and_get():
     main.set_cache("hello", "openai", "test-response")
-    assert main.get_cached("hello", "openai") == "test-response"
+    assert await main.get_cached("hello", "openai") == "test-response"
 
 def test_simulate_response():
     resp = main.simulate_response("FakeProvider", "test")
@@ -38,13 +47,18 @@ async def test_call_cohere_success(mock_client, monkeypatch):
     assert result == "Cohere answer"
 
 @pytest.mark.asyncio
-@patch("openai.ChatCompletion.create")
-async def test_call_openai_success(mock_create, monkeypatch):
+@patch("openai.AsyncOpenAI")
+async def test_call_openai_success(mock_openai, monkeypatch):
     monkeypatch.setenv("OPENAI_API_KEY", "fake-key")
     main.CACHE.clear()
-    mock_create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="OpenAI answer"))])
+    mock_instance = mock_openai.return_value
+    mock_instance.__aenter__.return_value = mock_instance
+    mock_instance.chat.completions.create = AsyncMock(
+        return_value=MagicMock(choices=[MagicMock(message=MagicMock(content="OpenAI answer"))])
+    )
     result = await main.call_openai("test", [])
     assert result == "OpenAI answer"
+    assert mock_openai.call_args.kwargs["api_key"] == "fake-key"
 
 @pytest.mark.asyncio
 async def test_call_gemini_simulated(monkeypatch):
@@ -91,4 +105,649 @@ def test_ask_endpoint(monkeypatch):
     assert data["query"] == "test question"
     assert "summary" in data
     assert "responses" in data
-    assert "sources" in data
\ No newline at end of file
+    assert "sources" in data
+    usage = data["token_usage"]
+    assert set(usage) == {"gemini", "cohere", "openai", "claude", "perplexity"}
+    assert usage["claude"]["input_tokens"] > 0 and usage["claude"]["output_tokens"] > 0
+    # Missing-key warnings produced no output
+    assert usage["openai"]["output_tokens"] == 0
+
+def test_token_usage_accepts_frontend_provider_spelling():
+    # The Streamlit frontend sends "OpenAI", "Gemini", "Cohere"
+    history = [{"role": "user", "content": "long earlier turn " * 400}, {"role": "ai", "content": "ok"}]
+    results = {"OpenAI": "an answer", "Gemini": "an answer", "Cohere": "an answer"}
+    usage = main.token_usage(results, "question", history)
+    lower = main.token_usage({k.lower(): v for k, v in results.items()}, "question", history)
+    assert set(usage) == set(results)
+    for provider in results:
+        assert usage[provider] == lower[provider.lower()]
+    assert main.query_budget("OpenAI") == main.query_budget("openai")
+    assert main.prompt_tokens("OpenAI", "q", history) == main.prompt_tokens("openai", "q", history)
+
+def parse_sse(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_ask_stream_endpoint(monkeypatch):
+    for key in ["GEMINI_API_KEY", "COHERE_API_KEY", "OPENAI_API_KEY", "ANTHROPIC_API_KEY", "PERPLEXITY_API_KEY"]:
+        monkeypatch.setenv(key, "")
+
+    payload = {"query": "stream question", "providers": ["claude", "perplexity", "mystery"]}
+    response = client.post("/ask/stream", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names == ["provider_result"] * 3 + ["summary", "done"]
+    assert {data["provider"] for _, data in events[:3]} == {"claude", "perplexity", "mystery"}
+    done = events[-1][1]
+    assert done["sources"] == ["Claude", "Perplexity", "Mystery"]
+    assert set(done["timings"]["providers_ms"]) == {"claude", "perplexity", "mystery"}
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_call_gemini_pinned_model_skips_discovery(mock_client, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "fake-key")
+    monkeypatch.setenv("GEMINI_MODEL", "models/text-bison-001")
+    main.CACHE.clear()
+    mock_instance = mock_client.return_value
+    mock_instance.__aenter__.return_value = mock_instance
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"candidates": [{"content": "Gemini answer"}]}
+    mock_instance.post = AsyncMock(return_value=mock_response)
+    mock_instance.get = AsyncMock()
+    result = await main.call_gemini("test")
+    assert result == "Gemini answer"
+    mock_instance.get.assert_not_called()
+    assert "/v1beta/models/text-bison-001:generateText" in mock_instance.post.call_args.args[0]
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_call_cohere_failure_goes_to_negative_cache(mock_client, monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "fake-key")
+    monkeypatch.setattr(main.RETRY, "max_attempts", 1)
+    main.CACHE.clear()
+    main.NEGATIVE_CACHE.clear()
+    mock_instance = mock_client.return_value
+    mock_instance.__aenter__.return_value = mock_instance
+    mock_instance.post = AsyncMock(side_effect=httpx.ConnectError("refused"))
+    result = await main.call_cohere("negative test")
+    assert result.startswith("⚠️ Cohere call failed")
+    assert len(main.CACHE) == 0
+    assert main.NEGATIVE_CACHE.get(main.provider_cache_key("negative test", "cohere")) == result
+    # A cached failure is served without calling the provider again
+    assert await main.call_cohere("negative test") == result
+    assert mock_instance.post.await_count == 1
+    main.NEGATIVE_CACHE.clear()
+
+@pytest.mark.asyncio
+async def test_missing_key_is_not_cached(monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "")
+    main.CACHE.clear()
+    main.NEGATIVE_CACHE.clear()
+    await main.call_cohere("no key")
+    assert len(main.CACHE) == 0 and len(main.NEGATIVE_CACHE) == 0
+
+@pytest.mark.asyncio
+async def test_cache_is_history_aware():
+    main.CACHE.clear()
+    history_a = [{"role": "user", "content": "What is Python?"}, {"role": "ai", "content": "A language."}]
+    history_b = [{"role": "user", "content": "What is Rust?"}, {"role": "ai", "content": "A language."}]
+    main.set_cache("explain more", "openai", "about python", history_a)
+    assert await main.get_cached("Explain   more", "openai", history_a) == "about python"
+    assert await main.get_cached("explain more", "openai", history_b) is None
+    assert await main.get_cached("explain more", "openai") is None
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_concurrent_identical_calls_are_coalesced(mock_client, monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "fake-key")
+    main.CACHE.clear()
+    mock_instance = mock_client.return_value
+    mock_instance.__aenter__.return_value = mock_instance
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"generations": [{"text": "Shared answer"}]}
+    async def slow_post(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return mock_response
+    mock_instance.post = AsyncMock(side_effect=slow_post)
+    results = await asyncio.gather(*[main.call_cohere("trending question") for _ in range(4)])
+    assert results == ["Shared answer"] * 4
+    assert mock_instance.post.await_count == 1
+
+@pytest.mark.asyncio
+async def test_collect_responses_returns_partial_results_at_deadline(monkeypatch):
+    finished = []
+    async def fake_call(provider, query, history):
+        await asyncio.sleep(0.2 if provider == "slow" else 0)
+        finished.append(provider)
+        return f"{provider} answer"
+    monkeypatch.setattr(main, "call_provider", fake_call)
+    results, timed_out = await main.collect_responses(["fast", "slow"], "q", [], deadline_ms=20)
+    assert results["fast"] == "fast answer"
+    assert results["slow"].startswith("⚠️ Slow timed out")
+    assert timed_out == ["slow"]
+    # continue_late lets the slow call finish in the background
+    await asyncio.sleep(0.25)
+    assert "slow" in finished
+
+@pytest.mark.asyncio
+async def test_collect_responses_waits_for_quorum(monkeypatch):
+    async def fake_call(provider, query, history):
+        await asyncio.sleep(0.05 if provider == "b" else 0.5)
+        return f"{provider} answer"
+    monkeypatch.setattr(main, "call_provider", fake_call)
+    results, timed_out = await main.collect_responses(["a", "b"], "q", [], deadline_ms=1, min_quorum=1, continue_late=False)
+    assert results["b"] == "b answer"
+    assert timed_out == ["a"]
+
+@pytest.mark.asyncio
+async def test_collect_responses_quorum_ignores_failures(monkeypatch):
+    async def fake_call(provider, query, history):
+        if provider == "openai":
+            return "⚠️ OpenAI API key missing. Set OPENAI_API_KEY in .env"
+        await asyncio.sleep(0.05)
+        return "gemini answer"
+    monkeypatch.setattr(main, "call_provider", fake_call)
+    results, timed_out = await main.collect_responses(["openai", "gemini"], "q", [], deadline_ms=10, min_quorum=1)
+    assert results["gemini"] == "gemini answer"
+    assert results["openai"].startswith("⚠️ OpenAI API key missing")
+    assert timed_out == []
+
+def test_ask_endpoint_with_no_providers():
+    response = client.post("/ask", json={"query": "q", "providers": [], "deadline_ms": 50})
+    assert response.status_code == 200
+    assert response.json()["summary"].startswith("⚠️ No valid responses")
+
+def test_ask_endpoint_reports_timed_out(monkeypatch):
+    async def fake_call(provider, query, history):
+        await asyncio.sleep(0.5 if provider == "slow" else 0)
+        return f"{provider} answer"
+    monkeypatch.setattr(main, "call_provider", fake_call)
+    response = client.post("/ask", json={"query": "q", "providers": ["fast", "slow"], "deadline_ms": 50, "continue_late": False})
+    data = response.json()
+    assert data["timed_out"] == ["slow"]
+    assert data["responses"]["fast"] == "fast answer"
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_open_breaker_fails_fast(mock_client, monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "fake-key")
+    monkeypatch.setitem(main.BREAKERS, "cohere", CircuitBreaker("cohere", min_calls=1))
+    main.CACHE.clear()
+    main.NEGATIVE_CACHE.clear()
+    mock_instance = mock_client.return_value
+    mock_instance.__aenter__.return_value = mock_instance
+    mock_instance.post = AsyncMock(side_effect=httpx.ConnectError("refused"))
+    await main.call_cohere("breaker question")
+    assert main.BREAKERS["cohere"].state == "open"
+    main.NEGATIVE_CACHE.clear()
+    result = await main.call_cohere("breaker question")
+    assert "circuit open" in result
+    assert mock_instance.post.await_count == 1
+    main.NEGATIVE_CACHE.clear()
+
+def test_provider_health_endpoint():
+    response = client.get("/health/providers")
+    assert response.status_code == 200
+    assert set(response.json()) == {"gemini", "cohere", "openai"}
+    assert response.json()["cohere"]["state"] in ("closed", "open", "half_open")
+
+def http_status_error(status, headers=None):
+    request = httpx.Request("POST", "https://api.cohere.ai/v1/generate")
+    response = httpx.Response(status, request=request, headers=headers)
+    return httpx.HTTPStatusError(f"{status} error", request=request, response=response)
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_rate_limited_call_is_retried(mock_client, monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "fake-key")
+    monkeypatch.setitem(main.BREAKERS, "cohere", CircuitBreaker("cohere"))
+    main.CACHE.clear()
+    main.NEGATIVE_CACHE.clear()
+    mock_instance = mock_client.return_value
+    mock_instance.__aenter__.return_value = mock_instance
+    ok = MagicMock()
+    ok.json.return_value = {"generations": [{"text": "after retry"}]}
+    mock_instance.post = AsyncMock(side_effect=[http_status_error(429, {"Retry-After": "0"}), ok])
+    assert await main.call_cohere("retry question") == "after retry"
+    assert mock_instance.post.await_count == 2
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_long_retry_after_is_honored_not_retried(mock_client, monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "fake-key")
+    monkeypatch.setitem(main.BREAKERS, "cohere", CircuitBreaker("cohere"))
+    main.CACHE.clear()
+    main.NEGATIVE_CACHE.clear()
+    mock_instance = mock_client.return_value
+    mock_instance.__aenter__.return_value = mock_instance
+    mock_instance.post = AsyncMock(side_effect=http_status_error(429, {"Retry-After": "60"}))
+    result = await main.call_cohere("long wait question")
+    assert result.startswith("⚠️ Cohere call failed")
+    assert mock_instance.post.await_count == 1
+    # Served from the negative cache for as long as the provider asked us to wait
+    key = main.provider_cache_key("long wait question", "cohere", None)
+    assert 59 < main.NEGATIVE_CACHE._entries[key][3] - time.monotonic() <= 60
+    main.NEGATIVE_CACHE.clear()
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_client_errors_are_not_retried(mock_client, monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "fake-key")
+    main.CACHE.clear()
+    main.NEGATIVE_CACHE.clear()
+    mock_instance = mock_client.return_value
+    mock_instance.__aenter__.return_value = mock_instance
+    mock_instance.post = AsyncMock(side_effect=http_status_error(400))
+    result = await main.call_cohere("bad request question")
+    assert result.startswith("⚠️ Cohere call failed")
+    assert mock_instance.post.await_count == 1
+    main.NEGATIVE_CACHE.clear()
+
+@pytest.mark.asyncio
+async def test_auth_failure_does_not_close_half_open_breaker(monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "bad-key")
+    breaker = CircuitBreaker("cohere", open_seconds=0)
+    breaker.state = "open"
+    monkeypatch.setitem(main.BREAKERS, "cohere", breaker)
+    main.CACHE.clear()
+    main.NEGATIVE_CACHE.clear()
+    fetch = AsyncMock(side_effect=http_status_error(401))
+    result = await main.provider_call("cohere", "probe with bad key", None, fetch)
+    assert result.startswith("⚠️ Cohere call failed")
+    # Neither closed nor re-tripped, and the probe slot is free for a real probe
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert breaker.latency_quantile(0.5) is None
+    main.NEGATIVE_CACHE.clear()
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_retries_stop_at_request_deadline(mock_client, monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "fake-key")
+    monkeypatch.setitem(main.BREAKERS, "cohere", CircuitBreaker("cohere"))
+    main.CACHE.clear()
+    main.NEGATIVE_CACHE.clear()
+    mock_instance = mock_client.return_value
+    mock_instance.__aenter__.return_value = mock_instance
+    # Retry-After far beyond the 50ms budget: give up instead of sleeping
+    mock_instance.post = AsyncMock(side_effect=http_status_error(503, {"Retry-After": "5"}))
+    results, _ = await main.collect_responses(["cohere"], "deadline question", [], deadline_ms=50)
+    assert results["cohere"].startswith("⚠️ Cohere call failed")
+    assert mock_instance.post.await_count == 1
+    main.NEGATIVE_CACHE.clear()
+
+def test_ask_returns_503_when_admission_queue_is_full(monkeypatch):
+    monkeypatch.setattr(main, "ADMISSION", AdmissionController("ask", max_concurrent=0, max_queue=0))
+    response = client.post("/ask", json={"query": "q", "providers": ["claude"]})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    response = client.post("/ask/stream", json={"query": "q", "providers": ["claude"]})
+    assert response.status_code == 503
+
+def test_ask_stream_releases_admission_slot(monkeypatch):
+    controller = AdmissionController("ask", max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(main, "ADMISSION", controller)
+    for _ in range(2):
+        response = client.post("/ask/stream", json={"query": "q", "providers": ["claude"]})
+        assert response.status_code == 200
+    assert controller.active == 0
+
+def test_ask_batch_endpoint_streams_jsonl(monkeypatch):
+    for key in ["ANTHROPIC_API_KEY", "PERPLEXITY_API_KEY"]:
+        monkeypatch.setenv(key, "")
+    body = "\n".join([
+        json.dumps({"id": 1, "query": "batch one", "providers": ["claude"]}),
+        json.dumps({"id": 2, "query": "batch two", "providers": ["perplexity"]}),
+        json.dumps({"id": 3, "providers": ["claude"]}),
+    ])
+    response = client.post("/ask/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[-1]["done"] is True and lines[-1]["count"] == 3 and lines[-1]["errors"] == 1
+    by_id = {line["id"]: line for line in lines[:-1]}
+    assert by_id[1]["query"] == "batch one" and "summary" in by_id[1]
+    assert "error" in by_id[3]
+
+@pytest.mark.asyncio
+async def test_semantic_cache_serves_paraphrases(monkeypatch):
+    monkeypatch.setattr(main, "SEMANTIC_CACHE", SemanticIndex())
+    main.CACHE.clear()
+    main.set_cache("What is Python?", "openai", "A programming language.")
+    assert await main.get_cached("what's python", "openai") == "A programming language."
+    assert await main.get_cached("what's python", "cohere") is None
+    assert await main.get_cached("what is rust", "openai") is None
+
+@pytest.mark.asyncio
+async def test_semantic_match_to_evicted_answer_is_a_miss(monkeypatch):
+    index = SemanticIndex()
+    monkeypatch.setattr(main, "SEMANTIC_CACHE", index)
+    main.CACHE.clear()
+    main.set_cache("What is Python?", "openai", "A programming language.")
+    main.CACHE.clear()
+    assert await main.get_cached("what's python", "openai") is None
+    assert len(index) == 0
+    assert index.stats()["hits"] == 0 and index.stats()["stale"] == 1
+
+def test_summary_prompt_fits_summarizer_context(monkeypatch):
+    monkeypatch.setenv("COHERE_CONTEXT_TOKENS", "4096")
+    responses = {"openai": "short answer.", "gemini": "word " * 5000, "cohere": "long sentence here. " * 3000}
+    prompt = main.build_summary_prompt(responses, "what?", "cohere")
+    assert count_tokens(prompt, "cohere") <= main.query_budget("cohere")
+    # Short responses survive intact; only the long ones are cut
+    assert "**openai**: short answer." in prompt
+    assert "[...]" in prompt
+
+@pytest.mark.asyncio
+async def test_oversized_query_is_trimmed_before_sending(monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "key")
+    main.CACHE.clear()
+    sent = {}
+    async def fake_fetch(query, history, api_key):
+        sent["query"] = query
+        return "ok"
+    huge = "token " * 20000
+    assert await main.provider_call("cohere", huge, [], fake_fetch) == "ok"
+    assert count_tokens(sent["query"], "cohere") <= main.query_budget("cohere")
+    # Cached under the original query
+    assert await main.get_cached(huge, "cohere", []) == "ok"
+
+@pytest.mark.asyncio
+async def test_summarize_single_response_skips_summarizer(monkeypatch):
+    summarizer = AsyncMock(return_value="should not be called")
+    monkeypatch.setattr(main, "call_openai", summarizer)
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    summary, decision = await main.summarize({"gemini": "Paris.", "cohere": "⚠️ Cohere call failed"}, "capital?")
+    assert decision["mode"] == "single" and decision["provider"] == "gemini"
+    assert summary.endswith("Paris.")
+    summarizer.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_summarize_near_identical_responses_picks_one(monkeypatch):
+    summarizer = AsyncMock(return_value="should not be called")
+    monkeypatch.setattr(main, "call_openai", summarizer)
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    responses = {
+        "gemini": "The capital of France is Paris.",
+        "cohere": "The capital of France is Paris!",
+        "openai": "the capital of France is Paris",
+    }
+    summary, decision = await main.summarize(responses, "capital?")
+    assert decision["mode"] == "consensus" and decision["similarity"] >= main.SUMMARY_SKIP_SIMILARITY
+    assert responses[decision["provider"]] in summary
+    summarizer.assert_not_awaited()
+
+def test_conflicting_facts_are_not_consensus():
+    decision = main.summary_decision({
+        "openai": "The Treaty of Versailles was signed in 1919 in the Hall of Mirrors.",
+        "gemini": "The Treaty of Versailles was signed in 1920 in the Hall of Mirrors.",
+    })
+    assert decision["mode"] == "llm" and decision["similarity"] >= main.SUMMARY_SKIP_SIMILARITY
+    decision = main.summary_decision({
+        "openai": "Yes, it is safe to take ibuprofen with food.",
+        "gemini": "No, it isn't safe to take ibuprofen with food.",
+    })
+    assert decision["mode"] == "llm"
+
+@pytest.mark.asyncio
+async def test_summarize_different_responses_calls_summarizer(monkeypatch):
+    summarizer = AsyncMock(return_value="merged")
+    monkeypatch.setattr(main, "call_openai", summarizer)
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    main.BREAKERS["openai"].state = "closed"
+    responses = {"gemini": "Paris is the capital.", "cohere": "France's capital city, home of the Louvre, is Paris."}
+    summary, decision = await main.summarize(responses, "capital?")
+    assert decision["mode"] == "llm" and decision["provider"] == "openai"
+    assert summary.endswith("merged")
+    summarizer.assert_awaited_once()
+
+def test_ask_endpoint_reports_summary_decision(monkeypatch):
+    async def fake_call(provider, query, history):
+        return "same answer" if provider == "a" else f"⚠️ {provider} failed"
+    monkeypatch.setattr(main, "call_provider", fake_call)
+    data = client.post("/ask", json={"query": "q", "providers": ["a", "b"]}).json()
+    assert data["summary_decision"]["mode"] == "single"
+    assert data["summary_decision"]["reason"] == "only one valid response"
+
+@pytest.mark.asyncio
+async def test_summary_mode_local_never_calls_summarizer(monkeypatch):
+    summarizer = AsyncMock(return_value="should not be called")
+    monkeypatch.setattr(main, "call_openai", summarizer)
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    responses = {
+        "gemini": "Paris is the capital of France. It is on the Seine. It has the Eiffel Tower built in 1889.",
+        "cohere": "The capital of France is Paris. Paris has about two million residents. The Louvre is the largest art museum there.",
+        "openai": "France's capital city is Paris. It is known as the City of Light. Paris hosted the Olympics in 2024.",
+    }
+    summary, decision = await main.summarize(responses, "capital of France?", mode="local")
+    assert decision["mode"] == "local" and decision["reason"] == "summary_mode=local"
+    assert summary.startswith("📝 **Extractive Summary**")
+    summarizer.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_summarize_falls_back_to_local_without_keys(monkeypatch):
+    for key in ["GEMINI_API_KEY", "COHERE_API_KEY", "OPENAI_API_KEY"]:
+        monkeypatch.setenv(key, "")
+    responses = {"a": "Short one.", "b": "Something else entirely."}
+    summary, decision = await main.summarize(responses, "q")
+    assert decision["mode"] == "concatenated"
+    assert "**a**: Short one." in summary
+
+@pytest.mark.asyncio
+async def test_hedged_summary_starts_backup_when_primary_is_slow(monkeypatch):
+    cancelled = asyncio.Event()
+    async def slow(prompt, history):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "slow summary"
+    async def fast(prompt, history):
+        return "fast summary"
+    monkeypatch.setattr(main, "hedge_delay", lambda provider: 0.05)
+    result = await main.hedged_summary([("openai", slow), ("cohere", fast)], lambda name: "prompt")
+    assert result == ("cohere", "fast summary", 2)
+    await asyncio.wait_for(cancelled.wait(), 1)
+
+@pytest.mark.asyncio
+async def test_hedged_summary_fails_over_immediately(monkeypatch):
+    async def broken(prompt, history):
+        return "⚠️ OpenAI call failed"
+    async def ok(prompt, history):
+        return "summary"
+    monkeypatch.setattr(main, "hedge_delay", lambda provider: 60)
+    result = await asyncio.wait_for(main.hedged_summary([("openai", broken), ("cohere", ok)], lambda name: "prompt"), 1)
+    assert result == ("cohere", "summary", 2)
+    assert await main.hedged_summary([("openai", broken)], lambda name: "prompt") is None
+
+@pytest.mark.asyncio
+async def test_hedged_summary_primary_wins_without_backup(monkeypatch):
+    backup = AsyncMock(return_value="backup")
+    async def primary(prompt, history):
+        return "primary"
+    monkeypatch.setattr(main, "hedge_delay", lambda provider: 1)
+    result = await main.hedged_summary([("openai", primary), ("cohere", backup)], lambda name: "prompt")
+    assert result == ("openai", "primary", 1)
+    backup.assert_not_awaited()
+
+def test_hedge_delay_uses_observed_p90(monkeypatch):
+    breaker = CircuitBreaker("openai")
+    for latency in [0.5] * 9 + [2.0]:
+        breaker.record_success(latency)
+    monkeypatch.setitem(main.BREAKERS, "openai", breaker)
+    assert main.hedge_delay("openai") == 2.0
+    monkeypatch.setitem(main.BREAKERS, "openai", CircuitBreaker("openai"))
+    assert main.hedge_delay("openai") == main.SUMMARY_HEDGE_DEFAULT_MS / 1000
+    monkeypatch.setattr(main, "SUMMARY_HEDGING", False)
+    assert main.hedge_delay("openai") is None
+
+def stream_with_slow_provider(monkeypatch, **extra):
+    async def fake_call(provider, query, history):
+        await asyncio.sleep(0.3 if provider == "slow" else 0)
+        return f"The {provider} provider says the answer is {provider}. It has reasons for saying so."
+    monkeypatch.setattr(main, "call_provider", fake_call)
+    for key in ["GEMINI_API_KEY", "COHERE_API_KEY", "OPENAI_API_KEY"]:
+        monkeypatch.setenv(key, "")
+    payload = {"query": "q", "providers": ["fast", "slow"], "summary_quorum": 1, **extra}
+    return parse_sse(client.post("/ask/stream", json=payload).text)
+
+def test_stream_summary_starts_at_quorum_and_lists_addenda(monkeypatch):
+    events = stream_with_slow_provider(monkeypatch)
+    names = [name for name, _ in events]
+    assert names == ["provider_result", "summary", "provider_result", "summary_addendum", "done"]
+    summary = events[1][1]
+    assert summary["partial"] is True and summary["included"] == ["fast"]
+    assert summary["decision"]["mode"] == "single"
+    assert list(events[3][1]["addenda"]) == ["slow"]
+
+def test_stream_summary_refines_with_late_responses(monkeypatch):
+    events = stream_with_slow_provider(monkeypatch, late_responses="refine")
+    names = [name for name, _ in events]
+    assert names == ["provider_result", "summary", "provider_result", "summary_update", "done"]
+    update = events[3][1]
+    assert update["folded_in"] == ["slow"]
+    assert update["decision"]["mode"] in ("concatenated", "local")
+    assert "slow" in update["summary"]
+
+@pytest.mark.asyncio
+async def test_refine_summary_uses_refinement_prompt(monkeypatch):
+    prompts = []
+    async def summarizer(prompt, history):
+        prompts.append(prompt)
+        return "refined text"
+    monkeypatch.setattr(main, "summary_candidates", lambda: [("cohere", summarizer)])
+    decision = {"mode": "llm", "reason": "responses differ", "provider": "openai", "similarity": 0.1}
+    summary, new_decision = await main.refine_summary(
+        "🤖 **AI-Generated Summary** (via OPENAI):\n\nearly text", decision,
+        {"gemini": "late answer"}, {"gemini": "late answer"}, "q", "auto")
+    assert summary.endswith("refined text")
+    assert new_decision["provider"] == "cohere" and new_decision["refined_with"] == ["gemini"]
+    assert "early text" in prompts[0] and "**gemini**: late answer" in prompts[0]
+    assert "AI-Generated Summary" not in prompts[0]
+    monkeypatch.setattr(main, "summary_candidates", lambda: [])
+    assert await main.refine_summary("s", decision, {"gemini": "x"}, {"gemini": "x"}, "q", "auto") is None
+
+def fake_stream_fetch(parts, fail_after=None):
+    async def stream_fetch(query, history, api_key):
+        for i, part in enumerate(parts):
+            if fail_after is not None and i == fail_after:
+                raise httpx.ReadError("connection dropped")
+            yield part
+    return stream_fetch
+
+@pytest.mark.asyncio
+async def test_provider_stream_yields_deltas_and_caches_full_text(monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "key")
+    monkeypatch.setitem(main.BREAKERS, "cohere", CircuitBreaker("cohere"))
+    main.CACHE.clear()
+    fetch = fake_stream_fetch(["Hel", "lo"])
+    assert [d async for d in main.provider_stream("cohere", "stream me", [], fetch)] == ["Hel", "lo"]
+    assert await main.get_cached("stream me", "cohere", []) == "Hello"
+    # Served from cache as one chunk
+    assert [d async for d in main.provider_stream("cohere", "stream me", [], fetch)] == ["Hello"]
+
+@pytest.mark.asyncio
+async def test_streamed_gemini_cached_apart_from_generate_text(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "key")
+    monkeypatch.setitem(main.BREAKERS, "gemini", CircuitBreaker("gemini"))
+    main.CACHE.clear()
+    main.set_cache("model split", "gemini", "generateText answer", [])
+    fetch = fake_stream_fetch(["stream", "ed"])
+    # The generateText entry is not served to the stream (different model)...
+    assert [d async for d in main.provider_stream("gemini", "model split", [], fetch)] == ["stream", "ed"]
+    # ...and the streamed answer doesn't overwrite it
+    assert await main.get_cached("model split", "gemini", []) == "generateText answer"
+    assert await main.get_cached("model split", "gemini", [], main.GEMINI_STREAM_MODEL) == "streamed"
+
+@pytest.mark.asyncio
+async def test_provider_stream_interrupted_mid_stream_is_not_cached(monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "key")
+    monkeypatch.setitem(main.BREAKERS, "cohere", CircuitBreaker("cohere"))
+    main.CACHE.clear()
+    main.NEGATIVE_CACHE.clear()
+    fetch = fake_stream_fetch(["Hel", "lo"], fail_after=1)
+    deltas = [d async for d in main.provider_stream("cohere", "broken stream", [], fetch)]
+    assert deltas[0] == "Hel" and "stream interrupted" in deltas[1]
+    assert await main.get_cached("broken stream", "cohere", []) is None
+
+@pytest.mark.asyncio
+async def test_provider_stream_retries_before_first_token(monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "key")
+    monkeypatch.setitem(main.BREAKERS, "cohere", CircuitBreaker("cohere"))
+    monkeypatch.setattr(main.RETRY, "base_delay", 0)
+    main.CACHE.clear()
+    attempts = []
+    async def flaky(query, history, api_key):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("refused")
+        yield "ok"
+    assert [d async for d in main.provider_stream("cohere", "retry stream", [], flaky)] == ["ok"]
+    assert len(attempts) == 2
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_stream_cohere_adapter(mock_client, monkeypatch):
+    mock_instance = streaming_client(mock_client, [
+        '{"text": "Co", "is_finished": false}', '{"text": "here", "is_finished": false}',
+        '{"is_finished": true, "response": {}}',
+    ])
+    assert [d async for d in main._stream_cohere("q", [], "key")] == ["Co", "here"]
+    assert mock_instance.stream.call_args.kwargs["json"]["stream"] is True
+
+def test_ask_stream_forwards_tokens(monkeypatch):
+    async def fake_stream(provider, query, history):
+        for word in [f"{provider} ", "says ", "hi"]:
+            await asyncio.sleep(0.01)
+            yield word
+    monkeypatch.setattr(main, "stream_provider", fake_stream)
+    for key in ["GEMINI_API_KEY", "COHERE_API_KEY", "OPENAI_API_KEY"]:
+        monkeypatch.setenv(key, "")
+    events = parse_sse(client.post("/ask/stream", json={"query": "q", "providers": ["a", "b"], "stream_tokens": True}).text)
+    for provider in ("a", "b"):
+        mine = [(name, data) for name, data in events if data.get("provider") == provider]
+        assert [name for name, _ in mine] == ["provider_delta"] * 3 + ["provider_result"]
+        assert "".join(data["delta"] for _, data in mine[:3]) == mine[3][1]["response"] == f"{provider} says hi"
+        assert mine[3][1]["ttft_ms"] <= mine[3][1]["elapsed_ms"]
+    assert set(events[-1][1]["timings"]["providers_ttft_ms"]) == {"a", "b"}
+
+@pytest.mark.asyncio
+async def test_provider_call_outcomes_recorded_in_metrics(monkeypatch):
+    monkeypatch.setenv("COHERE_API_KEY", "k")
+    main.PROVIDER_CALLS.reset()
+    main.PROVIDER_LATENCY.reset()
+    fetch = AsyncMock(side_effect=[httpx.ConnectError("down"), "fine"])
+    with patch.object(main.RETRY, "delay", return_value=0), patch.object(main, "BREAKERS", {"cohere": CircuitBreaker("cohere")}):
+        assert await main.provider_call("cohere", "metrics outcome q", None, fetch) == "fine"
+    assert await main.provider_call("cohere", "metrics outcome q", None, fetch) == "fine"
+    assert main.PROVIDER_CALLS.value("cohere", "success") == 1
+    assert main.PROVIDER_CALLS.value("cohere", "cached") == 1
+    assert main.PROVIDER_LATENCY.count("cohere", "connection") == 1
+    assert main.PROVIDER_LATENCY.count("cohere", "success") == 1
+
+def test_metrics_endpoint():
+    client.post("/ask", json={"query": "metrics q", "providers": ["claude"]})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_requests_total{path="/ask",method="POST",status="200"}' in text
+    assert 'summaries_total{mode="single",provider="claude"}' in text
+    assert 'cache_hits_total{cache="response"}' in text
+    assert 'admission_active{controller="ask"} 0' in text
+    assert "ask_query_chars_count" in text
+
+def test_ask_echoes_request_id_and_server_timing():
+    response = client.post("/ask", json={"query": "trace q", "providers": ["claude"]},
+                           headers={"X-Request-ID": "req-7"})
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "req-7"
+    timing = response.headers["server-timing"]
+    assert "summary;dur=" in timing
+    assert "serialize;dur=" in timing
+    assert "total;dur=" in timing
@@ -0,0 +1,62 @@
+import pytest
+from backend import metrics
+
+def test_counter_and_gauge_render():
+    registry = metrics.Registry()
+    calls = registry.counter("calls_total", "Calls.", ("provider", "outcome"))
+    calls.inc("openai", "success")
+    calls.inc("openai", "success", amount=2)
+    calls.inc('we"ird\n', "timeout")
+    registry.gauge("entries", "Entries.", ("cache",), lambda: {("response",): 7})
+    text = registry.render()
+    assert "# TYPE calls_total counter" in text
+    assert 'calls_total{provider="openai",outcome="success"} 3' in text
+    assert 'calls_total{provider="we\\"ird\\n",outcome="timeout"} 1' in text
+    assert 'entries{cache="response"} 7' in text
+    assert text.endswith("\n")
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry()
+    latency = registry.histogram("latency_seconds", "Latency.", ("provider",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, "cohere")
+    text = registry.render()
+    assert 'latency_seconds_bucket{provider="cohere",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{provider="cohere",le="1"} 3' in text
+    assert 'latency_seconds_bucket{provider="cohere",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{provider="cohere"} 3.65' in text
+    assert 'latency_seconds_count{provider="cohere"} 4' in text
+    assert latency.count("cohere") == 4
+
+def test_duplicate_registration_rejected():
+    registry = metrics.Registry()
+    registry.counter("x_total", "X.")
+    with pytest.raises(ValueError):
+        registry.counter("x_total", "X again.")
+
+@pytest.mark.asyncio
+async def test_middleware_tracks_in_flight_and_status():
+    registry = metrics.Registry()
+    in_flight = registry.gauge("in_flight", "In flight.", ("path",))
+    requests = registry.counter("requests_total", "Requests.", ("path", "method", "status"))
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(in_flight.value(scope["path"] if scope["path"] == "/ask" else "other"))
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware = metrics.MetricsMiddleware(
+        app, in_flight, requests,
+        registry.histogram("duration_seconds", "Duration.", ("path",)),
+        registry.histogram("body_bytes", "Body.", ("path",), buckets=metrics.SIZE_BUCKETS),
+        routes=frozenset({"/ask"}),
+    )
+    scope = {"type": "http", "path": "/random/123", "method": "GET", "headers": [(b"content-length", b"10")]}
+    await middleware(scope, None, send)
+    assert seen == [1]
+    assert in_flight.value("other") == 0
+    assert requests.value("other", "GET", "404") == 1
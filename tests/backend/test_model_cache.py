@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from backend import model_cache
+
+def make_fetch(values):
+    calls = []
+    async def fetch():
+        calls.append(1)
+        return values[min(len(calls), len(values)) - 1]
+    return fetch, calls
+
+@pytest.mark.asyncio
+async def test_hit_after_first_miss():
+    cache = model_cache.ModelCache(ttl=60)
+    fetch, calls = make_fetch(["text-bison-001"])
+    assert await cache.get("key", fetch) == "text-bison-001"
+    assert await cache.get("key", fetch) == "text-bison-001"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+@pytest.mark.asyncio
+async def test_none_is_not_cached():
+    cache = model_cache.ModelCache(ttl=60)
+    fetch, calls = make_fetch([None, "text-bison-001"])
+    assert await cache.get("key", fetch) is None
+    assert await cache.get("key", fetch) == "text-bison-001"
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_refetched(monkeypatch):
+    cache = model_cache.ModelCache(ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr(model_cache.time, "monotonic", lambda: now[0])
+    fetch, calls = make_fetch(["old", "new"])
+    await cache.get("key", fetch)
+    now[0] += 61
+    assert await cache.get("key", fetch) == "new"
+    assert cache.misses == 2
+
+@pytest.mark.asyncio
+async def test_background_refresh_serves_stale_value(monkeypatch):
+    cache = model_cache.ModelCache(ttl=60, refresh_after=0.5)
+    now = [1000.0]
+    monkeypatch.setattr(model_cache.time, "monotonic", lambda: now[0])
+    fetch, calls = make_fetch(["old", "new"])
+    await cache.get("key", fetch)
+    now[0] += 40
+    assert await cache.get("key", fetch) == "old"
+    await asyncio.sleep(0)
+    assert await cache.get("key", fetch) == "new"
+    assert cache.refreshes == 1
@@ -1,5 +1,6 @@
 import pytest
 from backend import providers
+from tests.backend.streaming_mocks import streaming_client
 from unittest.mock import patch, AsyncMock, MagicMock
 
 @pytest.mark.asyncio
@@ -67,4 +68,45 @@ async def test_ask_perplexity_success(mock_client, monkeypatch):
     mock_response.json.return_value = {"choices": [{"message": {"content": "Perplexity answer"}}]}
     mock_instance.post = AsyncMock(return_value=mock_response)
     result = await providers.ask_perplexity("test")
-    assert result == "Perplexity answer"
\ No newline at end of file
+    assert result == "Perplexity answer"
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_stream_openai_yields_deltas(mock_client):
+    providers.OPENAI_KEY = "fake-key"
+    client = streaming_client(mock_client, [
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}', "",
+        'data: {"choices": [{"delta": {"content": "Open"}}]}', "",
+        'data: {"choices": [{"delta": {"content": "AI"}}]}', "",
+        "data: [DONE]", "",
+    ])
+    assert [d async for d in providers.stream_openai("test")] == ["Open", "AI"]
+    assert client.stream.call_args.kwargs["json"]["stream"] is True
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_stream_claude_yields_text_deltas(mock_client):
+    providers.ANTHROPIC_KEY = "fake-key"
+    streaming_client(mock_client, [
+        "event: message_start", 'data: {"type": "message_start"}', "",
+        "event: content_block_delta", 'data: {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Hi"}}', "",
+        "event: message_stop", 'data: {"type": "message_stop"}', "",
+    ])
+    assert [d async for d in providers.stream_claude("test")] == ["Hi"]
+
+@pytest.mark.asyncio
+@patch("httpx.AsyncClient")
+async def test_stream_cohere_yields_text_generation_events(mock_client):
+    providers.COHERE_KEY = "fake-key"
+    streaming_client(mock_client, [
+        '{"event_type": "stream-start"}',
+        '{"event_type": "text-generation", "text": "Co"}',
+        '{"event_type": "text-generation", "text": "here"}',
+        '{"event_type": "stream-end", "response": {"text": "Cohere"}}',
+    ])
+    assert [d async for d in providers.stream_cohere("test")] == ["Co", "here"]
+
+@pytest.mark.asyncio
+async def test_stream_gemini_without_key(monkeypatch):
+    monkeypatch.setattr(providers, "GEMINI_KEY", None)
+    assert [d async for d in providers.stream_gemini("test")] == ["[Gemini disabled - add API key in .env]"]
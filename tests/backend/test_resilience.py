@@ -0,0 +1,115 @@
+import pytest
+from backend import resilience
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+def test_breaker_opens_on_error_rate(clock):
+    breaker = resilience.CircuitBreaker("p", error_rate=0.5, min_calls=4)
+    for _ in range(2):
+        breaker.record_success(0.1)
+    breaker.record_failure(0.1)
+    assert breaker.state == "closed"
+    breaker.record_failure(0.1)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert not breaker.available()
+    assert breaker.snapshot()["rejected"] == 1
+
+def test_slow_calls_count_as_bad(clock):
+    breaker = resilience.CircuitBreaker("p", min_calls=2, slow_call_s=1)
+    breaker.record_success(5)
+    breaker.record_success(5)
+    assert breaker.state == "open"
+
+def test_half_open_probe_closes_on_success(clock):
+    breaker = resilience.CircuitBreaker("p", min_calls=1, open_seconds=30)
+    breaker.record_failure(0.1)
+    clock[0] += 31
+    assert breaker.available()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = resilience.CircuitBreaker("p", min_calls=1, open_seconds=30)
+    breaker.record_failure(0.1)
+    clock[0] += 31
+    assert breaker.allow()
+    breaker.record_failure(0.1)
+    assert breaker.state == "open" and breaker.trips == 2
+
+def test_released_probe_can_be_retried(clock):
+    breaker = resilience.CircuitBreaker("p", min_calls=1, open_seconds=30)
+    breaker.record_failure(0.1)
+    clock[0] += 31
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+def test_old_outcomes_leave_the_window(clock):
+    breaker = resilience.CircuitBreaker("p", min_calls=2, window=10)
+    breaker.record_failure(0.1)
+    clock[0] += 11
+    breaker.record_success(0.1)
+    assert breaker.state == "closed"
+    assert breaker.snapshot()["calls"] == 1
+
+def test_latency_quantile(clock):
+    breaker = resilience.CircuitBreaker("p")
+    assert breaker.latency_quantile(0.9) is None
+    for latency in [0.1, 0.2, 0.3, 0.4, 1.0]:
+        breaker.record_success(latency)
+    assert breaker.latency_quantile(0.9) == 1.0
+    assert breaker.latency_quantile(0.5) == 0.3
+
+def test_token_bucket_reserve_and_refill(clock):
+    bucket = resilience.TokenBucket(rate=1, capacity=2)
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == 1
+    clock[0] += 1
+    assert bucket.reserve(1) == 1
+    bucket.refund(1)
+    assert bucket.tokens == 0
+
+@pytest.mark.asyncio
+async def test_rate_limiter_rejects_when_wait_exceeds_deadline(clock):
+    limiter = resilience.RateLimiter(rpm=60, burst_seconds=1)
+    assert await limiter.acquire(deadline=clock[0] + 0.5)
+    assert not await limiter.acquire(deadline=clock[0] + 0.5)
+    assert limiter.stats() == {"throttled": 0, "rejected": 1}
+    # The rejected reservation was refunded
+    assert limiter.requests.tokens == 0
+
+@pytest.mark.asyncio
+async def test_rate_limiter_throttles_on_tokens_per_minute(clock, monkeypatch):
+    slept = []
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+    monkeypatch.setattr(resilience.asyncio, "sleep", fake_sleep)
+    limiter = resilience.RateLimiter(rpm=6000, tpm=600, burst_seconds=1)
+    assert await limiter.acquire(tokens=10)
+    assert await limiter.acquire(tokens=10)
+    assert slept == [1.0]
+
+def test_limiter_from_env(monkeypatch):
+    monkeypatch.setenv("COHERE_RPM", "30")
+    limiter = resilience.limiter_from_env("cohere")
+    assert limiter.requests.rate == 0.5
+    assert limiter.tokens is None
+
+def test_retry_policy_delay():
+    policy = resilience.RetryPolicy(base_delay=0.5, max_delay=4)
+    for attempt in range(1, 6):
+        assert 0 <= policy.delay(attempt) <= min(4, 0.5 * 2 ** (attempt - 1))
+    assert policy.delay(1, retry_after=2) == 2
+    # Longer than we'd wait: don't spend an attempt on a certain rejection
+    assert policy.delay(1, retry_after=60) is None
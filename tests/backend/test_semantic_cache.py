@@ -0,0 +1,98 @@
+import pytest
+from backend import semantic_cache
+
+def test_normalize_for_similarity_expands_contractions_and_drops_punctuation():
+    assert semantic_cache.normalize_for_similarity("What's  Python?") == "what is python"
+    assert semantic_cache.normalize_for_similarity("It doesn't work!") == "it does not work"
+
+def test_paraphrases_match_and_unrelated_queries_do_not():
+    index = semantic_cache.SemanticIndex()
+    index.add("ctx", "what is python", "python-key")
+    index.add("ctx", "what is the capital of france", "france-key")
+    assert index.lookup("ctx", "What is Python?")[0] == "python-key"
+    assert index.lookup("ctx", "what's python")[0] == "python-key"
+    assert index.lookup("ctx", "what is the capital of spain") is None
+    assert index.lookup("ctx", "how do I sort a list") is None
+    assert index.stats()["hits"] == 2 and index.stats()["misses"] == 2
+
+def test_content_words_keep_numbers_and_negation():
+    assert semantic_cache.content_words("Is it not safe to take 2 ibuprofen?") == ("not", "safe", "take", "2", "ibuprofen")
+    assert semantic_cache.content_words("What's Python?") == ("what", "python")
+
+def test_key_facts_are_numbers_and_negations():
+    assert semantic_cache.key_facts("It wasn't signed in 1919, never.") == {"not", "1919", "never"}
+    assert semantic_cache.key_facts("The capital of France is Paris.") == frozenset()
+
+def test_similar_looking_questions_with_different_meaning_do_not_match():
+    index = semantic_cache.SemanticIndex()
+    pairs = [
+        ("What is the capital of Australia?", "What is the capital of Austria?"),
+        ("How do I convert Fahrenheit to Celsius?", "How do I convert Celsius to Fahrenheit?"),
+        ("Is it safe to take ibuprofen with alcohol?", "Is it not safe to take ibuprofen with alcohol?"),
+        ("Is it safe to take ibuprofen with alcohol?", "Isn't it safe to take ibuprofen with alcohol?"),
+        ("TCP vs UDP", "UDP vs TCP"),
+        ("Explain Python 2 unicode", "Explain Python 3 unicode"),
+        ("When was the Eiffel Tower in Paris, France built and who designed it?",
+         "Why was the Eiffel Tower in Paris, France built and who designed it?"),
+        ("Should I use PostgreSQL or MySQL for a small web app?",
+         "Should I use PostgreSQL and MySQL for a small web app?"),
+    ]
+    for cached, asked in pairs:
+        index.clear()
+        index.add("ctx", cached, "cached-key")
+        assert index.lookup("ctx", asked) is None, asked
+    assert index.stats()["hits"] == 0
+
+def test_lookup_scores_a_bounded_number_of_candidates():
+    index = semantic_cache.SemanticIndex(max_candidates=2)
+    index.add("ctx", "is it python", "oldest")
+    index.add("ctx", "python", "middle")
+    index.add("ctx", "so is it python then", "newest")
+    # Only the two most recent texts with these content words are scored
+    assert index.lookup("ctx", "is it python") is None
+    assert index.lookup("ctx", "Python!")[0] == "middle"
+
+def test_contexts_are_isolated():
+    index = semantic_cache.SemanticIndex()
+    index.add("conversation-a", "explain more", "a-key")
+    assert index.lookup("conversation-b", "explain more") is None
+    assert index.lookup("conversation-a", "Explain more.")[0] == "a-key"
+
+def test_readding_same_text_replaces_entry():
+    index = semantic_cache.SemanticIndex()
+    index.add("ctx", "what is python", "old")
+    index.add("ctx", "What is python", "new")
+    assert len(index) == 1
+    assert index.lookup("ctx", "what is python")[0] == "new"
+
+def test_oldest_entries_are_evicted():
+    index = semantic_cache.SemanticIndex(max_entries=2)
+    index.add("ctx", "first question about rust", 1)
+    index.add("ctx", "second question about go", 2)
+    index.add("ctx", "third question about java", 3)
+    assert len(index) == 2
+    assert index.lookup("ctx", "first question about rust") is None
+    assert index.lookup("ctx", "third question about java")[0] == 3
+
+def test_invalidate_drops_the_entry_and_recounts_the_lookup():
+    index = semantic_cache.SemanticIndex()
+    index.add("ctx", "what is python", "python-key")
+    assert index.lookup("ctx", "what's python")[0] == "python-key"
+    index.invalidate("python-key")
+    assert len(index) == 0
+    assert index.lookup("ctx", "what's python") is None
+    assert index.stats()["hits"] == 0 and index.stats()["misses"] == 2 and index.stats()["stale"] == 1
+
+def test_signature_similarity_matches_jaccard():
+    a, b = "the capital of france is paris", "the capital of france is lyon"
+    exact = semantic_cache.jaccard(semantic_cache.shingles(a), semantic_cache.shingles(b))
+    signed = semantic_cache.signature_similarity(set(semantic_cache.signature(a)), semantic_cache.signature(b))
+    assert signed == pytest.approx(exact)
+    assert semantic_cache.signature(a).itemsize == 8
+
+def test_jaccard():
+    a = semantic_cache.shingles("the capital of france is paris")
+    assert semantic_cache.jaccard(a, a) == 1.0
+    assert semantic_cache.jaccard(a, semantic_cache.shingles("The capital of France is Paris!")) == 1.0
+    assert semantic_cache.jaccard(a, semantic_cache.shingles("rust is a systems language")) < 0.2
+    assert semantic_cache.jaccard(set(), set()) == 1.0
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from backend import singleflight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = singleflight.SingleFlight()
+    calls = []
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+    results = await asyncio.gather(*[flight.do("k", fetch) for _ in range(5)])
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    flight = singleflight.SingleFlight()
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+    results = await asyncio.gather(*[flight.do("k", fetch) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.in_flight() == 0
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = singleflight.SingleFlight()
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "answer"
+    first = asyncio.create_task(flight.do("k", fetch))
+    second = asyncio.create_task(flight.do("k", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "answer"
+    assert first.cancelled()
+
+@pytest.mark.asyncio
+async def test_shared_call_cancelled_when_last_waiter_leaves():
+    flight = singleflight.SingleFlight()
+    started = asyncio.Event()
+    cancelled = []
+    async def fetch():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+    waiter = asyncio.create_task(flight.do("k", fetch))
+    await started.wait()
+    waiter.cancel()
+    await asyncio.sleep(0.01)
+    assert cancelled == [1]
+    assert flight.in_flight() == 0
+
+@pytest.mark.asyncio
+async def test_new_call_after_completion_runs_again():
+    flight = singleflight.SingleFlight()
+    calls = []
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+    assert await flight.do("k", fetch) == 1
+    assert await flight.do("k", fetch) == 2
@@ -0,0 +1,38 @@
+import pytest
+from tests.backend.streaming_mocks import fake_response
+from backend import streaming
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+@pytest.mark.asyncio
+async def test_iter_sse_json_parses_events_and_stops_at_done():
+    lines = [
+        "event: message", 'data: {"a": 1}', "",
+        ": keep-alive comment", "",
+        'data: {"b":', 'data: 2}', "",
+        "data: [DONE]", "",
+        'data: {"never": true}', "",
+    ]
+    assert await collect(streaming.iter_sse_json(fake_response(lines))) == [{"a": 1}, {"b": 2}]
+
+@pytest.mark.asyncio
+async def test_iter_sse_json_flushes_unterminated_event():
+    assert await collect(streaming.iter_sse_json(fake_response(['data: {"a": 1}']))) == [{"a": 1}]
+
+@pytest.mark.asyncio
+async def test_iter_ndjson_skips_blank_lines():
+    lines = ['{"text": "Hel"}', "", '{"text": "lo"}']
+    assert await collect(streaming.iter_ndjson(fake_response(lines))) == [{"text": "Hel"}, {"text": "lo"}]
+
+def test_delta_extractors():
+    assert streaming.openai_delta({"choices": [{"delta": {"content": "Hi"}}]}) == "Hi"
+    assert streaming.openai_delta({"choices": [{"delta": {"role": "assistant"}}]}) == ""
+    assert streaming.openai_delta({"choices": []}) == ""
+    assert streaming.gemini_delta({"candidates": [{"content": {"parts": [{"text": "a"}, {"text": "b"}]}}]}) == "ab"
+    assert streaming.anthropic_delta({"type": "content_block_delta", "delta": {"type": "text_delta", "text": "x"}}) == "x"
+    assert streaming.anthropic_delta({"type": "message_start"}) == ""
+    assert streaming.cohere_delta({"event_type": "text-generation", "text": "y"}) == "y"
+    assert streaming.cohere_delta({"event_type": "stream-end", "text": "full"}) == ""
+    assert streaming.cohere_delta({"text": "z", "is_finished": False}) == "z"
+    assert streaming.cohere_delta({"is_finished": True, "response": {}}) == ""
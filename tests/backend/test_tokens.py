@@ -0,0 +1,44 @@
+from backend import tokens
+
+def test_count_tokens_english_is_close_to_bpe():
+    text = "The quick brown fox jumps over the lazy dog. Python is a high-level, general-purpose programming language."
+    # cl100k gives 21 tokens for this sentence
+    assert 18 <= tokens.count_tokens(text, "openai") <= 26
+
+def test_count_tokens_families_and_scripts():
+    text = "Internationalization considerations"
+    assert tokens.count_tokens(text, "claude") > tokens.count_tokens(text, "openai")
+    assert tokens.count_tokens("日本語のテキスト") >= 8
+    assert tokens.count_tokens("") == 0
+    # Digits are grouped in threes
+    assert tokens.count_tokens("123456789") == 3
+
+def test_ascii_fast_path_matches_general_path():
+    text = "def foo(x):\n    return x**2 + 12345678  # comment's here"
+    assert tokens.count_tokens(text, "gemini") == sum(c for _, c in tokens._piece_costs(text, "gemini"))
+
+def test_trim_to_tokens():
+    text = "one two three four five six seven eight nine ten " * 10
+    trimmed = tokens.trim_to_tokens(text, 12)
+    assert trimmed.endswith(tokens.TRUNCATION_MARKER)
+    assert tokens.count_tokens(trimmed) <= 12
+    assert text.startswith(trimmed[: -len(tokens.TRUNCATION_MARKER)])
+    assert tokens.trim_to_tokens("short", 12) == "short"
+
+def test_fit_texts_gives_short_texts_their_full_share():
+    texts = {"a": "brief answer", "b": "long " * 1000, "c": "longer " * 2000}
+    fitted = tokens.fit_texts(texts, 300)
+    assert fitted["a"] == "brief answer"
+    assert sum(tokens.count_tokens(v) for v in fitted.values()) <= 300
+    assert tokens.count_tokens(fitted["b"]) > 100
+    assert tokens.fit_texts({"a": "x"}, 300) == {"a": "x"}
+
+def test_context_window_env_override(monkeypatch):
+    assert tokens.context_window("cohere") == tokens.CONTEXT_WINDOWS["cohere"]
+    monkeypatch.setenv("COHERE_CONTEXT_TOKENS", "1000")
+    assert tokens.context_window("cohere") == 1000
+
+def test_provider_lookups_ignore_case():
+    text = "internationalization " * 10
+    assert tokens.count_tokens(text, "Cohere") == tokens.count_tokens(text, "cohere")
+    assert tokens.context_window("OpenAI") == tokens.context_window("openai")
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import pytest
+from backend import tracing
+from backend.tracing import Trace, TraceExporter, span
+
+def test_span_is_noop_outside_a_trace():
+    with span("cache.lookup") as s:
+        s.set("hit", True)
+    assert s is tracing.NOOP_SPAN
+    assert tracing.current_trace() is None
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_tasks():
+    trace = Trace()
+    token = tracing.start_trace(trace)
+    try:
+        async def provider(name):
+            with span(f"provider.{name}"):
+                with span(f"upstream.{name}", attempt=1):
+                    await asyncio.sleep(0)
+
+        with span("request") as root:
+            await asyncio.gather(provider("openai"), provider("cohere"))
+    finally:
+        tracing.end_trace(token)
+    by_name = {s.name: s for s in trace.spans}
+    assert by_name["provider.openai"].parent_id == root.span_id
+    assert by_name["upstream.cohere"].parent_id == by_name["provider.cohere"].span_id
+    assert by_name["upstream.cohere"].attributes == {"attempt": 1}
+    assert trace.spans[-1] is root
+
+def test_failed_span_records_error_and_server_timing():
+    trace = Trace()
+    token = tracing.start_trace(trace)
+    try:
+        with pytest.raises(ValueError):
+            with span("summary.openai"):
+                raise ValueError("boom")
+        with span("summary.openai"):
+            pass
+    finally:
+        tracing.end_trace(token)
+    assert trace.spans[0].error == "ValueError"
+    timing = trace.server_timing()
+    assert timing.startswith("summary.openai;dur=")
+    assert ", total;dur=" in timing
+    assert timing.count("summary.openai") == 1
+
+def test_request_id_reused_only_when_safe():
+    assert Trace("abc-123").request_id == "abc-123"
+    unsafe = Trace("bad id\r\nx")
+    assert unsafe.request_id == unsafe.trace_id[:16]
+
+def test_max_spans_drops_the_rest():
+    trace = Trace(max_spans=1)
+    token = tracing.start_trace(trace)
+    try:
+        for _ in range(3):
+            with span("cache.lookup"):
+                pass
+    finally:
+        tracing.end_trace(token)
+    assert len(trace.spans) == 1
+    assert trace.dropped == 2
+
+def _finished_trace() -> Trace:
+    trace = Trace("req-1")
+    token = tracing.start_trace(trace)
+    try:
+        with span("request"):
+            with span("gemini.list_models", cached=False):
+                pass
+    finally:
+        tracing.end_trace(token)
+    return trace
+
+def test_exporter_writes_json_lines(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = TraceExporter(path=str(path), flush_interval=60)
+    exporter.export(_finished_trace())
+    exporter.close()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["name"] for r in records] == ["gemini.list_models", "request"]
+    assert records[0]["parent_id"] == records[1]["span_id"]
+    assert records[0]["request_id"] == "req-1"
+    assert exporter.stats()["exported"] == 1
+
+def test_otlp_payload_shape():
+    trace = _finished_trace()
+    payload = tracing.otlp_payload([trace], "svc")
+    resource = payload["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0]["value"]["stringValue"] == "svc"
+    spans = resource["scopeSpans"][0]["spans"]
+    child, root = spans
+    assert child["traceId"] == trace.trace_id
+    assert child["parentSpanId"] == root["spanId"]
+    assert "parentSpanId" not in root
+    assert {"key": "cached", "value": {"boolValue": False}} in child["attributes"]
+    assert int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
+
+@pytest.mark.asyncio
+async def test_middleware_adds_headers_and_exports():
+    exported = []
+
+    class Exporter:
+        def export(self, trace):
+            exported.append(trace)
+
+    async def app(scope, receive, send):
+        with span("serialize"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    sent = []
+    async def send(message):
+        sent.append(message)
+
+    middleware = tracing.TracingMiddleware(app, routes=frozenset({"/ask"}), exporter=Exporter())
+    scope = {"type": "http", "path": "/ask", "method": "POST", "headers": [(b"x-request-id", b"r-42")]}
+    await middleware(scope, None, send)
+    headers = dict(sent[0]["headers"])
+    assert headers[b"x-request-id"] == b"r-42"
+    assert headers[b"server-timing"].startswith(b"serialize;dur=")
+    assert [s.name for s in exported[0].spans] == ["serialize", "request"]
@@ -0,0 +1,56 @@
+import pytest
+import httpx
+from fastapi.testclient import TestClient
+from benchmarks import fake_providers
+from benchmarks.load_test import percentile
+from backend.streaming import gemini_delta, iter_ndjson, iter_sse_json, openai_delta
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setenv("FAKE_LATENCY_MS", "0")
+    monkeypatch.setenv("FAKE_RESPONSE_WORDS", "20")
+    fake_providers.counters.clear()
+    return fake_providers.app
+
+def test_openai_chat_completion_shape(fake):
+    client = TestClient(fake)
+    r = client.post("/openai/v1/chat/completions", json={"model": "x", "messages": []})
+    assert r.status_code == 200
+    assert len(r.json()["choices"][0]["message"]["content"].split()) == 20
+    assert client.get("/stats").json() == {"openai": 1}
+
+def test_injected_rate_limit(fake, monkeypatch):
+    monkeypatch.setenv("FAKE_COHERE_RATE_LIMIT_RATE", "1")
+    client = TestClient(fake)
+    r = client.post("/cohere/v1/generate", json={"prompt": "hi"})
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "1"
+    assert client.post("/openai/v1/chat/completions", json={}).status_code == 200
+    assert client.get("/stats").json()["cohere_429"] == 1
+
+def test_gemini_generate_text(fake):
+    r = TestClient(fake).post("/gemini/v1beta/models/text-bison-001:generateText", json={"prompt": {"text": "hi"}})
+    assert r.json()["candidates"][0]["content"]
+
+@pytest.mark.asyncio
+async def test_streams_parse_with_backend_helpers(fake):
+    transport = httpx.ASGITransport(app=fake)
+    async with httpx.AsyncClient(transport=transport, base_url="http://fake") as client:
+        async with client.stream("POST", "/openai/v1/chat/completions", json={"stream": True}) as r:
+            openai_text = "".join([openai_delta(c) async for c in iter_sse_json(r)])
+        async with client.stream("POST", "/gemini/v1beta/models/gemini-1.5-flash:streamGenerateContent?alt=sse",
+                                 json={}) as r:
+            gemini_text = "".join([gemini_delta(c) async for c in iter_sse_json(r)])
+        async with client.stream("POST", "/cohere/v1/chat", json={"stream": True}) as r:
+            events = [e async for e in iter_ndjson(r)]
+    assert len(openai_text.split()) == 20
+    assert len(gemini_text.split()) == 20
+    assert len("".join(e["text"] for e in events).split()) == 20
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([], 50) is None